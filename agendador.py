@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence
+
+import inferencia
+from inferencia import MODEL_CONFIG
+
+# Sinal interno para encerrar a thread do agendador
+_PARAR = object()
+
+class AgendadorInferencia:
+    """
+    Agrupa pedidos de predição de várias sessões em micro-lotes.
+
+    Cada chamada a `submeter` devolve um Future com o mesmo resultado
+    de `fazer_predicao`. Uma única thread consome a fila e dispara um
+    forward pass assim que o lote atinge `tamanho_lote_max` imagens ou
+    quando o primeiro pedido do lote espera mais que `espera_max_ms`.
+    """
+
+    def __init__(self, modelo, tamanho_lote_max: Optional[int] = None,
+                 espera_max_ms: Optional[float] = None):
+        self.modelo = modelo
+        self.tamanho_lote_max = tamanho_lote_max or MODEL_CONFIG['tamanho_lote_max']
+        espera_max_ms = MODEL_CONFIG['espera_max_lote_ms'] if espera_max_ms is None else espera_max_ms
+        self.espera_max = espera_max_ms / 1000
+
+        self._fila = queue.Queue()
+        self._lock = threading.Lock()
+        # Torna atômicos "checar _encerrado + enfileirar": nada entra depois de _PARAR
+        self._lock_fila = threading.Lock()
+        self._lotes = 0
+        self._imagens = 0
+        self._encerrado = False
+
+        self._thread = threading.Thread(target=self._executar, name="agendador-inferencia", daemon=True)
+        self._thread.start()
+
+    def submeter(self, imagem) -> Future:
+        """Enfileira uma imagem e retorna o Future do seu resultado"""
+        futuro = Future()
+        with self._lock_fila:
+            if self._encerrado:
+                raise RuntimeError("Agendador de inferência encerrado")
+            self._fila.put((imagem, futuro))
+        return futuro
+
+    def submeter_varias(self, imagens: Sequence) -> List[Future]:
+        """Enfileira várias imagens; os resultados seguem a ordem de entrada"""
+        return [self.submeter(imagem) for imagem in imagens]
+
+    def encerrar(self, timeout: Optional[float] = None):
+        """Processa o que já está na fila e para a thread do agendador"""
+        with self._lock_fila:
+            if not self._encerrado:
+                self._encerrado = True
+                self._fila.put(_PARAR)
+        self._thread.join(timeout)
+
+    def estatisticas(self) -> Dict[str, float]:
+        """Retorna contadores de lotes e imagens processados"""
+        with self._lock:
+            return {
+                'lotes': self._lotes,
+                'imagens': self._imagens,
+                'tamanho_medio_lote': self._imagens / self._lotes if self._lotes else 0.0,
+                'fila': self._fila.qsize()
+            }
+
+    def _executar(self):
+        parar = False
+        while not parar:
+            item = self._fila.get()
+            if item is _PARAR:
+                break
+
+            # Juntar pedidos até encher o lote ou estourar o prazo do primeiro
+            lote = [item]
+            prazo = time.monotonic() + self.espera_max
+            while len(lote) < self.tamanho_lote_max:
+                restante = prazo - time.monotonic()
+                try:
+                    item = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _PARAR:
+                    parar = True
+                    break
+                lote.append(item)
+
+            self._processar(lote)
+
+        self._descartar_restantes()
+
+    def _descartar_restantes(self):
+        # Nenhum Future fica sem resposta se algo ainda estiver na fila
+        while True:
+            try:
+                item = self._fila.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _PARAR and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("Agendador de inferência encerrado"))
+
+    def _processar(self, lote):
+        # Ignorar pedidos cancelados antes de começar
+        pendentes = [(imagem, futuro) for imagem, futuro in lote if futuro.set_running_or_notify_cancel()]
+        if not pendentes:
+            return
+
+        try:
+            resultados = inferencia.fazer_predicao_lote(
+                self.modelo, [imagem for imagem, _ in pendentes], tamanho_lote=len(pendentes)
+            )
+        except Exception as e:
+            for _, futuro in pendentes:
+                futuro.set_exception(e)
+            return
+
+        for (_, futuro), resultado in zip(pendentes, resultados):
+            futuro.set_result(resultado)
+
+        with self._lock:
+            self._lotes += 1
+            self._imagens += len(pendentes)
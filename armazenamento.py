@@ -0,0 +1,396 @@
+import atexit
+import copy
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from inferencia import CLASSES
+
+# ================================================
+# 💾 ARMAZENAMENTO DOS PERFIS
+# ================================================
+# Perfis (contadores da gamificação) e resgates ficam em um armazenamento
+# persistente, compartilhado por sessões e réplicas. As detecções ficam só
+# no registro colunar (registro_deteccoes.py), de onde saem o histórico e
+# os agregados do dashboard.
+# - ArmazenamentoPerfis: interface dos backends (SQLite em modo WAL aqui;
+#   outro banco só precisa implementar carregar/gravar_lote).
+# - RepositorioPerfis: cache LRU dos perfis em memória + gravação adiada
+#   (write-behind): as operações entram em uma fila e uma thread as grava
+#   em lotes, uma transação por lote, a cada `intervalo_gravacao_s` ou
+#   quando a fila passa de `lote_max`.
+# Os contadores ficam na linha do perfil (leitura O(1)).
+# Cada usuário deve ser atendido por uma réplica de cada vez (sessões
+# fixas); as demais veem as alterações depois de `validade_cache_s`.
+
+ARMAZENAMENTO_CONFIG = {
+    'backend': os.environ.get('ECOIA_ARMAZENAMENTO', 'sqlite'),
+    'caminho': os.environ.get('ECOIA_BANCO', 'ecodetector.db'),
+    'intervalo_gravacao_s': 1.0,             # Perde no máximo isso se o processo morrer
+    'lote_max': 256,                         # Operações que antecipam a gravação
+    'max_perfis_cache': 1024,
+    # Perfis sem alterações pendentes são relidos depois disso (outras réplicas)
+    'validade_cache_s': 30.0
+}
+
+# Operação da fila: (tipo, usuario_id, dados)
+Operacao = Tuple[str, str, Optional[Dict]]
+
+def perfil_novo() -> Dict:
+    """Perfil de um usuário sem nenhuma detecção"""
+    return {
+        'ecomoedas_total': 0,
+        'deteccoes_realizadas': 0,
+        'medalhas_conquistadas': [],
+        'impacto_total': {'co2': 0.0, 'energia': 0.0, 'agua': 0.0},
+        'contadores_classe': {classe: 0 for classe in CLASSES},
+        'streak_atual': 0,
+        'nivel_usuario': 1,
+        'xp_total': 0,
+        'data_ultimo_acesso': datetime.now().isoformat(),
+        'recompensas_resgatadas': []
+    }
+
+# Listas carregadas de suas próprias tabelas, fora da linha do perfil
+LISTAS_PERFIL = ('recompensas_resgatadas',)
+
+class ArmazenamentoPerfis:
+    """Interface comum dos backends de perfis"""
+
+    nome = 'base'
+
+    def carregar(self, usuario_id: str) -> Optional[Dict]:
+        """Perfil com os resgates, ou None"""
+        raise NotImplementedError
+
+    def gravar_lote(self, operacoes: List[Operacao], perfis: Dict[str, Dict]):
+        """
+        Aplica as operações na ordem e grava os perfis (sem as listas),
+        tudo ou nada
+        """
+        raise NotImplementedError
+
+    def fechar(self):
+        pass
+
+class ArmazenamentoSqlite(ArmazenamentoPerfis):
+    """SQLite em modo WAL: leitores não bloqueiam a thread de gravação"""
+
+    nome = 'sqlite'
+
+    ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS perfis (
+        usuario_id TEXT PRIMARY KEY,
+        ecomoedas_total INTEGER NOT NULL,
+        dados TEXT NOT NULL,
+        atualizado_em REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS resgates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id TEXT NOT NULL,
+        recompensa_id TEXT NOT NULL,
+        nome TEXT NOT NULL,
+        categoria TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        custo INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS resgates_usuario ON resgates (usuario_id, id);
+    """
+
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = caminho or ARMAZENAMENTO_CONFIG['caminho']
+        self._local = threading.local()
+        self._conexoes = []
+        self._lock = threading.Lock()
+        self._conexao().executescript(self.ESQUEMA)
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=5.0, isolation_level=None,
+                                      check_same_thread=False)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+            with self._lock:
+                self._conexoes.append(conexao)
+        return conexao
+
+    def carregar(self, usuario_id: str) -> Optional[Dict]:
+        conexao = self._conexao()
+        linha = conexao.execute("SELECT dados FROM perfis WHERE usuario_id = ?", (usuario_id,)).fetchone()
+        if linha is None:
+            return None
+
+        perfil = json.loads(linha[0])
+        # Perfis gravados quando as detecções também iam para o SQLite
+        perfil.pop('deteccoes_recentes', None)
+        resgates = conexao.execute(
+            "SELECT recompensa_id, nome, categoria, timestamp, custo FROM resgates "
+            "WHERE usuario_id = ? ORDER BY id", (usuario_id,)
+        ).fetchall()
+        perfil['recompensas_resgatadas'] = [
+            {'id': r, 'nome': n, 'categoria': cat, 'timestamp': t, 'custo': custo}
+            for r, n, cat, t, custo in resgates
+        ]
+        return perfil
+
+    def gravar_lote(self, operacoes: List[Operacao], perfis: Dict[str, Dict]):
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            for tipo, usuario_id, dados in operacoes:
+                if tipo == 'resgate':
+                    conexao.execute(
+                        "INSERT INTO resgates (usuario_id, recompensa_id, nome, categoria, timestamp, custo) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (usuario_id, dados['id'], dados['nome'], dados['categoria'], dados['timestamp'], dados['custo'])
+                    )
+                elif tipo == 'remover':
+                    for tabela in ('resgates', 'perfis'):
+                        conexao.execute(f"DELETE FROM {tabela} WHERE usuario_id = ?", (usuario_id,))
+                else:
+                    raise ValueError(f"Operação desconhecida: {tipo}")
+
+            agora = time.time()
+            conexao.executemany(
+                "INSERT INTO perfis (usuario_id, ecomoedas_total, dados, atualizado_em) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (usuario_id) DO UPDATE SET ecomoedas_total = excluded.ecomoedas_total, "
+                "dados = excluded.dados, atualizado_em = excluded.atualizado_em",
+                [(usuario_id, perfil['ecomoedas_total'], json.dumps(perfil), agora)
+                 for usuario_id, perfil in perfis.items()]
+            )
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+    def fechar(self):
+        with self._lock:
+            for conexao in self._conexoes:
+                conexao.close()
+            self._conexoes.clear()
+        self._local = threading.local()
+
+def criar_armazenamento(backend: Optional[str] = None) -> ArmazenamentoPerfis:
+    """Backend configurado em ARMAZENAMENTO_CONFIG['backend']"""
+    backend = backend or ARMAZENAMENTO_CONFIG['backend']
+    if backend == 'sqlite':
+        return ArmazenamentoSqlite()
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+
+# ================================================
+# 🗃️ REPOSITÓRIO (CACHE + WRITE-BEHIND)
+# ================================================
+
+class RepositorioPerfis:
+    """
+    Perfis em memória (LRU + validade) com gravação adiada em lotes.
+
+    As páginas leem e alteram o dicionário do perfil; alterações passam por
+    `editar` (marca o perfil como sujo) e os resgates por `registrar_resgate`
+    (entram na fila). Perfis com
+    alterações pendentes nunca saem do cache antes de gravados.
+    Seguro para uso entre threads/sessões.
+    """
+
+    def __init__(self, armazenamento: ArmazenamentoPerfis, intervalo_gravacao_s: Optional[float] = None,
+                 lote_max: Optional[int] = None, max_perfis: Optional[int] = None,
+                 validade_s: Optional[float] = None):
+        self.armazenamento = armazenamento
+        self.intervalo = ARMAZENAMENTO_CONFIG['intervalo_gravacao_s'] if intervalo_gravacao_s is None \
+            else intervalo_gravacao_s
+        self.lote_max = lote_max or ARMAZENAMENTO_CONFIG['lote_max']
+        self.max_perfis = max_perfis or ARMAZENAMENTO_CONFIG['max_perfis_cache']
+        self.validade = ARMAZENAMENTO_CONFIG['validade_cache_s'] if validade_s is None else validade_s
+
+        self._perfis = OrderedDict()   # usuario_id -> (carregado_em, perfil)
+        self._fila: List[Operacao] = []
+        self._sujos = set()
+        self._em_gravacao = set()       # Gravados mas ainda sem COMMIT
+        self._lock = threading.RLock()
+        self._lock_gravacao = threading.Lock()
+        self._acordar = threading.Event()
+        self._encerrado = False
+        self.acertos = 0
+        self.falhas = 0
+        self.lotes = 0
+        self.operacoes = 0
+
+        self._thread = threading.Thread(target=self._executar, name="gravacao-perfis", daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)
+
+    # ---------- leitura ----------
+
+    def perfil(self, usuario_id: str) -> Dict:
+        """Perfil do usuário (do cache, do armazenamento ou novo)"""
+        inicio = time.monotonic()
+        with self._lock:
+            perfil = self._em_cache(usuario_id)
+            if perfil is not None:
+                self.acertos += 1
+                return perfil
+            self.falhas += 1
+
+        # A consulta ao armazenamento roda fora do lock: uma falha de cache
+        # não para as outras sessões
+        carregado = self.armazenamento.carregar(usuario_id) or perfil_novo()
+
+        with self._lock:
+            # Checagem dupla: se outra thread carregou, gravou, editou ou
+            # resetou o perfil durante a leitura, o que está no cache vence
+            entrada = self._perfis.get(usuario_id)
+            if entrada is not None and (entrada[0] >= inicio or usuario_id in self._sujos
+                                        or usuario_id in self._em_gravacao):
+                self._perfis.move_to_end(usuario_id)
+                return entrada[1]
+            if entrada is not None:
+                # Quem já tem o dicionário antigo (outras abas) passa a ver o novo
+                # estado; update sem clear para leitores concorrentes nunca verem
+                # uma chave faltando
+                entrada[1].update(carregado)
+                carregado = entrada[1]
+            self._perfis[usuario_id] = (time.monotonic(), carregado)
+            self._perfis.move_to_end(usuario_id)
+            self._limitar_cache()
+            return carregado
+
+    def _em_cache(self, usuario_id: str) -> Optional[Dict]:
+        """Perfil do cache se ainda válido (chamar com o lock)"""
+        entrada = self._perfis.get(usuario_id)
+        valido = entrada is not None and (
+            usuario_id in self._sujos or usuario_id in self._em_gravacao
+            or time.monotonic() - entrada[0] < self.validade)
+        if not valido:
+            return None
+        self._perfis.move_to_end(usuario_id)
+        return entrada[1]
+
+    def _limitar_cache(self):
+        excedente = len(self._perfis) - self.max_perfis
+        for usuario_id in list(self._perfis):
+            if excedente <= 0:
+                break
+            if usuario_id not in self._sujos and usuario_id not in self._em_gravacao:
+                del self._perfis[usuario_id]
+                excedente -= 1
+
+    # ---------- escrita ----------
+
+    @contextlib.contextmanager
+    def editar(self, usuario_id: str):
+        """Entrega o perfil para alteração e o marca para gravação"""
+        # Carrega antes de pegar o lock (uma falha de cache lê o armazenamento)
+        perfil = self.perfil(usuario_id)
+        with self._lock:
+            entrada = self._perfis.get(usuario_id)
+            if entrada is None:
+                # Saiu do cache (LRU) entre a carga e o lock: volta com o dicionário em mãos
+                self._perfis[usuario_id] = (time.monotonic(), perfil)
+            else:
+                perfil = entrada[1]
+            try:
+                yield perfil
+            finally:
+                self._sujos.add(usuario_id)
+
+    def registrar_resgate(self, usuario_id: str, resgate: Dict):
+        with self.editar(usuario_id) as perfil:
+            perfil['recompensas_resgatadas'].append(resgate)
+            self._enfileirar(('resgate', usuario_id, resgate))
+
+    def resetar(self, usuario_id: str) -> Dict:
+        """Apaga os resgates do usuário e recomeça o perfil do zero"""
+        with self._lock:
+            self._enfileirar(('remover', usuario_id, None))
+            perfil = perfil_novo()
+            entrada = self._perfis.get(usuario_id)
+            if entrada is not None:
+                entrada[1].update(perfil)
+                perfil = entrada[1]
+            self._perfis[usuario_id] = (time.monotonic(), perfil)
+            self._sujos.add(usuario_id)
+            return perfil
+
+    def _enfileirar(self, operacao: Operacao):
+        self._fila.append(operacao)
+        if len(self._fila) >= self.lote_max:
+            self._acordar.set()
+
+    # ---------- gravação ----------
+
+    def descarregar(self) -> int:
+        """Grava agora as operações e perfis pendentes; retorna quantas operações"""
+        with self._lock_gravacao:
+            with self._lock:
+                operacoes, self._fila = self._fila, []
+                sujos, self._sujos = self._sujos, set()
+                self._em_gravacao = sujos
+                perfis = {}
+                for usuario_id in sujos:
+                    entrada = self._perfis.get(usuario_id)
+                    if entrada is not None:
+                        perfis[usuario_id] = {chave: copy.deepcopy(valor) for chave, valor in entrada[1].items()
+                                              if chave not in LISTAS_PERFIL}
+            if not operacoes and not perfis:
+                return 0
+
+            try:
+                self.armazenamento.gravar_lote(operacoes, perfis)
+            except Exception:
+                # Devolve à fila (na frente) para a próxima tentativa
+                with self._lock:
+                    self._fila[:0] = operacoes
+                    self._sujos |= sujos
+                    self._em_gravacao = set()
+                raise
+
+            with self._lock:
+                # O que está em memória agora é o que está gravado
+                agora = time.monotonic()
+                for usuario_id in sujos:
+                    if usuario_id in self._perfis:
+                        self._perfis[usuario_id] = (agora, self._perfis[usuario_id][1])
+                self._em_gravacao = set()
+                self.lotes += 1
+                self.operacoes += len(operacoes)
+            return len(operacoes)
+
+    def _executar(self):
+        while not self._encerrado:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.descarregar()
+            except Exception as e:
+                print(f"⚠️ Falha ao gravar perfis (nova tentativa em {self.intervalo:.0f}s): {e}")
+
+    def encerrar(self):
+        """Grava o que está pendente e para a thread de gravação"""
+        if self._encerrado:
+            return
+        self._encerrado = True
+        self._acordar.set()
+        self._thread.join()
+        self.descarregar()
+
+    def estatisticas(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'perfis_em_cache': len(self._perfis),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'pendentes': len(self._fila),
+                'perfis_sujos': len(self._sujos),
+                'lotes': self.lotes,
+                'operacoes': self.operacoes,
+                'operacoes_por_lote': self.operacoes / self.lotes if self.lotes else 0.0
+            }
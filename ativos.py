@@ -0,0 +1,106 @@
+import base64
+import os
+from typing import Dict, List, Optional, Sequence
+
+from PIL import Image
+
+# ================================================
+# 🖼️ ATIVOS ESTÁTICOS (BANNER)
+# ================================================
+# As imagens da interface são convertidas uma única vez em variantes
+# comprimidas (AVIF/WebP em algumas larguras) dentro de static/, servidas
+# pelo próprio Streamlit (server.enableStaticServing em .streamlit/config.toml).
+# A cada rerun a página recebe só algumas linhas de CSS com as URLs,
+# em vez da imagem inteira em base64.
+
+ATIVOS_CONFIG = {
+    'pasta_estatica': 'static',      # Servida em app/static/ pelo Streamlit
+    'subpasta': 'ativos',
+    'larguras': (640, 1024, 1536),
+    # Formato -> qualidade; na ordem de preferência do navegador
+    'formatos': {'avif': 55, 'webp': 80}
+}
+
+TIPOS_MIME = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+def formatos_suportados(formatos: Sequence[str]) -> List[str]:
+    """Formatos que o Pillow instalado consegue gravar"""
+    from PIL import features
+    return [formato for formato in formatos if features.check(formato)]
+
+def preparar_ativo(caminho: str, larguras: Optional[Sequence[int]] = None,
+                   formatos: Optional[Dict[str, int]] = None) -> List[Dict]:
+    """
+    Gera (se ausentes ou mais antigas que a original) as variantes de uma
+    imagem e retorna uma lista com formato, largura, arquivo, url e bytes.
+    Larguras maiores que a original não são geradas.
+    """
+    larguras = larguras or ATIVOS_CONFIG['larguras']
+    formatos = formatos or ATIVOS_CONFIG['formatos']
+    pasta = os.path.join(ATIVOS_CONFIG['pasta_estatica'], ATIVOS_CONFIG['subpasta'])
+    os.makedirs(pasta, exist_ok=True)
+
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    modificado = os.path.getmtime(caminho)
+    variantes = []
+
+    with Image.open(caminho) as original:
+        original = original.convert('RGB')
+        larguras = sorted({min(largura, original.width) for largura in larguras})
+
+        for formato in formatos_suportados(formatos):
+            for largura in larguras:
+                arquivo = os.path.join(pasta, f"{nome}-{largura}.{formato}")
+                if not os.path.exists(arquivo) or os.path.getmtime(arquivo) < modificado:
+                    altura = round(original.height * largura / original.width)
+                    reduzida = original.resize((largura, altura), Image.LANCZOS)
+                    reduzida.save(arquivo + '.tmp', format=formato.upper(), quality=formatos[formato])
+                    os.replace(arquivo + '.tmp', arquivo)
+                variantes.append({
+                    'formato': formato,
+                    'largura': largura,
+                    'arquivo': arquivo,
+                    'url': url_estatica(arquivo),
+                    'bytes': os.path.getsize(arquivo)
+                })
+
+    return variantes
+
+def url_estatica(arquivo: str) -> str:
+    """URL relativa de um arquivo dentro de static/ (servido em app/static/)"""
+    relativo = os.path.relpath(arquivo, ATIVOS_CONFIG['pasta_estatica'])
+    return 'app/static/' + relativo.replace(os.sep, '/')
+
+def css_fundo_responsivo(seletor: str, variantes: List[Dict]) -> str:
+    """
+    CSS de background-image com image-set (AVIF com fallback WebP) e uma
+    largura por faixa de tela; navegadores sem image-set usam o WebP
+    """
+    larguras = sorted({v['largura'] for v in variantes})
+    por_largura = {largura: [v for v in variantes if v['largura'] == largura] for largura in larguras}
+
+    def regra(grupo: List[Dict]) -> str:
+        fallback = next((v for v in grupo if v['formato'] == 'webp'), grupo[-1])
+        opcoes = ', '.join(f'url("{v["url"]}") type("{TIPOS_MIME[v["formato"]]}")' for v in grupo)
+        return (f'{seletor} {{ background-image: url("{fallback["url"]}"); '
+                f'background-image: image-set({opcoes}); }}')
+
+    regras = []
+    anterior = 0
+    for i, largura in enumerate(larguras):
+        if i == len(larguras) - 1:
+            consulta = f'(min-width: {anterior + 1}px)' if anterior else None
+        elif anterior:
+            consulta = f'(min-width: {anterior + 1}px) and (max-width: {largura}px)'
+        else:
+            consulta = f'(max-width: {largura}px)'
+        regras.append(f'@media {consulta} {{ {regra(por_largura[largura])} }}' if consulta
+                      else regra(por_largura[largura]))
+        anterior = largura
+    return '\n'.join(regras)
+
+def data_url(variante: Dict) -> str:
+    """Variante embutida como data URL (quando o servidor estático está desligado)"""
+    with open(variante['arquivo'], 'rb') as arquivo:
+        codificado = base64.b64encode(arquivo.read()).decode()
+    return f"data:{TIPOS_MIME[variante['formato']]};base64,{codificado}"
@@ -0,0 +1,102 @@
+"""
+Perfis persistentes: gravação direta x gravação adiada em lotes (write-behind).
+
+Várias threads (sessões) atualizam os contadores do perfil a cada detecção,
+ao mesmo tempo, em um banco SQLite temporário (as linhas das detecções vão
+para o registro colunar, medido em benchmarks/registro.py):
+- direta: cada atualização é gravada e confirmada (COMMIT) antes de voltar;
+- em lotes: RepositorioPerfis marca o perfil e a thread de gravação
+  confirma um lote por intervalo.
+Reporta a vazão e a latência p50/p95/p99 de cada atualização, e o tempo de
+carregar um perfil (cache x banco).
+
+Uso:
+    python -m benchmarks.armazenamento --sessoes 8 --deteccoes 200
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from armazenamento import ArmazenamentoSqlite, RepositorioPerfis
+from benchmarks.comum import percentis
+
+def executar_carga(repositorio, sessoes, deteccoes, direta):
+    """Cada sessão (thread) registra `deteccoes` detecções no próprio perfil"""
+    latencias = []
+    lock = threading.Lock()
+    barreira = threading.Barrier(sessoes + 1)
+
+    def sessao(indice):
+        usuario_id = f"usuario_{indice}"
+        repositorio.perfil(usuario_id)
+        barreira.wait()
+        locais = []
+        for i in range(deteccoes):
+            inicio = time.perf_counter()
+            with repositorio.editar(usuario_id) as perfil:
+                perfil['ecomoedas_total'] += 10 + i % 5
+                perfil['deteccoes_realizadas'] += 1
+                perfil['contadores_classe']['metal'] += 1
+            if direta:
+                repositorio.descarregar()
+            locais.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(locais)
+
+    threads = [threading.Thread(target=sessao, args=(i,)) for i in range(sessoes)]
+    for thread in threads:
+        thread.start()
+
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    repositorio.descarregar()
+    duracao = time.perf_counter() - inicio
+    return len(latencias) / duracao, percentis(latencias)
+
+def medir_leitura(repositorio, armazenamento, usuario_id, repeticoes=200):
+    """Tempo médio (ms) de ler o perfil do cache e direto do banco"""
+    repositorio.perfil(usuario_id)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        repositorio.perfil(usuario_id)
+    cache = (time.perf_counter() - inicio) / repeticoes
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        armazenamento.carregar(usuario_id)
+    banco = (time.perf_counter() - inicio) / repeticoes
+    return cache * 1000, banco * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do armazenamento de perfis")
+    parser.add_argument('--sessoes', type=int, default=8)
+    parser.add_argument('--deteccoes', type=int, default=200, help="Detecções por sessão")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        print(f"💾 {args.sessoes} sessões x {args.deteccoes} detecções (SQLite WAL)")
+        for nome, direta in (('direta', True), ('em lotes', False)):
+            armazenamento = ArmazenamentoSqlite(os.path.join(pasta, f"{nome}.db"))
+            repositorio = RepositorioPerfis(armazenamento)
+            vazao, lat = executar_carga(repositorio, args.sessoes, args.deteccoes, direta)
+            estatisticas = repositorio.estatisticas()
+            repositorio.encerrar()
+            print(f"{nome:<10} {vazao:>10.0f} det/s   p50 {lat['p50']:>7.3f} ms   p95 {lat['p95']:>7.3f} ms   "
+                  f"p99 {lat['p99']:>7.3f} ms   {estatisticas['lotes']:>6} lotes")
+
+        # Leitura de um perfil já gravado
+        armazenamento = ArmazenamentoSqlite(os.path.join(pasta, 'leitura.db'))
+        repositorio = RepositorioPerfis(armazenamento)
+        with repositorio.editar('leitor') as perfil:
+            perfil['deteccoes_realizadas'] = 100_000
+        repositorio.descarregar()
+        cache, banco = medir_leitura(repositorio, armazenamento, 'leitor')
+        print(f"\n📖 Leitura do perfil: cache {cache:.4f} ms, banco {banco:.3f} ms")
+        repositorio.encerrar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Paridade e latência entre os backends PyTorch e ONNX Runtime.
+
+1. Paridade: as probabilidades dos dois backends devem coincidir dentro
+   de --tolerancia e as classes preditas devem ser iguais (o script sai
+   com código 1 caso contrário).
+2. Latência: mediana por lote de 1 e de --lote imagens.
+3. Processo de serviço: tempo de inicialização, RSS máximo e se o torch
+   foi importado, cada backend em um processo novo (Linux).
+
+Se os artefatos não existirem, são gerados com pesos aleatórios.
+
+Uso:
+    python -m benchmarks.backends --imagens 32 --lote 16
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from inferencia import MODEL_CONFIG
+from benchmarks.comum import imagens_sinteticas
+
+CODIGO_PROCESSO = """
+import json, sys, time
+inicio = time.perf_counter()
+import inferencia
+inferencia.MODEL_CONFIG['model_path'] = sys.argv[2]
+inferencia.MODEL_CONFIG['torchscript_path'] = None
+inferencia.MODEL_CONFIG['onnx_path'] = sys.argv[3]
+backend = inferencia.carregar_modelo_inferencia(sys.argv[1])
+from benchmarks.comum import imagens_sinteticas
+inferencia.fazer_predicao(backend, imagens_sinteticas(1)[0])
+inicializacao = time.perf_counter() - inicio
+# Pico de memória residente deste processo (VmHWM não herda do processo pai)
+with open('/proc/self/status') as status:
+    rss_kb = next(int(l.split()[1]) for l in status if l.startswith('VmHWM'))
+print(json.dumps({
+    'inicializacao': inicializacao,
+    'rss_mb': rss_kb / 1024,
+    'torch_importado': 'torch' in sys.modules
+}))
+"""
+
+def gerar_artefatos(diretorio):
+    """Gera state dict e ONNX com pesos aleatórios"""
+    import torch
+    from inferencia_torch import criar_modelo
+    from treinar_modelo import export_onnx
+
+    torch.manual_seed(0)
+    modelo = criar_modelo().eval()
+    caminho_pt = os.path.join(diretorio, 'modelo.pt')
+    caminho_onnx = os.path.join(diretorio, 'modelo.onnx')
+    torch.save(modelo.state_dict(), caminho_pt)
+    export_onnx(modelo, caminho_onnx)
+    return caminho_pt, caminho_onnx
+
+def medir_latencia(backend, imagens, repeticoes=10):
+    backend.prever_probabilidades(imagens)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        backend.prever_probabilidades(imagens)
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos)) * 1000
+
+def medir_processo(nome, caminho_pt, caminho_onnx):
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    saida = subprocess.run(
+        [sys.executable, '-c', CODIGO_PROCESSO, nome, caminho_pt, caminho_onnx],
+        capture_output=True, text=True, check=True, cwd=raiz
+    )
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridade e latência: PyTorch x ONNX Runtime")
+    parser.add_argument('--imagens', type=int, default=32)
+    parser.add_argument('--lote', type=int, default=16)
+    parser.add_argument('--tolerancia', type=float, default=1e-4)
+    args = parser.parse_args()
+
+    from inferencia_onnx import BackendOnnx
+    from inferencia_torch import BackendTorch, carregar_pesos
+
+    with tempfile.TemporaryDirectory() as temporario:
+        caminho_pt = os.path.abspath(MODEL_CONFIG['model_path'])
+        caminho_onnx = os.path.abspath(MODEL_CONFIG['onnx_path'])
+        if not (os.path.exists(caminho_pt) and os.path.exists(caminho_onnx)):
+            print("⚠️ Artefatos não encontrados, gerando com pesos aleatórios...")
+            caminho_pt, caminho_onnx = gerar_artefatos(temporario)
+
+        backends = {
+            'torch': BackendTorch(carregar_pesos(caminho_pt)),
+            'onnx': BackendOnnx(caminho_onnx)
+        }
+        imagens = imagens_sinteticas(args.imagens)
+
+        # 1. Paridade
+        prob_torch = backends['torch'].prever_probabilidades(imagens)
+        prob_onnx = backends['onnx'].prever_probabilidades(imagens)
+        diferenca = float(np.abs(prob_torch - prob_onnx).max())
+        mesmas_classes = bool((prob_torch.argmax(1) == prob_onnx.argmax(1)).all())
+        paridade_ok = diferenca <= args.tolerancia and mesmas_classes
+
+        print(f"\n🔍 Paridade ({args.imagens} imagens): diferença máx. {diferenca:.2e}, "
+              f"classes iguais: {'sim' if mesmas_classes else 'NÃO'} -> {'✅ OK' if paridade_ok else '❌ FALHOU'}")
+
+        # 2. Latência
+        print(f"\n⏱️ Latência (mediana, ms)")
+        print(f"{'':<8} {'1 img':>10} {f'{args.lote} imgs':>10}")
+        for nome, backend in backends.items():
+            print(f"{nome:<8} {medir_latencia(backend, imagens[:1]):>10.1f} "
+                  f"{medir_latencia(backend, imagens[:args.lote]):>10.1f}")
+
+        # 3. Processo de serviço
+        print(f"\n📦 Processo novo por backend")
+        print(f"{'':<8} {'inicialização (s)':>18} {'RSS (MB)':>10} {'torch':>7}")
+        for nome in backends:
+            r = medir_processo(nome, caminho_pt, caminho_onnx)
+            print(f"{nome:<8} {r['inicializacao']:>18.2f} {r['rss_mb']:>10.0f} "
+                  f"{'sim' if r['torch_importado'] else 'não':>7}")
+
+    if not paridade_ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
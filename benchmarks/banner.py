@@ -0,0 +1,94 @@
+"""
+Banner do cabeçalho: PNG em base64 a cada rerun x variantes AVIF/WebP
+servidas em app/static/ (ativos.py).
+
+Roda o cabeçalho no AppTest do Streamlit e mede, por rerun:
+- bytes do markdown enviado ao navegador pelo cabeçalho;
+- CPU do servidor (tempo de processo do rerun).
+
+Também mostra o custo único de gerar as variantes e o tamanho de cada
+uma (o navegador baixa uma vez e guarda em cache).
+
+Uso:
+    python -m benchmarks.banner --reruns 30
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import streamlit as st
+from streamlit import config
+from streamlit.testing.v1 import AppTest
+
+import ativos
+
+def cabecalho_antigo():
+    import base64
+    import streamlit as st
+
+    with open("img/tela_inicial.png", "rb") as img_file:
+        encoded = base64.b64encode(img_file.read()).decode()
+    st.markdown(f"""
+    <style>
+    .eco-header {{
+        background-image: url("data:image/png;base64,{encoded}");
+        background-size: cover;
+    }}
+    </style>
+    <div class="eco-header"></div>
+    """, unsafe_allow_html=True)
+
+def cabecalho_novo():
+    import interface
+    interface.criar_header()
+
+def medir(script, reruns, estatico):
+    """Bytes do markdown e CPU média por rerun (ignora o 1º, que aquece caches)"""
+    config.set_option('server.enableStaticServing', estatico)
+    st.cache_resource.clear()  # O CSS do banner depende da opção acima
+    app = AppTest.from_function(script, default_timeout=120)
+    app.run()
+    enviados = sum(len(elemento.value) for elemento in app.markdown)
+
+    inicio = time.process_time()
+    for _ in range(reruns):
+        app.run()
+    cpu = (time.process_time() - inicio) / reruns
+    assert not app.exception, app.exception
+    return enviados, cpu
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do banner do cabeçalho")
+    parser.add_argument('--reruns', type=int, default=30)
+    args = parser.parse_args()
+
+    # Custo único de gerar as variantes (em uma pasta temporária)
+    pasta_original = ativos.ATIVOS_CONFIG['pasta_estatica']
+    with tempfile.TemporaryDirectory() as temporario:
+        ativos.ATIVOS_CONFIG['pasta_estatica'] = temporario
+        inicio = time.perf_counter()
+        variantes = ativos.preparar_ativo("img/tela_inicial.png")
+        preparo = time.perf_counter() - inicio
+        ativos.ATIVOS_CONFIG['pasta_estatica'] = pasta_original
+
+    original = os.path.getsize("img/tela_inicial.png")
+    print(f"🖼️ Original: {original / 1e6:.2f} MB (PNG); variantes geradas em {preparo:.2f}s (uma vez)")
+    for v in variantes:
+        print(f"   {v['formato']:>5} {v['largura']:>5}px {v['bytes'] / 1e3:>8.1f} KB")
+
+    modos = [
+        ('PNG base64 por rerun', cabecalho_antigo, True),
+        ('Estático (AVIF/WebP)', cabecalho_novo, True),
+        ('Sem servidor estático', cabecalho_novo, False),
+    ]
+    resultados = [(nome, *medir(script, args.reruns, estatico)) for nome, script, estatico in modos]
+
+    base_bytes, base_cpu = resultados[0][1:]
+    print(f"\n📈 CUSTO POR RERUN ({args.reruns} reruns)")
+    print(f"   {'':<24} {'bytes':>12} {'CPU (ms)':>10} {'redução':>9}")
+    for nome, enviados, cpu in resultados:
+        print(f"   {nome:<24} {enviados:>12,} {cpu * 1000:>10.2f} {base_bytes / max(enviados, 1):>8.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Teste de carga do agendador de micro-lotes.
+
+Simula várias sessões do Streamlit chamando o modelo ao mesmo tempo e
+compara as chamadas diretas (um forward por pedido, como antes) com o
+AgendadorInferencia. Reporta vazão (imagens/s) e latência p50/p95/p99.
+
+Uso:
+    python -m benchmarks.carga_agendador --clientes 16 --pedidos 20 --espera-ms 10
+"""
+import argparse
+import threading
+import time
+
+import inferencia
+from agendador import AgendadorInferencia
+from benchmarks.comum import carregar_modelo_benchmark, imagens_sinteticas, percentis
+
+def executar_carga(chamar, imagens, clientes, pedidos):
+    """Dispara `clientes` threads, cada uma fazendo `pedidos` predições"""
+    latencias = []
+    lock = threading.Lock()
+    barreira = threading.Barrier(clientes + 1)
+
+    def cliente(indice):
+        barreira.wait()
+        locais = []
+        for i in range(pedidos):
+            imagem = imagens[(indice * pedidos + i) % len(imagens)]
+            inicio = time.perf_counter()
+            chamar(imagem)
+            locais.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(locais)
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for thread in threads:
+        thread.start()
+
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    return len(latencias) / duracao, percentis(latencias)
+
+def mostrar(nome, vazao, lat):
+    print(f"{nome:<12} {vazao:>10.1f} img/s   "
+          f"p50 {lat['p50']:>8.1f} ms   p95 {lat['p95']:>8.1f} ms   p99 {lat['p99']:>8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do agendador de micro-lotes")
+    parser.add_argument('--modelo', default=None, help="Caminho do modelo (padrão: MODEL_CONFIG)")
+    parser.add_argument('--clientes', type=int, default=16, help="Sessões simultâneas")
+    parser.add_argument('--pedidos', type=int, default=20, help="Predições por sessão")
+    parser.add_argument('--espera-ms', type=float, default=10, help="Espera máxima para formar um lote")
+    parser.add_argument('--lote-max', type=int, default=32, help="Tamanho máximo do micro-lote")
+    args = parser.parse_args()
+
+    modelo = carregar_modelo_benchmark(args.modelo)
+    imagens = imagens_sinteticas(64)
+
+    # Aquecimento
+    inferencia.fazer_predicao_lote(modelo, imagens[:4])
+
+    print(f"\n🚦 {args.clientes} clientes x {args.pedidos} pedidos\n")
+
+    vazao, lat = executar_carga(lambda img: inferencia.fazer_predicao(modelo, img),
+                                imagens, args.clientes, args.pedidos)
+    mostrar("direto", vazao, lat)
+
+    agendador = AgendadorInferencia(modelo, tamanho_lote_max=args.lote_max, espera_max_ms=args.espera_ms)
+    vazao_ag, lat_ag = executar_carga(lambda img: agendador.submeter(img).result(),
+                                      imagens, args.clientes, args.pedidos)
+    agendador.encerrar()
+    mostrar("agendador", vazao_ag, lat_ag)
+
+    stats = agendador.estatisticas()
+    print(f"\n📦 {stats['lotes']} lotes, tamanho médio {stats['tamanho_medio_lote']:.1f}")
+    print(f"🚀 Ganho de vazão: {vazao_ag / vazao:.2f}x")
+
+if __name__ == "__main__":
+    main()
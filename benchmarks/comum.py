@@ -0,0 +1,46 @@
+"""
+Utilitários compartilhados pelos benchmarks.
+
+Os scripts devem ser executados a partir da raiz do projeto, por exemplo:
+    python -m benchmarks.carga_agendador
+"""
+import os
+from typing import Dict, List, Sequence
+
+import numpy as np
+from PIL import Image
+
+import inferencia
+from inferencia import MODEL_CONFIG
+
+def carregar_modelo_benchmark(caminho: str = None):
+    """Carrega o modelo treinado ou, se não existir, um com pesos aleatórios"""
+    import inferencia_torch
+
+    if caminho and os.path.exists(caminho):
+        print(f"📦 Usando modelo treinado: {caminho}")
+        return inferencia_torch.carregar_pesos(caminho)
+    if caminho is None and inferencia.modelo_disponivel():
+        print("📦 Usando modelo treinado do MODEL_CONFIG")
+        return inferencia.carregar_modelo_inferencia()
+
+    print(f"⚠️ '{caminho or MODEL_CONFIG['model_path']}' não encontrado, "
+          "usando pesos aleatórios (mesmo custo de inferência)")
+    return inferencia_torch.criar_modelo().eval()
+
+def imagens_sinteticas(quantidade: int, tamanho=(640, 480), semente: int = 0) -> List[Image.Image]:
+    """Gera imagens RGB aleatórias para medir custo de inferência"""
+    rng = np.random.default_rng(semente)
+    return [
+        Image.fromarray(rng.integers(0, 256, (tamanho[1], tamanho[0], 3), dtype=np.uint8))
+        for _ in range(quantidade)
+    ]
+
+def percentis(latencias: Sequence[float]) -> Dict[str, float]:
+    """Retorna p50/p95/p99 em milissegundos"""
+    valores = np.asarray(latencias) * 1000
+    return {
+        'p50': float(np.percentile(valores, 50)),
+        'p95': float(np.percentile(valores, 95)),
+        'p99': float(np.percentile(valores, 99))
+    }
@@ -0,0 +1,151 @@
+"""
+Interações da interface: rerun completo x rerun só do fragmento.
+
+Sobe `streamlit run interface.py` em uma porta local e conversa com ele pelo
+mesmo websocket do navegador. Cada interação (marcar "🔥 Mapa de Calor" na
+página de pontos de coleta, clicar em um exemplo no detector) é enviada de
+duas formas:
+- como rerun completo (o que acontecia antes dos fragmentos);
+- como rerun do fragmento que contém o widget (o que o navegador faz agora).
+
+Mede por interação a CPU do processo do servidor, a latência até o fim do
+rerun e os bytes de ForwardMsg recebidos.
+
+Uso:
+    python -m benchmarks.fragmentos --interacoes 30
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+def cpu_processo(pid):
+    """Tempo de CPU (usuário + sistema) de um processo, em segundos (Linux)"""
+    with open(f"/proc/{pid}/stat") as arquivo:
+        campos = arquivo.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+class Sessao:
+    """Uma aba do navegador: envia reruns e lê os widgets renderizados"""
+
+    def __init__(self, url):
+        self.url = url
+        self.widgets = {}   # rótulo -> (tipo, id, fragment_id)
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    async def rerun(self, estados=(), fragment_id=''):
+        """Envia um rerun e espera o fim; retorna os bytes recebidos"""
+        mensagem = BackMsg()
+        mensagem.rerun_script.query_string = ''
+        mensagem.rerun_script.fragment_id = fragment_id
+        for widget_id, campo, valor in estados:
+            estado = mensagem.rerun_script.widget_states.widgets.add()
+            estado.id = widget_id
+            setattr(estado, campo, valor)
+        await self.ws.send(mensagem.SerializeToString())
+
+        recebidos = 0
+        while True:
+            dados = await asyncio.wait_for(self.ws.recv(), 120)
+            recebidos += len(dados)
+            msg = ForwardMsg()
+            msg.ParseFromString(dados)
+            tipo = msg.WhichOneof('type')
+            # st.rerun() dentro do script emenda um segundo rerun no mesmo pedido
+            if tipo == 'script_finished' and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return recebidos
+            if tipo == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                elemento = msg.delta.new_element
+                nome = elemento.WhichOneof('type')
+                if nome in ('button', 'checkbox'):
+                    widget = getattr(elemento, nome)
+                    self.widgets[widget.label] = (nome, widget.id, msg.delta.fragment_id)
+
+    async def clicar(self, rotulo, fragmento=False):
+        _, widget_id, fragment_id = self.widgets[rotulo]
+        return await self.rerun([(widget_id, 'trigger_value', True)], fragment_id if fragmento else '')
+
+    async def marcar(self, rotulo, valor, fragmento=False):
+        _, widget_id, fragment_id = self.widgets[rotulo]
+        return await self.rerun([(widget_id, 'bool_value', valor)], fragment_id if fragmento else '')
+
+async def medir(url, pid, pagina, interacao, repeticoes):
+    """CPU do servidor, latência e bytes médios por interação nos dois modos"""
+    resultados = {}
+    for fragmento in (False, True):
+        async with Sessao(url) as sessao:
+            await sessao.rerun()
+            await sessao.clicar(pagina)
+            await interacao(sessao, 0, fragmento)   # aquece caches
+
+            cpu = cpu_processo(pid)
+            inicio = time.perf_counter()
+            recebidos = 0
+            for i in range(repeticoes):
+                recebidos += await interacao(sessao, i + 1, fragmento)
+            resultados[fragmento] = ((cpu_processo(pid) - cpu) / repeticoes,
+                                     (time.perf_counter() - inicio) / repeticoes,
+                                     recebidos / repeticoes)
+    return resultados
+
+async def executar(porta, repeticoes, pid):
+    url = f"ws://localhost:{porta}/_stcore/stream"
+    for _ in range(120):
+        try:
+            async with Sessao(url):
+                break
+        except OSError:
+            await asyncio.sleep(0.5)
+
+    async def camada_calor(sessao, i, fragmento):
+        return await sessao.marcar("🔥 Mapa de Calor", i % 2 == 0, fragmento)
+
+    async def exemplo(sessao, i, fragmento):
+        return await sessao.clicar("📦 PAPELÃO", fragmento)
+
+    casos = [
+        ("Mapa: camada de calor", "🗺️ Pontos de Coleta", camada_calor),
+        ("Detector: exemplo", "🔍 Detector IA", exemplo),
+    ]
+    print(f"📈 CUSTO POR INTERAÇÃO ({repeticoes} interações)")
+    print(f"   {'':<24} {'modo':<10} {'CPU (ms)':>9} {'latência (ms)':>14} {'bytes':>10}")
+    for nome, pagina, interacao in casos:
+        resultados = await medir(url, pid, pagina, interacao, repeticoes)
+        for fragmento, (cpu, latencia, recebidos) in resultados.items():
+            modo = 'fragmento' if fragmento else 'completo'
+            print(f"   {nome:<24} {modo:<10} {cpu * 1000:>9.1f} {latencia * 1000:>14.1f} {recebidos:>10,.0f}")
+        reducao = resultados[False][0] / max(resultados[True][0], 1e-9)
+        print(f"   {'':<24} {'redução':<10} {reducao:>8.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos reruns por fragmento")
+    parser.add_argument('--interacoes', type=int, default=30)
+    parser.add_argument('--porta', type=int, default=8599)
+    args = parser.parse_args()
+
+    servidor = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', 'interface.py', '--server.port', str(args.porta),
+         '--server.headless', 'true', '--server.fileWatcherType', 'none',
+         '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(executar(args.porta, args.interacoes, servidor.pid))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+if __name__ == "__main__":
+    main()
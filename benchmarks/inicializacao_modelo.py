@@ -0,0 +1,101 @@
+"""
+Benchmark de inicialização: state dict x TorchScript.
+
+Cada medição roda em um processo Python novo (como um worker recém
+iniciado ou após o cache do Streamlit ser descartado) e mede o tempo
+de carregar o modelo e fazer a primeira predição.
+
+Se os artefatos não existirem, são gerados com pesos aleatórios em um
+diretório temporário (o custo de carga é o mesmo).
+
+Uso:
+    python -m benchmarks.inicializacao_modelo --repeticoes 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from inferencia import MODEL_CONFIG
+
+CODIGO_MEDICAO = """
+import json, sys, time
+inicio = time.perf_counter()
+import torch
+import inferencia_torch
+importado = time.perf_counter()
+if sys.argv[1] == 'torchscript':
+    modelo = inferencia_torch.carregar_torchscript(sys.argv[2])
+else:
+    modelo = inferencia_torch.carregar_pesos(sys.argv[2])
+carregado = time.perf_counter()
+with torch.no_grad():
+    modelo(torch.zeros(1, 3, 224, 224))
+primeira = time.perf_counter()
+print(json.dumps({
+    'importacao': importado - inicio,
+    'carga': carregado - importado,
+    'primeira_predicao': primeira - carregado,
+    'total': primeira - inicio
+}))
+"""
+
+def medir(modo, caminho, repeticoes):
+    medicoes = []
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, '-c', CODIGO_MEDICAO, modo, caminho],
+            capture_output=True, text=True, check=True, cwd=raiz
+        )
+        medicoes.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+    return {chave: float(np.median([m[chave] for m in medicoes])) for chave in medicoes[0]}
+
+def gerar_artefatos(diretorio):
+    """Gera state dict e TorchScript com pesos aleatórios"""
+    import torch
+    import inferencia_torch
+    from treinar_modelo import export_torchscript
+
+    modelo = inferencia_torch.criar_modelo().eval()
+    caminho_pt = os.path.join(diretorio, 'modelo.pt')
+    caminho_ts = os.path.join(diretorio, 'modelo_ts.pt')
+    torch.save(modelo.state_dict(), caminho_pt)
+    export_torchscript(modelo, caminho_ts)
+    return caminho_pt, caminho_ts
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara inicialização do modelo: state dict x TorchScript")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        caminho_pt = MODEL_CONFIG['model_path']
+        caminho_ts = MODEL_CONFIG['torchscript_path']
+        if not (os.path.exists(caminho_pt) and os.path.exists(caminho_ts)):
+            print("⚠️ Artefatos não encontrados, gerando com pesos aleatórios...")
+            caminho_pt, caminho_ts = gerar_artefatos(temporario)
+
+        resultados = {
+            'state dict': medir('state_dict', os.path.abspath(caminho_pt), args.repeticoes),
+            'torchscript': medir('torchscript', os.path.abspath(caminho_ts), args.repeticoes)
+        }
+
+    print(f"\n⏱️ Mediana de {args.repeticoes} processos (segundos)\n")
+    print(f"{'':<12} {'import':>8} {'carga':>8} {'1ª pred.':>9} {'total':>8}")
+    for nome, r in resultados.items():
+        print(f"{nome:<12} {r['importacao']:>8.3f} {r['carga']:>8.3f} "
+              f"{r['primeira_predicao']:>9.3f} {r['total']:>8.3f}")
+
+    base = resultados['state dict']
+    ts = resultados['torchscript']
+    ganho_carga = (base['carga'] + base['primeira_predicao']) / (ts['carga'] + ts['primeira_predicao'])
+    print(f"\n🚀 Ganho (carga + 1ª predição): {ganho_carga:.2f}x")
+    print(f"🚀 Ganho (processo completo): {base['total'] / ts['total']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Pré-processamento: torchvision (Compose por imagem) x NumPy/PIL vetorizado.
+
+Mede decodificação + resize + normalização de fotos JPEG do tamanho das
+de celular (12 MP por padrão) e confere a paridade com o pipeline antigo:
+
+1. Tensores: mesma imagem decodificada, diferença máxima por pixel.
+2. Predições: pipeline completo (com decodificação reduzida), diferença
+   máxima nas probabilidades e classes iguais.
+
+O script sai com código 1 se a paridade passar da tolerância.
+
+Uso:
+    python -m benchmarks.preprocessamento --fotos 8 --largura 4032 --altura 3024
+"""
+import argparse
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import transforms
+
+from inferencia import MODEL_CONFIG
+from inferencia_torch import BackendTorch
+from preprocessamento import Preprocessador, abrir_imagem
+from benchmarks.comum import carregar_modelo_benchmark
+
+# Pipeline anterior (inferencia_torch.transformacao)
+TRANSFORMACAO_ANTIGA = transforms.Compose([
+    transforms.Resize(MODEL_CONFIG['input_size']),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+def fotos_sinteticas(quantidade, largura, altura, semente=0):
+    """JPEGs com conteúdo suave (comprimem como fotos reais, ao contrário de ruído puro)"""
+    rng = np.random.default_rng(semente)
+    fotos = []
+    for _ in range(quantidade):
+        base = Image.fromarray(rng.integers(0, 256, (24, 32, 3), dtype=np.uint8))
+        foto = base.resize((largura, altura), Image.BICUBIC)
+        buffer = BytesIO()
+        foto.save(buffer, format='JPEG', quality=90)
+        fotos.append(buffer.getvalue())
+    return fotos
+
+def pipeline_antigo(fotos):
+    imagens = [Image.open(BytesIO(dados)).convert('RGB') for dados in fotos]
+    return torch.stack([TRANSFORMACAO_ANTIGA(img) for img in imagens]).numpy()
+
+def pipeline_novo(fotos, preprocessador):
+    return preprocessador.preparar([abrir_imagem(dados) for dados in fotos])
+
+def cronometrar(funcao, repeticoes):
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pré-processamento")
+    parser.add_argument('--fotos', type=int, default=8)
+    parser.add_argument('--largura', type=int, default=4032)
+    parser.add_argument('--altura', type=int, default=3024)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--tolerancia-tensor', type=float, default=1e-5)
+    parser.add_argument('--tolerancia-prob', type=float, default=0.05)
+    args = parser.parse_args()
+
+    fotos = fotos_sinteticas(args.fotos, args.largura, args.altura)
+    preprocessador = Preprocessador()
+    exato = Preprocessador(reducing_gap=None)
+
+    # 1. Paridade dos tensores (mesma imagem decodificada)
+    imagens = [Image.open(BytesIO(dados)).convert('RGB') for dados in fotos]
+    antigo = torch.stack([TRANSFORMACAO_ANTIGA(img) for img in imagens]).numpy()
+    dif_exato = float(np.abs(exato.preparar(imagens) - antigo).max())
+    dif_rapido = float(np.abs(preprocessador.preparar(imagens) - antigo).max())
+    print(f"\n🔍 Tensores ({args.fotos} fotos {args.largura}x{args.altura})")
+    print(f"   resize exato:         diferença máx. {dif_exato:.2e}")
+    print(f"   reducing_gap={preprocessador.reducing_gap}: diferença máx. {dif_rapido:.2e} "
+          f"(média {float(np.abs(preprocessador.preparar(imagens) - antigo).mean()):.2e})")
+
+    # 2. Paridade das predições (pipeline completo com draft)
+    modelo = carregar_modelo_benchmark(MODEL_CONFIG['model_path'])
+    backend = BackendTorch(modelo)
+    with torch.no_grad():
+        prob_antiga = torch.softmax(modelo(torch.from_numpy(pipeline_antigo(fotos))), dim=1).numpy()
+    prob_nova = backend.prever_probabilidades([abrir_imagem(dados) for dados in fotos])
+    dif_prob = float(np.abs(prob_antiga - prob_nova).max())
+    mesmas_classes = bool((prob_antiga.argmax(1) == prob_nova.argmax(1)).all())
+    print(f"\n🎯 Predições: diferença máx. {dif_prob:.2e}, classes iguais: {'sim' if mesmas_classes else 'NÃO'}")
+
+    # 3. Tempo por foto
+    t_antigo = cronometrar(lambda: pipeline_antigo(fotos), args.repeticoes) / args.fotos
+    t_novo = cronometrar(lambda: pipeline_novo(fotos, preprocessador), args.repeticoes) / args.fotos
+    t_forward = cronometrar(lambda: backend.prever_probabilidades(imagens[:1]), args.repeticoes)
+    print(f"\n⏱️ Decodificação + pré-processamento (mediana, ms por foto)")
+    print(f"   torchvision:  {t_antigo * 1000:8.1f}")
+    print(f"   vetorizado:   {t_novo * 1000:8.1f}  ({t_antigo / t_novo:.1f}x)")
+    print(f"   forward (1):  {t_forward * 1000:8.1f}  (referência)")
+
+    paridade_ok = dif_exato <= args.tolerancia_tensor and dif_prob <= args.tolerancia_prob and mesmas_classes
+    print(f"\n{'✅ Paridade OK' if paridade_ok else '❌ Paridade FALHOU'}")
+    if not paridade_ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Registro colunar de detecções: custo de anexar e de consultar o dashboard.
+
+Enche um RegistroDeteccoes temporário com históricos crescentes (vários
+usuários, detecções espalhadas por 120 dias) e compara, para cada tamanho:
+- agregados: últimas detecções, série diária e totais por classe lidos
+  dos agregados;
+- varredura: o mesmo calculado com pandas sobre a lista de dicts do
+  histórico inteiro (o que o dashboard teria de fazer sem agregados).
+Reporta também a latência de `registrar` (incluindo selos e compactação)
+e o espaço em disco por linha.
+
+Uso:
+    python -m benchmarks.registro --tamanhos 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.comum import percentis
+from inferencia import CLASSES
+from registro_deteccoes import RegistroDeteccoes
+
+def gerar_deteccoes(quantidade, usuarios, semente):
+    rng = np.random.default_rng(semente)
+    agora = datetime.now()
+    for _ in range(quantidade):
+        yield f"usuario_{rng.integers(usuarios)}", {
+            'timestamp': (agora - timedelta(minutes=int(rng.integers(120 * 24 * 60)))).isoformat(),
+            'classe': CLASSES[rng.integers(len(CLASSES))],
+            'confianca': float(rng.random()),
+            'ecomoedas': int(rng.integers(5, 30))
+        }
+
+def consultar_agregados(registro, usuario_id):
+    registro.recentes_usuario(usuario_id)
+    registro.serie_diaria(usuario_id, dias=30)
+    registro.totais(usuario_id)
+    registro.totais()
+
+def consultar_varredura(historico, usuario_id):
+    df = pd.DataFrame.from_records(historico)
+    df['dia'] = pd.to_datetime(df['timestamp']).dt.date
+    do_usuario = df[df['usuario'] == usuario_id]
+    do_usuario.tail(10)
+    do_usuario[do_usuario['dia'] >= (datetime.now() - timedelta(days=29)).date()] \
+        .groupby(['dia', 'classe']).size().unstack(fill_value=0)
+    do_usuario.groupby('classe').size()
+    df.groupby('classe').size()
+
+def medir(funcao, *args, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao(*args)
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+def tamanho_pasta(pasta):
+    return sum(os.path.getsize(os.path.join(pasta, nome)) for nome in os.listdir(pasta))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do registro colunar de detecções")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--usuarios', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        registro = RegistroDeteccoes(pasta)
+        historico = []
+        latencias = []
+        print(f"🧾 Registro colunar ({args.usuarios} usuários, 120 dias)")
+        print(f"   {'linhas':>9} {'agregados':>10} {'varredura':>10} {'B/linha':>8} {'JSON B/linha':>13} {'segmentos':>9}")
+        for tamanho in sorted(args.tamanhos):
+            for usuario_id, deteccao in gerar_deteccoes(tamanho - len(historico), args.usuarios, tamanho):
+                inicio = time.perf_counter()
+                registro.registrar(usuario_id, deteccao)
+                latencias.append(time.perf_counter() - inicio)
+                historico.append(dict(deteccao, usuario=usuario_id))
+
+            # Espera a compactação pendente para medir o espaço em disco
+            time.sleep(0.5)
+            agregados = medir(consultar_agregados, registro, 'usuario_0', repeticoes=200)
+            varredura = medir(consultar_varredura, historico, 'usuario_0', repeticoes=3)
+            por_linha = tamanho_pasta(pasta) / tamanho
+            json_por_linha = len(json.dumps(historico[-1000:])) / min(tamanho, 1000)
+            print(f"   {tamanho:>9,} {agregados:>8.3f}ms {varredura:>8.1f}ms {por_linha:>8.1f} "
+                  f"{json_por_linha:>13.1f} {len(registro.segmentos()):>9}")
+
+        lat = percentis(latencias)
+        print(f"\n✍️ registrar: p50 {lat['p50']:.3f} ms   p95 {lat['p95']:.3f} ms   p99 {lat['p99']:.3f} ms   "
+              f"máx {max(latencias) * 1000:.1f} ms")
+        registro.encerrar()
+
+if __name__ == "__main__":
+    main()
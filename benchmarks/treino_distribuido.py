@@ -0,0 +1,107 @@
+"""
+Eficiência de escala do treino data-parallel (gloo) nesta máquina.
+
+Para cada número de processos, roda --passos passos de treino com lote
+--lote por processo (escala fraca: o lote global cresce com os processos)
+e mede a vazão global. Eficiência = vazão(N) / (N x vazão(1)).
+
+Os núcleos são divididos entre os processos (treinar_modelo.setup_distributed),
+então a eficiência mostra o custo do all-reduce e da divisão de threads.
+
+Uso:
+    python -m benchmarks.treino_distribuido --processos 1 2 4 --passos 10
+    python -m benchmarks.treino_distribuido --fine-tune   # últimos 3 blocos treináveis
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torchvision import models
+
+import treinar_modelo as tm
+
+def criar_modelo(fine_tune):
+    modelo = models.efficientnet_b0(weights=None)
+    for param in modelo.features.parameters():
+        param.requires_grad = False
+    if fine_tune:
+        for param in modelo.features[-3:].parameters():
+            param.requires_grad = True
+    modelo.classifier[1] = nn.Linear(modelo.classifier[1].in_features, 6)
+    return modelo
+
+def executar(rank, world_size, port, args, saida):
+    if world_size > 1:
+        tm.setup_distributed(rank, world_size, port)
+    else:
+        torch.set_num_threads(os.cpu_count() or 1)
+
+    try:
+        torch.manual_seed(0)
+        modelo = tm.wrap_distributed(criar_modelo(args.fine_tune))
+        otimizador = optim.Adam([p for p in modelo.parameters() if p.requires_grad], lr=1e-4)
+        criterio = nn.CrossEntropyLoss()
+        escalonador = tm.make_grad_scaler(torch.device('cpu'), False)
+
+        generator = torch.Generator().manual_seed(rank)
+        entradas = torch.randn(args.lote, 3, 224, 224, generator=generator)
+        rotulos = torch.randint(0, 6, (args.lote,), generator=generator)
+        cpu = torch.device('cpu')
+
+        modelo.train()
+        for _ in range(2):
+            tm.train_step(modelo, entradas, rotulos, criterio, otimizador, escalonador, cpu)
+
+        if world_size > 1:
+            dist.barrier()
+        inicio = time.perf_counter()
+        for _ in range(args.passos):
+            tm.train_step(modelo, entradas, rotulos, criterio, otimizador, escalonador, cpu)
+        if world_size > 1:
+            dist.barrier()
+        segundos = time.perf_counter() - inicio
+
+        if rank == 0:
+            with open(saida, 'w') as arquivo:
+                json.dump({'vazao': world_size * args.lote * args.passos / segundos}, arquivo)
+    finally:
+        tm.cleanup_distributed()
+
+def main():
+    parser = argparse.ArgumentParser(description="Eficiência de escala do treino distribuído")
+    parser.add_argument('--processos', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--passos', type=int, default=10)
+    parser.add_argument('--lote', type=int, default=tm.batch_size)
+    parser.add_argument('--fine-tune', action='store_true')
+    args = parser.parse_args()
+
+    print(f"💻 {os.cpu_count()} núcleos, lote {args.lote} por processo, "
+          f"{'fine-tuning' if args.fine_tune else 'backbone congelado'}")
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as temporario:
+        for world_size in args.processos:
+            saida = os.path.join(temporario, f'{world_size}.json')
+            mp.spawn(executar, args=(world_size, tm.free_port(), args, saida), nprocs=world_size)
+            with open(saida) as arquivo:
+                resultados[world_size] = json.load(arquivo)['vazao']
+            print(f"   {world_size} processo(s): {resultados[world_size]:.1f} imagens/s")
+
+    base = resultados.get(1)
+    print(f"\n📈 ESCALA (gloo)")
+    print(f"   {'processos':>9} {'img/s':>10} {'speedup':>8} {'eficiência':>11}")
+    for world_size, vazao in resultados.items():
+        if base:
+            print(f"   {world_size:>9} {vazao:>10.1f} {vazao / base:>7.2f}x {vazao / (world_size * base):>10.0%}")
+        else:
+            print(f"   {world_size:>9} {vazao:>10.1f} {'-':>8} {'-':>11}")
+
+if __name__ == "__main__":
+    main()
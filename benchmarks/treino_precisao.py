@@ -0,0 +1,128 @@
+"""
+Treino FP32 x precisão mista (bfloat16 na CPU) + channels_last.
+
+Para cada modo, a partir dos mesmos pesos iniciais e da mesma semente:
+1. Vazão (imagens/s) de passos de treino na fase congelada e no
+   fine-tuning (últimos 3 blocos do backbone descongelados).
+2. Acurácia e F1 no teste após --epocas épocas da fase congelada.
+
+Usa o dataset de treinar_modelo.data_dir (ou --data-dir). Sem dataset,
+usa tensores aleatórios: a vazão vale, a acurácia não.
+
+Uso:
+    python -m benchmarks.treino_precisao --data-dir dataset/ --epocas 2
+"""
+import argparse
+import copy
+import os
+import time
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import TensorDataset, random_split
+
+import treinar_modelo as tm
+
+MODOS = [
+    ('FP32', False, False),
+    ('FP32 + channels_last', False, True),
+    ('AMP bf16 + channels_last', True, True),
+]
+
+def dataset_sintetico(amostras, num_classes=6):
+    generator = torch.Generator().manual_seed(0)
+    imagens = torch.randn(amostras, 3, 224, 224, generator=generator)
+    rotulos = torch.randint(0, num_classes, (amostras,), generator=generator)
+    dataset = TensorDataset(imagens, rotulos)
+    dataset.classes = [f'classe_{i}' for i in range(num_classes)]
+    return dataset
+
+def medir_vazao(model, loader, device, amp, channels_last, passos):
+    """Imagens/s em `passos` passos de treino (após 2 de aquecimento)"""
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam([p for p in model.parameters() if p.requires_grad], lr=1e-4)
+    scaler = tm.make_grad_scaler(device, amp)
+    model.train()
+
+    lotes = []
+    while len(lotes) < passos + 2:
+        lotes.extend(loader)
+    lotes = [tm.to_device(x, y, device, channels_last) for x, y in lotes[:passos + 2]]
+
+    for inputs, labels in lotes[:2]:
+        tm.train_step(model, inputs, labels, criterion, optimizer, scaler, device, amp)
+
+    imagens = 0
+    inicio = time.perf_counter()
+    for inputs, labels in lotes[2:]:
+        tm.train_step(model, inputs, labels, criterion, optimizer, scaler, device, amp)
+        imagens += labels.size(0)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    return imagens / (time.perf_counter() - inicio)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de treino FP32 x AMP/channels_last")
+    parser.add_argument('--data-dir', default=tm.data_dir)
+    parser.add_argument('--epocas', type=int, default=1)
+    parser.add_argument('--passos', type=int, default=10)
+    parser.add_argument('--lote', type=int, default=tm.batch_size)
+    parser.add_argument('--sem-pretreino', action='store_true', help="Não baixar os pesos ImageNet")
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    tm.num_epochs = args.epocas
+
+    if os.path.isdir(args.data_dir):
+        tm.data_dir = args.data_dir
+        train_loader, _, test_loader, classes = tm.prepare_data(args.lote)
+    else:
+        print(f"⚠️ '{args.data_dir}' não encontrado: dados aleatórios (acurácia sem significado)")
+        dataset = dataset_sintetico(args.lote * (args.passos + 2) * 5 // 4)
+        treino, teste = random_split(dataset, [0.8, 0.2], generator=torch.Generator().manual_seed(0))
+        train_loader = tm.make_loader(treino, shuffle=True, batch_size=args.lote, num_workers=0)
+        test_loader = tm.make_loader(teste, shuffle=False, batch_size=args.lote, num_workers=0)
+        classes = dataset.classes
+
+    if args.sem_pretreino:
+        from torchvision import models
+        base = models.efficientnet_b0(weights=None)
+        for param in base.features.parameters():
+            param.requires_grad = False
+        base.classifier[1] = nn.Linear(base.classifier[1].in_features, len(classes))
+    else:
+        base = tm.create_model(len(classes))
+    base = base.to(device)
+
+    resultados = []
+    for nome, amp, channels_last in MODOS:
+        print(f"\n{'=' * 50}\n🎛️ {nome}")
+        torch.manual_seed(0)
+        model = copy.deepcopy(base)
+        if channels_last:
+            model = model.to(memory_format=torch.channels_last)
+
+        vazao_congelado = medir_vazao(copy.deepcopy(model), train_loader, device, amp, channels_last, args.passos)
+
+        ajuste = copy.deepcopy(model)
+        for param in ajuste.features[-3:].parameters():
+            param.requires_grad = True
+        vazao_ajuste = medir_vazao(ajuste, train_loader, device, amp, channels_last, args.passos)
+
+        torch.manual_seed(0)
+        optimizer = optim.Adam(model.parameters(), lr=tm.learning_rate)
+        tm.train_model(model, train_loader, nn.CrossEntropyLoss(), optimizer, device, amp, channels_last)
+        acuracia, f1, _ = tm.evaluate_model(model, test_loader, classes, device, plot=False)
+        resultados.append((nome, vazao_congelado, vazao_ajuste, acuracia, f1))
+
+    base_congelado, base_ajuste, base_acc, base_f1 = resultados[0][1:]
+    print(f"\n📈 RELATÓRIO DE PRECISÃO ({device}, lote {args.lote}, {args.epocas} época(s))")
+    print(f"   {'':<26} {'img/s congelado':>16} {'img/s fine-tune':>16} {'Acurácia':>9} {'F1':>7}")
+    for nome, congelado, ajuste, acc, f1 in resultados:
+        print(f"   {nome:<26} {congelado:>9.1f} ({congelado / base_congelado:>4.2f}x) "
+              f"{ajuste:>9.1f} ({ajuste / base_ajuste:>4.2f}x) {acc:>9.4f} {f1:>7.4f}")
+    print(f"   Delta AMP vs FP32: acurácia {resultados[-1][3] - base_acc:+.4f}, F1 {resultados[-1][4] - base_f1:+.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Busca de hiperparâmetros para treinar_modelo.py com tentativas em paralelo.
+
+- Cada tentativa roda em um processo do pool, fixado em um subconjunto dos
+  núcleos (os.sched_setaffinity) com o mesmo número de threads do PyTorch.
+- Todas leem o mesmo cache mmap do dataset (gerado uma vez) e o mesmo split,
+  preparado uma única vez e entregue a cada processo do pool ao iniciar
+  (sem recarregar o dataset nem refazer fingerprints por tentativa); as
+  acurácias de validação são comparáveis. A validação é a
+  fração separada do treino (treinar_modelo.val_fraction); o conjunto de
+  teste não participa da busca.
+- Successive halving: todas as tentativas treinam o menor orçamento de épocas;
+  só a melhor fração (1/eta) pela acurácia de validação segue para o próximo
+  orçamento, continuando do estado salvo (sem recomeçar do zero).
+- Cada avaliação vira uma linha em sweep_results.csv.
+
+A época k da tentativa é da fase congelada enquanto k < num_epochs e de
+fine-tuning (últimos blocos liberados, fine_tune_learning_rate) depois.
+
+Uso:
+    python busca_hiperparametros.py --parallel 2 --max-epochs 9 --eta 3
+    python busca_hiperparametros.py --trials 12 --seed 0
+"""
+import argparse
+import contextlib
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import shutil
+import signal
+import time
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+import treinar_modelo as tm
+
+# 📂 Configurações da busca
+sweep_dir = "sweep"                        # Estados e logs das tentativas
+results_path = "sweep_results.csv"
+search_space = {
+    'batch_size': [16, 32],
+    'learning_rate': [3e-4, 1e-3, 3e-3],
+    'num_epochs': [1, 2, 4],               # Épocas congeladas antes do fine-tuning
+    'fine_tune_learning_rate': [3e-5, 1e-4, 3e-4],
+}
+
+COLUMNS = ['trial', *search_space, 'epochs', 'val_accuracy', 'val_f1', 'seconds', 'status']
+
+# Dados da busca no processo do pool (definidos por init_worker)
+worker_data = {}
+
+# ================================================
+# 🧮 PLANEJAMENTO
+# ================================================
+
+def sample_configs(trials=None, seed=0):
+    """
+    Todas as combinações do espaço de busca, ou `trials` delas sorteadas
+    """
+    configs = [dict(zip(search_space, values)) for values in itertools.product(*search_space.values())]
+    if trials and trials < len(configs):
+        configs = random.Random(seed).sample(configs, trials)
+    return configs
+
+def halving_budgets(max_epochs, eta):
+    """
+    Orçamentos crescentes de épocas terminando em max_epochs (ex.: 9, eta 3 -> 1, 3, 9)
+    """
+    budgets = [max_epochs]
+    while budgets[0] // eta >= 1:
+        budgets.insert(0, budgets[0] // eta)
+    return budgets
+
+def split_cores(parallel):
+    """
+    Divide os núcleos disponíveis em `parallel` grupos disjuntos
+    """
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    parallel = max(1, min(parallel, len(cores)))
+    return [cores[i::parallel] for i in range(parallel)]
+
+# ================================================
+# 🏃 TENTATIVAS (executadas nos processos do pool)
+# ================================================
+
+def process_alive(pid):
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def claim_core_group(core_groups, owners):
+    """
+    Reserva um grupo livre na tabela compartilhada de donos (pid por grupo).
+    O grupo de um worker que morreu fica livre para o substituto que o pool
+    criar; sem grupo livre, usa o menor grupo sem fixar núcleos (nunca bloqueia)
+    """
+    with owners.get_lock():
+        for slot, owner in enumerate(owners):
+            if owner == 0 or not process_alive(owner):
+                owners[slot] = os.getpid()
+                return core_groups[slot], True
+    return min(core_groups, key=len), False
+
+def init_worker(core_groups, owners, data):
+    """
+    Fixa o processo em um grupo de núcleos e guarda os dados da busca;
+    Ctrl-C fica com o processo principal
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_data.update(data, loaders={})
+    cores, claimed = claim_core_group(core_groups, owners)
+    if claimed and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+def trial_loaders(batch_size):
+    """
+    Loaders de treino e validação do split da busca, um par por tamanho de lote
+    """
+    loaders = worker_data['loaders']
+    if batch_size not in loaders:
+        loaders[batch_size] = (
+            tm.make_loader(worker_data['train'], shuffle=True, batch_size=batch_size, num_workers=0),
+            tm.make_loader(worker_data['val'], shuffle=False, batch_size=batch_size, num_workers=0)
+        )
+    return loaders[batch_size]
+
+def make_optimizer(model, params, fine_tune):
+    lr = params['fine_tune_learning_rate'] if fine_tune else params['learning_rate']
+    return optim.Adam(model.parameters(), lr=lr)
+
+def train_epoch(model, loader, criterion, optimizer, scaler, device, amp):
+    model.train()
+    running_loss = 0.0
+    for inputs, labels in loader:
+        inputs, labels = tm.to_device(inputs, labels, device)
+        _, loss = tm.train_step(model, inputs, labels, criterion, optimizer, scaler, device, amp)
+        running_loss += loss.item()
+    return running_loss / max(1, len(loader))
+
+def run_trial(job):
+    """
+    Continua a tentativa até job['stop'] épocas e avalia na validação
+    """
+    trial, params = job['trial'], job['params']
+    state_path = os.path.join(job['sweep_dir'], f"trial_{trial}.pt")
+    log_path = os.path.join(job['sweep_dir'], f"trial_{trial}.log")
+    device = torch.device("cpu")
+    start = time.perf_counter()
+
+    with open(log_path, 'a', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        print(f"\n{'=' * 50}\n🎛️ Tentativa {trial}: {params} (épocas {job['start']} -> {job['stop']})")
+        train_loader, val_loader = trial_loaders(params['batch_size'])
+        classes = worker_data['classes']
+
+        model = tm.create_model(len(classes)).to(device)
+        criterion = nn.CrossEntropyLoss()
+        scaler = tm.make_grad_scaler(device, job['amp'])
+        state = torch.load(state_path, weights_only=False) if job['start'] > 0 else None
+
+        fine_tune = job['start'] >= params['num_epochs']
+        if fine_tune:
+            tm.unfreeze_backbone(model)
+        optimizer = make_optimizer(model, params, fine_tune)
+        if state:
+            model.load_state_dict(state['model'])
+            optimizer.load_state_dict(state['optimizer'])
+            torch.set_rng_state(state['rng'])
+        else:
+            torch.manual_seed(job['seed'] + trial)
+
+        for epoch in range(job['start'], job['stop']):
+            if epoch == params['num_epochs']:
+                print("🔧 Liberando os últimos blocos do backbone")
+                tm.unfreeze_backbone(model)
+                optimizer = make_optimizer(model, params, fine_tune=True)
+            loss = train_epoch(model, train_loader, criterion, optimizer, scaler, device, job['amp'])
+            print(f"Época [{epoch + 1}/{job['stop']}] - Loss: {loss:.4f}")
+
+        accuracy, f1, _ = tm.evaluate_model(model, val_loader, classes, device, plot=False, report=False)
+        torch.save({'model': model.state_dict(), 'optimizer': optimizer.state_dict(),
+                    'rng': torch.get_rng_state()}, state_path)
+
+    return {'trial': trial, **params, 'epochs': job['stop'], 'val_accuracy': accuracy, 'val_f1': f1,
+            'seconds': time.perf_counter() - start}
+
+# ================================================
+# 📊 SUCCESSIVE HALVING
+# ================================================
+
+def run_sweep(configs, max_epochs, eta=3, parallel=1, mmap_cache=True, amp=False, seed=0,
+              output=results_path, workdir=sweep_dir):
+    """
+    Executa o successive halving e retorna as linhas da tabela de resultados
+    """
+    if os.path.exists(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(workdir)
+
+    # Cache, split e datasets preparados uma única vez; cada processo do pool
+    # recebe os mesmos subconjuntos e só monta os loaders do seu tamanho de lote
+    train_loader, val_loader, _, classes = tm.prepare_data(search_space['batch_size'][0], 0, mmap_cache)
+    data = {'train': train_loader.dataset, 'val': val_loader.dataset, 'classes': classes}
+
+    budgets = halving_budgets(max_epochs, eta)
+    core_groups = split_cores(parallel)
+    print(f"🔎 {len(configs)} tentativas, orçamentos {budgets} épocas, "
+          f"{len(core_groups)} processo(s) (núcleos {core_groups})")
+
+    context = multiprocessing.get_context('spawn')
+    owners = context.Array('i', len(core_groups))
+
+    alive = {trial: params for trial, params in enumerate(configs)}
+    done = {trial: 0 for trial in alive}
+    rows = []
+
+    with open(output, 'w', newline='', encoding='utf-8') as f, \
+         context.Pool(len(core_groups), initializer=init_worker, initargs=(core_groups, owners, data)) as pool:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+
+        for rung, budget in enumerate(budgets):
+            jobs = [{'trial': trial, 'params': params, 'start': done[trial], 'stop': budget, 'seed': seed,
+                     'amp': amp, 'sweep_dir': workdir}
+                    for trial, params in alive.items()]
+            results = []
+            for result in pool.imap_unordered(run_trial, jobs):
+                results.append(result)
+                done[result['trial']] = budget
+                print(f"   tentativa {result['trial']:>3}: {budget} época(s), "
+                      f"acurácia {result['val_accuracy']:.4f} ({result['seconds']:.0f}s)")
+
+            # Os melhores 1/eta seguem; os demais são podados
+            results.sort(key=lambda r: (r['val_accuracy'], r['val_f1']), reverse=True)
+            last = rung == len(budgets) - 1
+            keep = len(results) if last else max(1, len(results) // eta)
+            for position, result in enumerate(results):
+                result['status'] = 'final' if last else ('promoted' if position < keep else 'pruned')
+                if result['status'] == 'pruned':
+                    del alive[result['trial']]
+                    os.remove(os.path.join(workdir, f"trial_{result['trial']}.pt"))
+            writer.writerows(results)
+            f.flush()
+            rows.extend(results)
+            print(f"📶 Orçamento {budget}: {keep}/{len(results)} tentativas seguem\n")
+
+    return rows
+
+def print_results(rows, top=10):
+    """
+    Tabela das melhores tentativas no maior orçamento que cada uma atingiu
+    """
+    best = {}
+    for row in rows:
+        best[row['trial']] = row
+    ranking = sorted(best.values(), key=lambda r: (r['epochs'], r['val_accuracy'], r['val_f1']), reverse=True)
+
+    print("📈 RESULTADOS DA BUSCA")
+    header = ' '.join(search_space)
+    print(f"   {'trial':>5} {header} {'épocas':>6} {'acurácia':>9} {'F1':>7} {'status':>9}")
+    for row in ranking[:top]:
+        values = ' '.join(f"{row[name]:>{len(name)}g}" for name in search_space)
+        print(f"   {row['trial']:>5} {values} {row['epochs']:>6} {row['val_accuracy']:>9.4f} "
+              f"{row['val_f1']:>7.4f} {row['status']:>9}")
+
+    winner = ranking[0]
+    print("\n🏆 Melhor configuração:")
+    print(f"   python treinar_modelo.py --batch-size {winner['batch_size']} "
+          f"--learning-rate {winner['learning_rate']:g} --epochs {winner['num_epochs']} "
+          f"--fine-tune-lr {winner['fine_tune_learning_rate']:g} "
+          f"--fine-tune-epochs {max(1, winner['epochs'] - winner['num_epochs'])}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca de hiperparâmetros com successive halving")
+    parser.add_argument('--trials', type=int, default=None, help="Tentativas sorteadas (padrão: grade completa)")
+    parser.add_argument('--max-epochs', type=int, default=9, help="Orçamento de épocas das finalistas")
+    parser.add_argument('--eta', type=int, default=3, help="Fator de corte por orçamento")
+    parser.add_argument('--parallel', type=int, default=os.cpu_count() or 1, help="Tentativas simultâneas")
+    parser.add_argument('--no-mmap-cache', action='store_true', help="Ler JPEGs em vez do cache decodificado")
+    parser.add_argument('--amp', action='store_true', default=tm.use_amp)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=results_path)
+    args = parser.parse_args(argv)
+
+    configs = sample_configs(args.trials, args.seed)
+    rows = run_sweep(configs, args.max_epochs, args.eta, args.parallel, not args.no_mmap_cache,
+                     args.amp, args.seed, args.output)
+    print_results(rows)
+    print(f"\n✅ Resultados em '{args.output}'")
+
+if __name__ == "__main__":
+    main()
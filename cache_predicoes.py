@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+from PIL import Image
+
+from inferencia import MODEL_CONFIG, Resultado
+
+class CachePredicoes:
+    """
+    Cache LRU + TTL de resultados de predição.
+
+    A chave é o hash dos pixels decodificados (mais modo e tamanho) junto
+    com a versão do modelo; quando a versão muda o cache inteiro é
+    descartado. Seguro para uso entre threads/sessões.
+    """
+
+    def __init__(self, max_entradas: Optional[int] = None, ttl_segundos: Optional[float] = None):
+        self.max_entradas = max_entradas or MODEL_CONFIG['cache_max_entradas']
+        self.ttl = ttl_segundos if ttl_segundos is not None else MODEL_CONFIG['cache_ttl_segundos']
+
+        self._entradas = OrderedDict()  # chave -> (expira_em, resultado)
+        self._lock = threading.Lock()
+        self._versao = None
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    @staticmethod
+    def chave(imagem: Image.Image, versao: str) -> str:
+        """Hash da imagem decodificada + versão do modelo"""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f"{versao}|{imagem.mode}|{imagem.size}".encode('utf-8'))
+        h.update(imagem.tobytes())
+        return h.hexdigest()
+
+    def verificar_versao(self, versao: str):
+        """Descarta tudo se o modelo mudou desde a última consulta"""
+        with self._lock:
+            if versao != self._versao:
+                if self._versao is not None:
+                    self.invalidacoes += 1
+                self._entradas.clear()
+                self._versao = versao
+
+    def obter(self, chave: str) -> Optional[Resultado]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del self._entradas[chave]
+                self.falhas += 1
+                return None
+
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+
+    def guardar(self, chave: str, resultado: Resultado):
+        # Falhas de predição não são guardadas
+        if resultado[0] is None:
+            return
+
+        with self._lock:
+            self._entradas[chave] = (time.monotonic() + self.ttl, resultado)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def prever_lote(self, imagens: Sequence[Image.Image], prever: Callable, versao: str) -> List[Resultado]:
+        """
+        Retorna os resultados do cache e chama `prever` só para as imagens
+        ausentes, preservando a ordem de entrada.
+        """
+        self.verificar_versao(versao)
+
+        chaves = [self.chave(imagem, versao) for imagem in imagens]
+        resultados = [self.obter(chave) for chave in chaves]
+        faltando = [i for i, resultado in enumerate(resultados) if resultado is None]
+
+        if faltando:
+            novos = prever([imagens[i] for i in faltando])
+            for i, resultado in zip(faltando, novos):
+                resultados[i] = resultado
+                self.guardar(chaves[i], resultado)
+
+        return resultados
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estatisticas(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'entradas': len(self._entradas),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / total if total else 0.0,
+                'invalidacoes': self.invalidacoes,
+                'versao': self._versao
+            }
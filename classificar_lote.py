@@ -0,0 +1,330 @@
+"""
+Classificação em massa, offline, de diretórios ou manifestos de imagens.
+
+- Decodificação e resize em um pool de processos (todos os núcleos);
+  inferência em lotes no processo principal.
+- Resultados gravados incrementalmente em CSV, JSONL ou Parquet (pela
+  extensão de --saida): caminho, classe, confiança, entropia, outlier, erro.
+- Checkpoint em <saida>.checkpoint.json: se a execução for interrompida,
+  rodar o mesmo comando continua de onde parou.
+
+Uso:
+    python classificar_lote.py fotos/ --saida resultados.csv
+    python classificar_lote.py manifesto.txt --saida resultados.parquet --processos 8
+"""
+import argparse
+import csv
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import inferencia
+from inferencia import MODEL_CONFIG
+from preprocessamento import Preprocessador, abrir_imagem
+
+# Configurações da classificação em massa
+LOTE_CONFIG = {
+    'extensoes': ('.jpg', '.jpeg', '.png', '.webp', '.bmp'),
+    'checkpoint_a_cada': 2048,  # imagens entre checkpoints
+    'chunksize': 16             # caminhos enviados por vez a cada processo
+}
+
+COLUNAS = ['caminho', 'classe', 'confianca', 'entropia', 'outlier', 'erro']
+
+# ================================================
+# 📂 ENTRADA
+# ================================================
+
+def listar_imagens(entrada: str) -> List[str]:
+    """
+    Lista as imagens de um diretório (recursivo, ordem estável) ou de um
+    manifesto: .txt com um caminho por linha ou .csv com a coluna 'caminho'.
+    Caminhos relativos do manifesto partem da pasta do manifesto.
+    """
+    if os.path.isdir(entrada):
+        caminhos = []
+        for raiz, pastas, arquivos in os.walk(entrada):
+            pastas.sort()
+            caminhos.extend(
+                os.path.join(raiz, nome) for nome in sorted(arquivos)
+                if nome.lower().endswith(LOTE_CONFIG['extensoes'])
+            )
+        return caminhos
+
+    base = os.path.dirname(os.path.abspath(entrada))
+    with open(entrada, newline='', encoding='utf-8') as arquivo:
+        if entrada.lower().endswith('.csv'):
+            leitor = csv.DictReader(arquivo)
+            coluna = 'caminho' if 'caminho' in leitor.fieldnames else leitor.fieldnames[0]
+            linhas = [linha[coluna] for linha in leitor]
+        else:
+            linhas = arquivo.read().splitlines()
+
+    return [os.path.join(base, linha.strip()) for linha in linhas if linha.strip()]
+
+def impressao_digital(caminhos: List[str]) -> str:
+    """Identifica a lista de entrada para não retomar um checkpoint de outra lista"""
+    h = hashlib.sha1()
+    for caminho in caminhos:
+        h.update(caminho.encode('utf-8', 'surrogateescape'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+# ================================================
+# 🧵 DECODIFICAÇÃO (processos)
+# ================================================
+
+_preprocessador = None
+
+def _iniciar_processo():
+    global _preprocessador
+    # Ctrl+C é tratado só no processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _preprocessador = Preprocessador()
+
+def decodificar(caminho: str) -> Tuple[str, Optional[np.ndarray], Optional[str]]:
+    """Abre e redimensiona no processo filho; só os pixels 224x224 voltam ao principal"""
+    try:
+        imagem = _preprocessador.redimensionar(abrir_imagem(caminho))
+        return caminho, np.asarray(imagem), None
+    except Exception as e:
+        return caminho, None, f"{type(e).__name__}: {e}"
+
+# ================================================
+# 💾 SAÍDA
+# ================================================
+
+class EscritorTexto:
+    """CSV ou JSONL em modo append; `confirmar` devolve o tamanho em bytes já gravado em disco"""
+
+    def __init__(self, caminho: str, posicao: int = 0):
+        self.jsonl = caminho.lower().endswith(('.jsonl', '.json'))
+        # Descarta o que foi escrito depois do último checkpoint; a posição é
+        # em bytes (o tell() de arquivo texto é opaco e não serve para truncar)
+        if posicao:
+            os.truncate(caminho, posicao)
+        self.arquivo = open(caminho, 'a' if posicao else 'w', newline='', encoding='utf-8')
+        self.csv = None if self.jsonl else csv.DictWriter(self.arquivo, fieldnames=COLUNAS)
+        if self.csv and posicao == 0:
+            self.csv.writeheader()
+
+    def escrever(self, linhas: List[Dict]):
+        if self.jsonl:
+            self.arquivo.writelines(json.dumps(linha, ensure_ascii=False) + '\n' for linha in linhas)
+        else:
+            self.csv.writerows(linhas)
+
+    def confirmar(self) -> int:
+        self.arquivo.flush()
+        os.fsync(self.arquivo.fileno())
+        return os.fstat(self.arquivo.fileno()).st_size
+
+    def fechar(self):
+        self.arquivo.close()
+
+class EscritorParquet:
+    """Diretório de partes part-00000.parquet; `confirmar` grava uma parte e devolve quantas existem"""
+
+    def __init__(self, caminho: str, posicao: int = 0):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa, self.pq = pa, pq
+
+        self.diretorio = caminho
+        os.makedirs(caminho, exist_ok=True)
+        # Partes além do checkpoint são de uma execução interrompida
+        for nome in os.listdir(caminho):
+            if nome.startswith('part-') and int(nome[5:10]) >= posicao:
+                os.remove(os.path.join(caminho, nome))
+
+        self.partes = posicao
+        self.pendentes = []
+
+    def escrever(self, linhas: List[Dict]):
+        self.pendentes.extend(linhas)
+
+    def confirmar(self) -> int:
+        if self.pendentes:
+            tabela = self.pa.Table.from_pylist(self.pendentes, schema=self.pa.schema([
+                ('caminho', self.pa.string()), ('classe', self.pa.string()),
+                ('confianca', self.pa.float32()), ('entropia', self.pa.float32()),
+                ('outlier', self.pa.bool_()), ('erro', self.pa.string())
+            ]))
+            destino = os.path.join(self.diretorio, f"part-{self.partes:05d}.parquet")
+            self.pq.write_table(tabela, destino + '.tmp')
+            os.replace(destino + '.tmp', destino)
+            self.partes += 1
+            self.pendentes = []
+        return self.partes
+
+    def fechar(self):
+        pass
+
+def saida_parquet(caminho: str) -> bool:
+    return caminho.lower().rstrip('/').endswith('.parquet')
+
+def pyarrow_disponivel() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None
+
+def criar_escritor(caminho: str, posicao: int = 0):
+    if saida_parquet(caminho):
+        return EscritorParquet(caminho, posicao)
+    return EscritorTexto(caminho, posicao)
+
+def ler_checkpoint(caminho: str) -> Optional[Dict]:
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+def salvar_checkpoint(caminho: str, dados: Dict):
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo)
+    os.replace(caminho + '.tmp', caminho)
+
+# ================================================
+# 🎯 CLASSIFICAÇÃO
+# ================================================
+
+def classificar(backend, decodificados: List[Tuple[str, Optional[np.ndarray], Optional[str]]]) -> List[Dict]:
+    """Roda um lote já decodificado e monta as linhas de saída"""
+    validos = [i for i, (_, pixels, _) in enumerate(decodificados) if pixels is not None]
+    linhas = [
+        {'caminho': caminho, 'classe': None, 'confianca': None, 'entropia': None, 'outlier': None, 'erro': erro}
+        for caminho, _, erro in decodificados
+    ]
+
+    if validos:
+        prob = backend.prever_probabilidades([Image.fromarray(decodificados[i][1]) for i in validos])
+        entropias = inferencia.calcular_entropia(prob)
+        for i, (classe, confianca, _, is_outlier), ent in zip(validos, inferencia.interpretar_probabilidades(prob), entropias):
+            linhas[i].update({
+                'classe': classe,
+                'confianca': round(confianca, 6),
+                'entropia': round(float(ent), 6),
+                'outlier': bool(is_outlier)
+            })
+
+    return linhas
+
+def em_lotes(itens: Iterable, tamanho: int) -> Iterable[List]:
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def executar(entrada: str, saida: str, backend, processos: Optional[int] = None,
+             tamanho_lote: Optional[int] = None, checkpoint_a_cada: Optional[int] = None) -> Dict:
+    """Classifica tudo que falta e retorna estatísticas de throughput"""
+    processos = processos or os.cpu_count() or 1
+    tamanho_lote = tamanho_lote or MODEL_CONFIG['tamanho_lote_max']
+    checkpoint_a_cada = checkpoint_a_cada or LOTE_CONFIG['checkpoint_a_cada']
+
+    caminhos = listar_imagens(entrada)
+    digital = impressao_digital(caminhos)
+    arquivo_checkpoint = saida.rstrip('/') + '.checkpoint.json'
+
+    checkpoint = ler_checkpoint(arquivo_checkpoint)
+    if checkpoint and checkpoint['impressao_digital'] != digital:
+        raise RuntimeError(f"{arquivo_checkpoint} é de outra lista de imagens; apague-o ou use outra --saida")
+    checkpoint = checkpoint or {'impressao_digital': digital, 'processadas': 0, 'posicao': 0}
+
+    pendentes = caminhos[checkpoint['processadas']:]
+    if checkpoint['processadas']:
+        print(f"↩️ Retomando: {checkpoint['processadas']} de {len(caminhos)} imagens já classificadas")
+    if not pendentes:
+        print("✅ Nada a fazer")
+        return {'imagens': 0, 'segundos': 0.0, 'imagens_por_segundo': 0.0, 'erros': 0}
+
+    escritor = criar_escritor(saida, checkpoint['posicao'])
+    inicio = time.perf_counter()
+    tempo_inferencia = 0.0
+    feitas = erros = ultimo_checkpoint = 0
+
+    # spawn: os filhos não herdam threads do torch/ONNX Runtime do processo principal
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Pool(processos, initializer=_iniciar_processo) as pool:
+        try:
+            resultados = pool.imap(decodificar, pendentes, chunksize=LOTE_CONFIG['chunksize'])
+            for lote in em_lotes(resultados, tamanho_lote):
+                t0 = time.perf_counter()
+                linhas = classificar(backend, lote)
+                tempo_inferencia += time.perf_counter() - t0
+
+                escritor.escrever(linhas)
+                feitas += len(linhas)
+                erros += sum(1 for linha in linhas if linha['erro'])
+
+                if feitas - ultimo_checkpoint >= checkpoint_a_cada or feitas == len(pendentes):
+                    checkpoint['posicao'] = escritor.confirmar()
+                    checkpoint['processadas'] += feitas - ultimo_checkpoint
+                    salvar_checkpoint(arquivo_checkpoint, checkpoint)
+                    ultimo_checkpoint = feitas
+
+                    decorrido = time.perf_counter() - inicio
+                    print(f"📈 {checkpoint['processadas']}/{len(caminhos)} imagens "
+                          f"({feitas / decorrido:.1f} imagens/s)")
+        finally:
+            escritor.fechar()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'imagens': feitas,
+        'erros': erros,
+        'segundos': segundos,
+        'imagens_por_segundo': feitas / segundos,
+        # Fração do tempo no modelo; o resto é espera pela decodificação
+        'fracao_inferencia': tempo_inferencia / segundos,
+        'processos': processos
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Classificação em massa de imagens")
+    parser.add_argument('entrada', help="Diretório de imagens ou manifesto (.txt / .csv)")
+    parser.add_argument('--saida', required=True, help="Arquivo .csv, .jsonl ou .parquet")
+    parser.add_argument('--processos', type=int, default=None, help="Processos de decodificação (padrão: todos os núcleos)")
+    parser.add_argument('--lote', type=int, default=MODEL_CONFIG['tamanho_lote_max'])
+    parser.add_argument('--checkpoint-a-cada', type=int, default=LOTE_CONFIG['checkpoint_a_cada'])
+    parser.add_argument('--backend', choices=['torch', 'onnx'], default=None)
+    parser.add_argument('--pesos-aleatorios', action='store_true', help="Sem modelo treinado (testes de carga)")
+    args = parser.parse_args()
+
+    # Antes de carregar o modelo e abrir o pool: sem pyarrow a saída falharia só no fim
+    if saida_parquet(args.saida) and not pyarrow_disponivel():
+        parser.error("Saída .parquet requer pyarrow (pip install pyarrow); use .csv ou .jsonl")
+
+    if args.pesos_aleatorios:
+        from inferencia_torch import criar_modelo
+        backend = inferencia.como_backend(criar_modelo().eval())
+    else:
+        if not inferencia.modelo_disponivel(args.backend):
+            artefatos = ', '.join(inferencia.artefatos_modelo(args.backend))
+            parser.error(f"Modelo não encontrado: {artefatos} (use --pesos-aleatorios)")
+        backend = inferencia.carregar_modelo_inferencia(args.backend)
+
+    try:
+        estatisticas = executar(args.entrada, args.saida, backend, args.processos,
+                                args.lote, args.checkpoint_a_cada)
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrompido; rode o mesmo comando para continuar do último checkpoint")
+        return
+
+    if estatisticas['imagens']:
+        print(f"\n📊 {estatisticas['imagens']} imagens em {estatisticas['segundos']:.1f}s "
+              f"({estatisticas['imagens_por_segundo']:.1f} imagens/s, {estatisticas['processos']} processos, "
+              f"{estatisticas['erros']} erros, {estatisticas['fracao_inferencia']:.0%} do tempo no modelo)")
+
+if __name__ == "__main__":
+    main()
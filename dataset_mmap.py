@@ -0,0 +1,207 @@
+import hashlib
+import json
+import multiprocessing
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+from torchvision import datasets, transforms
+
+# ================================================
+# 🗄️ CACHE DO DATASET EM MEMÓRIA MAPEADA
+# ================================================
+# Decodifica todas as imagens uma única vez para um array uint8 contíguo
+# (N, H, W, 3) em disco. O treino lê fatias desse arquivo via mmap (sem
+# decodificar JPEG) e aplica só a augmentation aleatória a cada época.
+# Vários experimentos na mesma máquina compartilham o page cache.
+
+IMAGES_FILE = 'images.u8'
+LABELS_FILE = 'labels.npy'
+META_FILE = 'meta.json'
+
+def make_mmap_transform(train, size=224, input_size=224):
+    """
+    Transformações equivalentes às de treinar_modelo.py, mas sobre tensores
+    uint8 CHW; o Resize só entra se o cache tiver outro tamanho
+    """
+    steps = []
+    if size != input_size:
+        steps.append(transforms.Resize((input_size, input_size), antialias=True))
+    if train:
+        steps += [
+            transforms.RandomHorizontalFlip(p=0.5),  # Augmentation
+            transforms.RandomRotation(10),            # Augmentation
+        ]
+    steps += [
+        transforms.ConvertImageDtype(torch.float32),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                            std=[0.229, 0.224, 0.225])
+    ]
+    return transforms.Compose(steps)
+
+def _decode(args):
+    """
+    Abre e redimensiona uma imagem (executado nos processos do pool)
+    """
+    path, size = args
+    with Image.open(path) as img:
+        return np.asarray(img.convert('RGB').resize((size, size), Image.BILINEAR))
+
+def dataset_fingerprint(root):
+    """
+    Hash dos caminhos relativos, tamanhos e datas de modificação dos arquivos
+    de `root` (só stat, sem abrir as imagens): muda quando uma imagem é
+    adicionada, removida ou substituída em qualquer subpasta. Um stat por arquivo
+    """
+    entries = []
+    for folder, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(folder, name)
+            info = os.stat(path)
+            entries.append(f"{os.path.relpath(path, root)}|{info.st_size}|{info.st_mtime_ns}")
+    return hashlib.sha1("\n".join(sorted(entries)).encode()).hexdigest()
+
+def image_folders(paths):
+    """
+    Pastas (relativas, com as intermediárias e a raiz '') que contêm as imagens de `paths`
+    """
+    folders = {''}
+    for folder in {os.path.dirname(path) for path in paths}:
+        while folder not in folders:
+            folders.add(folder)
+            folder = os.path.dirname(folder)
+    return sorted(folders)
+
+def folder_fingerprint(root, folders):
+    """
+    Hash das datas de modificação das `folders` de `root`, sem listar arquivos:
+    um stat por pasta. Muda quando uma imagem ou pasta é adicionada, removida
+    ou renomeada, mas não quando uma imagem é sobrescrita no lugar (para isso,
+    dataset_fingerprint). None se alguma pasta não existe mais
+    """
+    try:
+        entries = [f"{folder}|{os.stat(os.path.join(root, folder)).st_mtime_ns}" for folder in folders]
+    except FileNotFoundError:
+        return None
+    return hashlib.sha1("\n".join(entries).encode()).hexdigest()
+
+def cache_is_valid(cache_dir, data_dir, size, verify=False):
+    """
+    Indica se já existe um cache completo para este diretório e tamanho, com
+    as pastas de data_dir inalteradas desde a geração (verify=True confere
+    também cada arquivo)
+    """
+    meta_path = os.path.join(cache_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('data_dir') != os.path.abspath(data_dir) or meta.get('size') != size:
+        return False
+    if meta.get('fingerprint') != folder_fingerprint(data_dir, meta.get('folders', [])) or \
+            (verify and meta.get('fingerprint_full') != dataset_fingerprint(data_dir)):
+        print(f"⚠️ Os arquivos de '{data_dir}' mudaram desde a geração do cache")
+        return False
+    return True
+
+def build_mmap_cache(data_dir, cache_dir, size=224, num_workers=None, rebuild=False, verify=False):
+    """
+    Gera (uma vez) o cache: images.u8 (N, size, size, 3), labels.npy e meta.json.
+    Com size=224 o Resize((224, 224)) do treino vira um no-op. O cache é
+    regerado quando as pastas de data_dir mudam (ver cache_is_valid); use
+    rebuild=True depois de sobrescrever imagens no lugar sem verify.
+    """
+    if not rebuild and cache_is_valid(cache_dir, data_dir, size, verify):
+        print(f"🗄️ Usando cache do dataset em '{cache_dir}'")
+        return cache_dir
+
+    print(f"🗄️ Gerando cache do dataset em '{cache_dir}' ({size}x{size})...")
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.exists(os.path.join(cache_dir, META_FILE)):
+        os.remove(os.path.join(cache_dir, META_FILE))
+
+    # Só lista os arquivos (sem decodificar) na mesma ordem do ImageFolder
+    folder = datasets.ImageFolder(root=data_dir)
+    samples = folder.samples
+    # Estado das pastas antes de decodificar: uma mudança durante a geração
+    # invalida o cache na próxima execução
+    paths = [os.path.relpath(path, data_dir) for path, _ in samples]
+    folders = image_folders(paths)
+    fingerprint, fingerprint_full = folder_fingerprint(data_dir, folders), dataset_fingerprint(data_dir)
+
+    images_tmp = os.path.join(cache_dir, IMAGES_FILE + '.tmp')
+    images = np.memmap(images_tmp, dtype=np.uint8, mode='w+', shape=(len(samples), size, size, 3))
+
+    num_workers = num_workers or os.cpu_count() or 1
+    with multiprocessing.get_context('spawn').Pool(num_workers) as pool:
+        jobs = ((path, size) for path, _ in samples)
+        for i, pixels in enumerate(pool.imap(_decode, jobs, chunksize=32)):
+            images[i] = pixels
+            if (i + 1) % 1000 == 0:
+                print(f"   {i + 1}/{len(samples)} imagens")
+
+    images.flush()
+    del images
+    os.replace(images_tmp, os.path.join(cache_dir, IMAGES_FILE))
+    np.save(os.path.join(cache_dir, LABELS_FILE), np.array([label for _, label in samples], dtype=np.int64))
+
+    # meta.json por último: sem ele o cache é considerado incompleto
+    with open(os.path.join(cache_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'data_dir': os.path.abspath(data_dir),
+            'size': size,
+            'count': len(samples),
+            'classes': folder.classes,
+            'paths': paths,
+            'folders': folders,
+            'fingerprint': fingerprint,
+            'fingerprint_full': fingerprint_full
+        }, f)
+
+    print(f"✅ Cache gerado: {len(samples)} imagens, "
+          f"{len(samples) * size * size * 3 / 1e9:.2f} GB")
+    return cache_dir
+
+class MmapImageDataset(Dataset):
+    """
+    Dataset sobre o cache mmap; compatível com ImageFolder (classes, targets)
+    """
+
+    def __init__(self, cache_dir, transform=None):
+        with open(os.path.join(cache_dir, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        self.cache_dir = cache_dir
+        self.transform = transform
+        self.classes = meta['classes']
+        self.paths = meta['paths']
+        self.size = meta['size']
+        self.targets = np.load(os.path.join(cache_dir, LABELS_FILE))
+        self._images = None
+
+    def __len__(self):
+        return len(self.targets)
+
+    @property
+    def images(self):
+        # Aberto sob demanda para que cada worker do DataLoader tenha o seu mapa
+        if self._images is None:
+            self._images = np.memmap(
+                os.path.join(self.cache_dir, IMAGES_FILE), dtype=np.uint8, mode='c',
+                shape=(len(self.targets), self.size, self.size, 3)
+            )
+        return self._images
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+    def __getitem__(self, index):
+        # Fatia do mmap sem cópia, vista como CHW
+        image = torch.from_numpy(self.images[index]).permute(2, 0, 1)
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, int(self.targets[index])
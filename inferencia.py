@@ -0,0 +1,192 @@
+import numpy as np
+import hashlib
+import os
+from PIL import Image
+from typing import List, Optional, Sequence, Tuple
+
+# ================================================
+# 🗂️ CONFIGURAÇÕES DO MODELO
+# ================================================
+# Mantidas fora de interface.py para que o pipeline de inferência
+# possa ser usado sem o Streamlit (scripts, serviços, benchmarks).
+# Este módulo não importa torch: o backend escolhido é importado sob
+# demanda (inferencia_torch.py ou inferencia_onnx.py).
+
+# Classes do modelo
+CLASSES = ['cardboard', 'glass', 'metal', 'paper', 'plastic', 'trash']
+
+# Artefatos de cada arquitetura exportados por treinar_modelo.py:
+# 'efficientnet_b0' (modelo completo) ou 'mobilenet_v3_small' (aluno
+# destilado, para quiosques com CPU fraca; sem variante INT8)
+ARTEFATOS_ARQUITETURA = {
+    'efficientnet_b0': {
+        'model_path': 'modelo_oikos.pt',
+        'torchscript_path': 'modelo_oikos_ts.pt',
+        'quantizado_path': 'modelo_oikos_int8.pt',
+        'onnx_path': 'modelo_oikos.onnx'
+    },
+    'mobilenet_v3_small': {
+        'model_path': 'modelo_oikos_aluno.pt',
+        'torchscript_path': 'modelo_oikos_aluno_ts.pt',
+        'quantizado_path': None,
+        'onnx_path': 'modelo_oikos_aluno.onnx'
+    }
+}
+ARQUITETURA = os.environ.get('ECOIA_ARQUITETURA', 'efficientnet_b0')
+
+# Configurações do modelo
+MODEL_CONFIG = {
+    'input_size': (224, 224),
+    # JPEGs maiores são decodificados já reduzidos até este tamanho mínimo
+    'tamanho_decodificacao': (448, 448),
+    'arquitetura': ARQUITETURA,
+    **ARTEFATOS_ARQUITETURA[ARQUITETURA],
+    # 'torch' ou 'onnx' (ONNX Runtime, CPU)
+    'backend': os.environ.get('ECOIA_BACKEND', 'torch'),
+    # 'fp32' ou 'int8' (quantizado, apenas CPU e backend torch)
+    'variante': os.environ.get('ECOIA_VARIANTE', 'fp32'),
+    'confidence_threshold': 0.65,
+    'min_confidence_threshold': 0.35,
+    'entropy_threshold': 1.8,
+    'max_probability_threshold': 0.45,
+    'tamanho_lote_max': 32,
+    'espera_max_lote_ms': 10,
+    'cache_max_entradas': 512,
+    'cache_ttl_segundos': 3600,
+    # URL do servico.py; se definida, a interface usa o serviço como backend
+    'servico_url': os.environ.get('ECOIA_SERVICO_URL')
+}
+
+# Normalização ImageNet (a mesma de treinar_modelo.py)
+MEDIA = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+DESVIO = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# Resultado (classe, confiança, probabilidades, is_outlier)
+Resultado = Tuple[Optional[str], float, np.ndarray, bool]
+
+# ================================================
+# 🔌 BACKENDS
+# ================================================
+
+class BackendInferencia:
+    """Interface comum dos backends: imagens PIL -> probabilidades (N, C)"""
+
+    nome = 'base'
+
+    def prever_probabilidades(self, imagens: Sequence[Image.Image]) -> np.ndarray:
+        raise NotImplementedError
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Softmax estável por linha"""
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def como_backend(modelo) -> BackendInferencia:
+    """Aceita um backend pronto ou um módulo PyTorch (nn.Module/TorchScript)"""
+    if isinstance(modelo, BackendInferencia):
+        return modelo
+
+    from inferencia_torch import BackendTorch
+    return BackendTorch(modelo)
+
+def carregar_modelo_inferencia(backend: Optional[str] = None) -> BackendInferencia:
+    """Carrega o backend configurado em MODEL_CONFIG['backend']"""
+    backend = backend or MODEL_CONFIG['backend']
+
+    if backend == 'onnx':
+        from inferencia_onnx import BackendOnnx
+        return BackendOnnx(MODEL_CONFIG['onnx_path'])
+
+    from inferencia_torch import BackendTorch, carregar_modelo_torch
+    return BackendTorch(carregar_modelo_torch())
+
+def artefatos_modelo(backend: Optional[str] = None) -> List[str]:
+    """Arquivos que o backend (padrão: o configurado) pode carregar"""
+    if (backend or MODEL_CONFIG['backend']) == 'onnx':
+        caminhos = [MODEL_CONFIG['onnx_path']]
+    else:
+        caminhos = [MODEL_CONFIG['model_path'], MODEL_CONFIG['torchscript_path']]
+        if MODEL_CONFIG['variante'] == 'int8':
+            caminhos.append(MODEL_CONFIG['quantizado_path'])
+    return [caminho for caminho in caminhos if caminho]
+
+def modelo_disponivel(backend: Optional[str] = None) -> bool:
+    """Indica se existe algum artefato de modelo para o backend (padrão: o configurado)"""
+    return any(os.path.exists(caminho) for caminho in artefatos_modelo(backend))
+
+def versao_modelo() -> str:
+    """
+    Identifica a versão do modelo em uso pelo tamanho e data de modificação
+    dos artefatos; muda sempre que um deles é substituído.
+    """
+    partes = [MODEL_CONFIG['arquitetura'], MODEL_CONFIG['backend'], MODEL_CONFIG['variante'],
+              MODEL_CONFIG['servico_url'] or '']
+    for caminho in artefatos_modelo():
+        if os.path.exists(caminho):
+            info = os.stat(caminho)
+            partes.append(f"{caminho}:{info.st_size}:{info.st_mtime_ns}")
+    return hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()[:12]
+
+# ================================================
+# 🎯 PREDIÇÃO
+# ================================================
+
+def resultado_vazio() -> Resultado:
+    """Resultado usado quando não há modelo ou a predição falha"""
+    return None, 0, np.zeros(len(CLASSES)), True
+
+def calcular_entropia(prob: np.ndarray) -> np.ndarray:
+    """Entropia de cada linha de um lote de probabilidades (N, C)"""
+    return -np.sum(prob * np.log(prob + 1e-12), axis=1)
+
+def interpretar_probabilidades(prob: np.ndarray) -> List[Resultado]:
+    """Converte um lote de probabilidades (N, C) em resultados por imagem"""
+    prob = np.asarray(prob, dtype=np.float32)
+    indices = np.argmax(prob, axis=1)
+    confiancas = prob[np.arange(len(prob)), indices]
+
+    # Detectar outliers
+    entropias = calcular_entropia(prob)
+
+    resultados = []
+    for i in range(prob.shape[0]):
+        confianca = float(confiancas[i])
+        entropia = float(entropias[i])
+        max_prob = confianca
+
+        is_outlier = (
+            confianca < MODEL_CONFIG['min_confidence_threshold'] or
+            entropia > MODEL_CONFIG['entropy_threshold'] or
+            max_prob < MODEL_CONFIG['max_probability_threshold']
+        )
+
+        resultados.append((CLASSES[indices[i]], confianca, prob[i], is_outlier))
+
+    return resultados
+
+def fazer_predicao_lote(modelo, imagens: Sequence, tamanho_lote: Optional[int] = None) -> List[Resultado]:
+    """
+    Realiza predição em várias imagens PIL, empilhando-as em lotes
+    de até `tamanho_lote` imagens por forward pass.
+
+    `modelo` pode ser um BackendInferencia ou um módulo PyTorch.
+    Retorna uma lista com um resultado por imagem, na mesma ordem.
+    Erros de pré-processamento ou do modelo são propagados.
+    """
+    imagens = list(imagens)
+    if modelo is None:
+        return [resultado_vazio() for _ in imagens]
+
+    backend = como_backend(modelo)
+    tamanho_lote = tamanho_lote or MODEL_CONFIG['tamanho_lote_max']
+    resultados = []
+
+    for inicio in range(0, len(imagens), tamanho_lote):
+        prob = backend.prever_probabilidades(imagens[inicio:inicio + tamanho_lote])
+        resultados.extend(interpretar_probabilidades(prob))
+
+    return resultados
+
+def fazer_predicao(modelo, imagem) -> Resultado:
+    """Realiza predição em uma única imagem"""
+    return fazer_predicao_lote(modelo, [imagem], tamanho_lote=1)[0]
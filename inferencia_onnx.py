@@ -0,0 +1,32 @@
+import numpy as np
+from typing import Optional, Sequence
+
+import onnxruntime as ort
+
+from inferencia import MODEL_CONFIG, BackendInferencia, softmax
+from preprocessamento import Preprocessador
+
+# ================================================
+# ⚡ BACKEND ONNX RUNTIME
+# ================================================
+# Não importa torch: o processo de serviço fica menor e sobe mais rápido.
+
+class BackendOnnx(BackendInferencia):
+    """Executa o grafo exportado por treinar_modelo.py no ONNX Runtime (CPU)"""
+
+    nome = 'onnx'
+
+    def __init__(self, caminho: Optional[str] = None, threads: int = 0):
+        caminho = caminho or MODEL_CONFIG['onnx_path']
+
+        opcoes = ort.SessionOptions()
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opcoes.intra_op_num_threads = threads
+
+        self.sessao = ort.InferenceSession(caminho, sess_options=opcoes, providers=['CPUExecutionProvider'])
+        self.entrada = self.sessao.get_inputs()[0].name
+        self.preprocessador = Preprocessador()
+
+    def prever_probabilidades(self, imagens: Sequence) -> np.ndarray:
+        logits = self.sessao.run(None, {self.entrada: self.preprocessador.preparar(imagens)})[0]
+        return softmax(logits)
@@ -0,0 +1,101 @@
+import torch
+import torch.nn as nn
+from torchvision import models
+import numpy as np
+import os
+from typing import Optional, Sequence
+
+from inferencia import CLASSES, MODEL_CONFIG, BackendInferencia
+from preprocessamento import Preprocessador
+
+# ================================================
+# 🔥 BACKEND PYTORCH
+# ================================================
+
+def criar_modelo(arquitetura: Optional[str] = None):
+    """
+    Cria a arquitetura de MODEL_CONFIG['arquitetura'] (EfficientNet-B0 ou o
+    aluno MobileNetV3-Small) com o classificador das nossas classes
+    """
+    arquitetura = arquitetura or MODEL_CONFIG['arquitetura']
+    if arquitetura == 'mobilenet_v3_small':
+        modelo = models.mobilenet_v3_small(weights=None)
+        modelo.classifier[3] = nn.Linear(modelo.classifier[3].in_features, len(CLASSES))
+        return modelo
+    if arquitetura != 'efficientnet_b0':
+        raise ValueError(f"Arquitetura desconhecida: {arquitetura}")
+    modelo = models.efficientnet_b0(weights=None)
+    modelo.classifier[1] = nn.Linear(modelo.classifier[1].in_features, len(CLASSES))
+    return modelo
+
+def carregar_pesos(caminho: Optional[str] = None):
+    """Carrega o modelo treinado em CPU, pronto para inferência"""
+    caminho = caminho or MODEL_CONFIG['model_path']
+    modelo = criar_modelo()
+
+    device = torch.device('cpu')
+    modelo.load_state_dict(torch.load(caminho, map_location=device))
+    modelo.eval()
+
+    return modelo
+
+def carregar_torchscript(caminho: Optional[str] = None):
+    """Carrega o TorchScript congelado exportado por treinar_modelo.py"""
+    caminho = caminho or MODEL_CONFIG['torchscript_path']
+    modelo = torch.jit.load(caminho, map_location=torch.device('cpu'))
+    modelo.eval()
+    return torch.jit.optimize_for_inference(modelo)
+
+def torchscript_atualizado() -> bool:
+    """Indica se o TorchScript existe e não é mais antigo que o state dict"""
+    caminho_ts = MODEL_CONFIG['torchscript_path']
+    if not caminho_ts or not os.path.exists(caminho_ts):
+        return False
+    if os.path.exists(MODEL_CONFIG['model_path']):
+        return os.path.getmtime(caminho_ts) >= os.path.getmtime(MODEL_CONFIG['model_path'])
+    return True
+
+def carregar_quantizado(caminho: Optional[str] = None):
+    """Carrega a variante INT8 exportada por treinar_modelo.py"""
+    caminho = caminho or MODEL_CONFIG['quantizado_path']
+    engine = 'x86' if 'x86' in torch.backends.quantized.supported_engines else 'qnnpack'
+    torch.backends.quantized.engine = engine
+
+    modelo = torch.jit.load(caminho, map_location=torch.device('cpu'))
+    modelo.eval()
+    return modelo
+
+def carregar_modelo_torch():
+    """
+    Carrega o módulo PyTorch: a variante INT8 se configurada, depois o
+    TorchScript (inicialização rápida), com fallback para o state dict
+    se ele faltar, estiver desatualizado ou falhar ao carregar.
+    """
+    if MODEL_CONFIG['variante'] == 'int8':
+        try:
+            return carregar_quantizado()
+        except Exception as e:
+            print(f"⚠️ Falha ao carregar modelo INT8, usando FP32: {e}")
+
+    if torchscript_atualizado():
+        try:
+            return carregar_torchscript()
+        except Exception as e:
+            print(f"⚠️ Falha ao carregar TorchScript, usando state dict: {e}")
+
+    return carregar_pesos(MODEL_CONFIG['model_path'])
+
+class BackendTorch(BackendInferencia):
+    """Executa um nn.Module ou TorchScript em CPU"""
+
+    nome = 'torch'
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.preprocessador = Preprocessador()
+
+    def prever_probabilidades(self, imagens: Sequence) -> np.ndarray:
+        with torch.no_grad():
+            lote = torch.from_numpy(self.preprocessador.preparar(imagens))
+            saida = self.modelo(lote)
+            return torch.nn.functional.softmax(saida, dim=1).numpy()
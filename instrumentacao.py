@@ -0,0 +1,301 @@
+import collections
+import contextlib
+import cProfile
+import hmac
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ================================================
+# ⏱️ INSTRUMENTAÇÃO DOS RERUNS DO STREAMLIT
+# ================================================
+# Cada rerun de interface.main() é medido por fase (load_css, sidebar,
+# header, página, ...) e pelos bytes de ForwardMsg enviados ao navegador.
+# As amostras ficam em janelas circulares por (página, fase), de onde saem
+# p50/p95/p99 para a página de admin (?admin=<token>) e o arquivo no
+# formato texto do Prometheus (para o textfile collector do node_exporter).
+# Os bytes são contados embrulhando ScriptRunContext._enqueue, atributo
+# privado do Streamlit (requirements.txt limita a versão); se ele
+# mudar, só a contagem de bytes é desligada, com um aviso.
+# Reruns parciais de fragmentos (st.fragment) não passam por main() e são
+# medidos à parte, com o nome do fragmento no lugar da página.
+# Perfis opcionais: cProfile (.prof, abre no snakeviz) e pilhas amostradas
+# no formato "collapsed" do py-spy/flamegraph (.folded, abre no speedscope).
+
+INSTRUMENTACAO_CONFIG = {
+    'ativo': os.environ.get('ECOIA_INSTRUMENTACAO', '1') == '1',
+    'janela': 2048,                          # amostras guardadas por (página, fase)
+    'arquivo_prometheus': 'metricas_rerun.prom',
+    'intervalo_exportacao_s': 15,
+    'pasta_perfis': 'perfis',
+    'intervalo_amostragem_s': 0.005,
+    # Sem token a página de admin fica desligada; com ele, abre com ?admin=<token>
+    'token_admin': os.environ.get('ECOIA_ADMIN_TOKEN')
+}
+
+QUANTIS = (0.5, 0.95, 0.99)
+
+class AmostradorPilhas:
+    """Amostra a pilha de uma thread em intervalos fixos (pilhas 'collapsed')"""
+
+    def __init__(self, thread_id: int, intervalo: float):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = collections.Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            quadro = sys._current_frames().get(self.thread_id)
+            nomes = []
+            while quadro is not None:
+                codigo = quadro.f_code
+                nomes.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{quadro.f_lineno})")
+                quadro = quadro.f_back
+            if nomes:
+                self.pilhas[';'.join(reversed(nomes))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+    def salvar(self, caminho: str):
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            for pilha, contagem in self.pilhas.most_common():
+                arquivo.write(f"{pilha} {contagem}\n")
+
+class Rerun:
+    """Medições de um rerun em andamento"""
+
+    def __init__(self, pagina: str = 'desconhecida'):
+        self.pagina = pagina
+        self.fases: Dict[str, float] = {}
+        # None quando os bytes não foram contados (fora do Streamlit ou contagem desligada)
+        self.bytes: Optional[int] = None
+        self.mensagens = 0
+
+    @contextlib.contextmanager
+    def fase(self, nome: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nome] = self.fases.get(nome, 0.0) + time.perf_counter() - inicio
+
+class Instrumentacao:
+    """Agrega os reruns de todas as sessões (thread-safe)"""
+
+    def __init__(self, janela: Optional[int] = None):
+        self.janela = janela or INSTRUMENTACAO_CONFIG['janela']
+        self.duracoes = collections.defaultdict(lambda: collections.deque(maxlen=self.janela))
+        self.bytes = collections.defaultdict(lambda: collections.deque(maxlen=self.janela))
+        self.somas = collections.defaultdict(float)
+        self.contagens = collections.Counter()
+        self.reruns_perfilados = 0
+        self.contar_bytes = True
+        self._lock = threading.Lock()
+        self._ultima_exportacao = 0.0
+
+    # ---------- coleta ----------
+
+    @contextlib.contextmanager
+    def medir_rerun(self, perfilar: bool = False):
+        """
+        Mede o rerun inteiro ('total') e conta os bytes enviados ao navegador.
+        Com perfilar=True grava também .prof e .folded em pasta_perfis.
+        """
+        rerun = Rerun()
+        if not INSTRUMENTACAO_CONFIG['ativo']:
+            yield rerun
+            return
+
+        contador = self._contar_bytes(rerun)
+        perfil = cProfile.Profile() if perfilar else None
+        amostrador = AmostradorPilhas(threading.get_ident(), INSTRUMENTACAO_CONFIG['intervalo_amostragem_s']) \
+            if perfilar else None
+        inicio = time.perf_counter()
+        try:
+            with amostrador or contextlib.nullcontext():
+                if perfil:
+                    perfil.enable()
+                try:
+                    yield rerun
+                finally:
+                    if perfil:
+                        perfil.disable()
+        finally:
+            # st.rerun()/st.stop() também passam por aqui (exceções de controle)
+            rerun.fases['total'] = time.perf_counter() - inicio
+            if contador is not None:
+                ctx, original = contador
+                ctx._enqueue = original
+            self.registrar(rerun)
+            if perfilar:
+                self._salvar_perfil(rerun, perfil, amostrador)
+            self.exportar_periodicamente()
+
+    def registrar(self, rerun: Rerun):
+        with self._lock:
+            for fase, segundos in rerun.fases.items():
+                chave = (rerun.pagina, fase)
+                self.duracoes[chave].append(segundos)
+                self.somas[chave] += segundos
+                self.contagens[chave] += 1
+            if rerun.bytes is not None:
+                self.bytes[rerun.pagina].append(rerun.bytes)
+                self.somas[(rerun.pagina, 'bytes')] += rerun.bytes
+                self.contagens[(rerun.pagina, 'bytes')] += 1
+
+    def _contar_bytes(self, rerun: Rerun):
+        """
+        Embrulha ctx._enqueue para somar os bytes do rerun; retorna
+        (ctx, enqueue original) para restaurar ou None se não contar
+        """
+        ctx = _contexto_streamlit()
+        if ctx is None or not self.contar_bytes:
+            return None
+        original = getattr(ctx, '_enqueue', None)
+        if not callable(original):
+            self._desligar_contagem_bytes("ScriptRunContext sem _enqueue")
+            return None
+
+        def contar(mensagem):
+            try:
+                rerun.bytes += mensagem.ByteSize()
+                rerun.mensagens += 1
+            except Exception as e:
+                self._desligar_contagem_bytes(f"ForwardMsg sem ByteSize ({e})")
+            original(mensagem)
+
+        try:
+            ctx._enqueue = contar
+        except Exception as e:
+            self._desligar_contagem_bytes(f"{type(e).__name__}: {e}")
+            return None
+        rerun.bytes = 0
+        return ctx, original
+
+    def _desligar_contagem_bytes(self, motivo: str):
+        with self._lock:
+            if not self.contar_bytes:
+                return
+            self.contar_bytes = False
+        print(f"⚠️ Contagem de bytes dos reruns desligada (Streamlit incompatível): {motivo}")
+
+    def _salvar_perfil(self, rerun: Rerun, perfil: cProfile.Profile, amostrador: AmostradorPilhas):
+        pasta = INSTRUMENTACAO_CONFIG['pasta_perfis']
+        os.makedirs(pasta, exist_ok=True)
+        base = os.path.join(pasta, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{rerun.pagina}")
+        perfil.dump_stats(base + '.prof')
+        amostrador.salvar(base + '.folded')
+        with self._lock:
+            self.reruns_perfilados += 1
+
+    # ---------- consulta ----------
+
+    def resumo(self) -> List[Dict]:
+        """Uma linha por (página, fase): reruns, p50/p95/p99 em ms e média"""
+        with self._lock:
+            amostras = {chave: np.asarray(valores) for chave, valores in self.duracoes.items()}
+            bytes_por_pagina = {pagina: np.asarray(valores) for pagina, valores in self.bytes.items()}
+            contagens = dict(self.contagens)
+
+        linhas = []
+        for (pagina, fase), valores in sorted(amostras.items()):
+            p50, p95, p99 = np.quantile(valores, QUANTIS) * 1000
+            linha = {'pagina': pagina, 'fase': fase, 'reruns': contagens[(pagina, fase)],
+                     'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'media_ms': valores.mean() * 1000}
+            if fase == 'total' and len(bytes_por_pagina.get(pagina, [])):
+                linha['bytes_p50'], linha['bytes_p95'] = np.quantile(bytes_por_pagina[pagina], (0.5, 0.95))
+            linhas.append(linha)
+        return linhas
+
+    def prometheus(self) -> str:
+        """Métricas no formato de exposição em texto do Prometheus (summaries)"""
+        with self._lock:
+            duracoes = {chave: np.asarray(valores) for chave, valores in self.duracoes.items()}
+            bytes_por_pagina = {pagina: np.asarray(valores) for pagina, valores in self.bytes.items()}
+            somas = dict(self.somas)
+            contagens = dict(self.contagens)
+
+        linhas = [
+            "# HELP ecodetector_rerun_seconds Duração das fases de cada rerun da interface",
+            "# TYPE ecodetector_rerun_seconds summary"
+        ]
+        for (pagina, fase), valores in sorted(duracoes.items()):
+            rotulos = f'pagina="{pagina}",fase="{fase}"'
+            for quantil, valor in zip(QUANTIS, np.quantile(valores, QUANTIS)):
+                linhas.append(f'ecodetector_rerun_seconds{{{rotulos},quantile="{quantil}"}} {valor:.6f}')
+            linhas.append(f'ecodetector_rerun_seconds_sum{{{rotulos}}} {somas[(pagina, fase)]:.6f}')
+            linhas.append(f'ecodetector_rerun_seconds_count{{{rotulos}}} {contagens[(pagina, fase)]}')
+
+        linhas += [
+            "# HELP ecodetector_rerun_bytes Bytes de ForwardMsg enviados ao navegador por rerun",
+            "# TYPE ecodetector_rerun_bytes summary"
+        ]
+        for pagina, valores in sorted(bytes_por_pagina.items()):
+            rotulos = f'pagina="{pagina}"'
+            for quantil, valor in zip(QUANTIS, np.quantile(valores, QUANTIS)):
+                linhas.append(f'ecodetector_rerun_bytes{{{rotulos},quantile="{quantil}"}} {valor:.0f}')
+            linhas.append(f'ecodetector_rerun_bytes_sum{{{rotulos}}} {somas[(pagina, "bytes")]:.0f}')
+            linhas.append(f'ecodetector_rerun_bytes_count{{{rotulos}}} {contagens[(pagina, "bytes")]}')
+        return '\n'.join(linhas) + '\n'
+
+    def exportar(self, caminho: Optional[str] = None) -> str:
+        """Grava o arquivo .prom de forma atômica (o coletor nunca lê pela metade)"""
+        caminho = caminho or INSTRUMENTACAO_CONFIG['arquivo_prometheus']
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+            arquivo.write(self.prometheus())
+        os.replace(caminho + '.tmp', caminho)
+        return caminho
+
+    def exportar_periodicamente(self):
+        agora = time.monotonic()
+        with self._lock:
+            if agora - self._ultima_exportacao < INSTRUMENTACAO_CONFIG['intervalo_exportacao_s']:
+                return
+            self._ultima_exportacao = agora
+        try:
+            self.exportar()
+        except OSError as e:
+            print(f"⚠️ Falha ao exportar métricas: {e}")
+
+    def limpar(self):
+        with self._lock:
+            self.duracoes.clear()
+            self.bytes.clear()
+            self.somas.clear()
+            self.contagens.clear()
+
+def _contexto_streamlit():
+    """ScriptRunContext do rerun atual (None fora do Streamlit)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    return get_script_run_ctx(suppress_warning=True)
+
+def rerun_de_fragmento() -> bool:
+    """True quando o rerun atual executa só fragmentos (st.fragment), sem main()"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return False
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return bool(ctx is not None and getattr(ctx, 'fragment_ids_this_run', None))
+
+def admin_autorizado(valor: Optional[str]) -> bool:
+    """Valor de ?admin= que abre a página de admin (nunca, sem token configurado)"""
+    token = INSTRUMENTACAO_CONFIG['token_admin']
+    if not token or not valor:
+        return False
+    return hmac.compare_digest(valor.encode('utf-8'), token.encode('utf-8'))
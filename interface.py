@@ -1,21 +1,33 @@
 import streamlit as st
-import torch
-import torch.nn as nn
-from torchvision import models, transforms
-from PIL import Image, ImageEnhance
-import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import pydeck as pdk
 import os
 import json
+import functools
+import gc
+import re
+import uuid
+import weakref
 from datetime import datetime, timedelta
 import time
 from typing import Tuple, Dict, List, Optional
-import base64
+import tempfile
 from io import BytesIO
 
+import inferencia
+from inferencia import CLASSES, MODEL_CONFIG
+from agendador import AgendadorInferencia
+from servico import ClienteServico
+from cache_predicoes import CachePredicoes
+from preprocessamento import abrir_imagem
+import streaming
+import ativos
+from armazenamento import RepositorioPerfis, criar_armazenamento
+from registro_deteccoes import abrir_registro
+from instrumentacao import Instrumentacao, INSTRUMENTACAO_CONFIG, admin_autorizado, rerun_de_fragmento
+
 # ================================================
 # 🎨 CONFIGURAÇÕES INICIAIS
 # ================================================
@@ -381,18 +393,7 @@ def load_css():
 # 🗂️ DADOS E CONFIGURAÇÕES
 # ================================================
 
-# Classes do modelo
-CLASSES = ['cardboard', 'glass', 'metal', 'paper', 'plastic', 'trash']
-
-# Configurações do modelo
-MODEL_CONFIG = {
-    'input_size': (224, 224),
-    'model_path': 'modelo_oikos.pt',
-    'confidence_threshold': 0.65,
-    'min_confidence_threshold': 0.35,
-    'entropy_threshold': 1.8,
-    'max_probability_threshold': 0.45
-}
+# Classes do modelo e MODEL_CONFIG vêm de inferencia.py
 
 # Metadados das classes
 CLASS_METADATA = {
@@ -591,22 +592,33 @@ PONTOS_COLETA = {
 # 🔧 FUNÇÕES AUXILIARES
 # ================================================
 
+@st.cache_resource(show_spinner=False)
+def obter_repositorio():
+    """Perfis persistentes (cache + gravação em lotes) compartilhados por todas as sessões"""
+    return RepositorioPerfis(criar_armazenamento())
+
+@st.cache_resource(show_spinner=False)
+def obter_registro():
+    """Log colunar de detecções com agregados por classe, dia e usuário (um por processo)"""
+    return abrir_registro()
+
+def obter_usuario_id() -> str:
+    """
+    Identificador do perfil. Fica na URL (?usuario=) para que recarregar
+    a página (ou abrir o link em outra aba) volte ao mesmo perfil.
+    """
+    if 'usuario_id' not in st.session_state:
+        usuario_id = st.query_params.get('usuario', '')
+        if not re.fullmatch(r'[0-9A-Za-z_-]{8,64}', usuario_id):
+            usuario_id = uuid.uuid4().hex
+            st.query_params['usuario'] = usuario_id
+        st.session_state.usuario_id = usuario_id
+    return st.session_state.usuario_id
+
 def inicializar_sessao():
     """Inicializa dados da sessão"""
-    if 'user_data' not in st.session_state:
-        st.session_state.user_data = {
-            'ecomoedas_total': 0,
-            'deteccoes_realizadas': 0,
-            'historico_deteccoes': [],
-            'medalhas_conquistadas': [],
-            'impacto_total': {'co2': 0.0, 'energia': 0.0, 'agua': 0.0},
-            'contadores_classe': {classe: 0 for classe in CLASSES},
-            'streak_atual': 0,
-            'nivel_usuario': 1,
-            'xp_total': 0,
-            'data_ultimo_acesso': datetime.now().isoformat(),
-            'recompensas_resgatadas': []
-        }
+    # O dicionário vem do cache do repositório (mesmo objeto em todas as abas do usuário)
+    st.session_state.user_data = obter_repositorio().perfil(obter_usuario_id())
     if 'current_page' not in st.session_state:
         st.session_state.current_page = 'Detector'
 
@@ -616,30 +628,34 @@ def salvar_deteccao(classe: str, confianca: float, ecomoedas: int):
         'timestamp': datetime.now().isoformat(),
         'classe': classe,
         'confianca': confianca,
-        'ecomoedas': ecomoedas,
-        'impacto': ECOMOEDA_SISTEMA[classe]['impacto']
+        'ecomoedas': ecomoedas
     }
     
-    user_data = st.session_state.user_data
-    user_data['historico_deteccoes'].append(deteccao)
-    user_data['ecomoedas_total'] += ecomoedas
-    user_data['deteccoes_realizadas'] += 1
-    user_data['contadores_classe'][classe] += 1
-    user_data['xp_total'] += ecomoedas * 2
-    
-    # Atualizar impacto
-    impacto = ECOMOEDA_SISTEMA[classe]['impacto']
-    user_data['impacto_total']['co2'] += impacto['co2']
-    user_data['impacto_total']['energia'] += impacto['energia']
-    user_data['impacto_total']['agua'] += impacto['agua']
-    
-    # Atualizar nível
-    novo_nivel = min(10, user_data['xp_total'] // 100 + 1)
-    if novo_nivel > user_data['nivel_usuario']:
-        user_data['nivel_usuario'] = novo_nivel
-        return True, verificar_medalhas()
-    
-    return False, verificar_medalhas()
+    # A detecção vai só para o registro; a escrita em disco fica fora do
+    # lock do repositório, que serializa as edições de todas as sessões
+    obter_registro().registrar(obter_usuario_id(), deteccao)
+    
+    repositorio = obter_repositorio()
+    with repositorio.editar(obter_usuario_id()) as user_data:
+        st.session_state.user_data = user_data
+        user_data['ecomoedas_total'] += ecomoedas
+        user_data['deteccoes_realizadas'] += 1
+        user_data['contadores_classe'][classe] += 1
+        user_data['xp_total'] += ecomoedas * 2
+        
+        # Atualizar impacto
+        impacto = ECOMOEDA_SISTEMA[classe]['impacto']
+        user_data['impacto_total']['co2'] += impacto['co2']
+        user_data['impacto_total']['energia'] += impacto['energia']
+        user_data['impacto_total']['agua'] += impacto['agua']
+        
+        # Atualizar nível
+        novo_nivel = min(10, user_data['xp_total'] // 100 + 1)
+        if novo_nivel > user_data['nivel_usuario']:
+            user_data['nivel_usuario'] = novo_nivel
+            return True, verificar_medalhas()
+        
+        return False, verificar_medalhas()
 
 def verificar_medalhas():
     """Verifica e retorna novas medalhas"""
@@ -668,106 +684,213 @@ def verificar_medalhas():
     return novas_medalhas
 def resgatar_recompensa(recompensa_id: str, categoria: str):
     """Resgata uma recompensa usando EcoMoedas"""
-    user_data = st.session_state.user_data
     recompensa = RECOMPENSAS[categoria][recompensa_id]
-    
-    if user_data['ecomoedas_total'] >= recompensa['custo']:
-        user_data['ecomoedas_total'] -= recompensa['custo']
-        user_data['recompensas_resgatadas'].append({
-            'id': recompensa_id,
-            'nome': recompensa['nome'],
-            'categoria': categoria,
-            'timestamp': datetime.now().isoformat(),
-            'custo': recompensa['custo']
-        })
-        return True
+    repositorio = obter_repositorio()
+    
+    with repositorio.editar(obter_usuario_id()) as user_data:
+        st.session_state.user_data = user_data
+        if user_data['ecomoedas_total'] >= recompensa['custo']:
+            user_data['ecomoedas_total'] -= recompensa['custo']
+            repositorio.registrar_resgate(obter_usuario_id(), {
+                'id': recompensa_id,
+                'nome': recompensa['nome'],
+                'categoria': categoria,
+                'timestamp': datetime.now().isoformat(),
+                'custo': recompensa['custo']
+            })
+            return True
     return False
 
 # ================================================
 # 🤖 FUNÇÕES DO MODELO
 # ================================================
 
-@st.cache_resource(show_spinner="🤖 Carregando modelo de IA...")
-def carregar_modelo():
-    """Carrega o modelo treinado"""
+@st.cache_resource(show_spinner="🤖 Carregando modelo de IA...", max_entries=1)
+def carregar_modelo(versao: str):
+    """
+    Carrega o modelo treinado (ou o cliente do serviço de classificação).
+    `versao` (inferencia.versao_modelo) faz o cache recarregar quando o arquivo muda.
+    """
     try:
-        if not os.path.exists(MODEL_CONFIG['model_path']):
-            st.error(f"❌ Modelo não encontrado: {MODEL_CONFIG['model_path']}")
-            st.info("💡 Coloque o arquivo 'modelo_oikos.pt' na pasta do projeto")
-            return None
-        
-        # Criar modelo EfficientNet-B0
-        modelo = models.efficientnet_b0(weights=None)
-        modelo.classifier[1] = nn.Linear(modelo.classifier[1].in_features, len(CLASSES))
+        if MODEL_CONFIG['servico_url']:
+            cliente = ClienteServico(MODEL_CONFIG['servico_url'])
+            cliente.saude()
+            return cliente
         
-        # Carregar pesos
-        device = torch.device('cpu')
-        modelo.load_state_dict(torch.load(MODEL_CONFIG['model_path'], map_location=device))
-        modelo.eval()
+        if not inferencia.modelo_disponivel():
+            caminho = MODEL_CONFIG['onnx_path'] if MODEL_CONFIG['backend'] == 'onnx' else MODEL_CONFIG['model_path']
+            st.error(f"❌ Modelo não encontrado: {caminho}")
+            st.info(f"💡 Coloque o arquivo '{os.path.basename(MODEL_CONFIG['model_path'])}' na pasta do projeto")
+            return None
         
-        return modelo
+        return inferencia.carregar_modelo_inferencia()
         
     except Exception as e:
         st.error(f"❌ Erro ao carregar modelo: {str(e)}")
         return None
 
-# Transformações de imagem
-transformacao = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-])
+@st.cache_resource(show_spinner=False)
+def obter_estado_gc():
+    """Modelo cujos objetos estão congelados no gc (compartilhado por todas as sessões)"""
+    return {'modelo': None}
+
+def congelar_objetos_carregados(modelo):
+    """
+    Move os objetos vivos (módulos, torch, pesos) para a geração permanente do gc.
+    O Streamlit roda gc.collect(2) ao fim de cada rerun, inclusive de fragmentos
+    (runner.postScriptGC); sem isso ele percorre ~390 mil objetos (~230 ms) a cada clique.
+
+    Objetos congelados nunca são coletados, então ao trocar de versão o gc é
+    descongelado e só volta a congelar quando o modelo antigo deixar de existir
+    (sessões e agendador antigos ainda podem segurá-lo por alguns reruns).
+    """
+    estado = obter_estado_gc()
+    anterior = estado['modelo']() if estado['modelo'] is not None else None
+    if anterior is modelo:
+        return
+    if anterior is not None:
+        if gc.get_freeze_count():
+            gc.unfreeze()
+        return
+    gc.collect()
+    gc.freeze()
+    estado['modelo'] = weakref.ref(modelo)
+
+def encerrar_agendador(agendador):
+    """Para a thread do agendador descartado; ela segurava o modelo da versão antiga"""
+    agendador.encerrar(timeout=0)
+
+@st.cache_resource(show_spinner=False, max_entries=1, on_release=encerrar_agendador)
+def obter_agendador(_modelo, versao: str):
+    """Agendador de micro-lotes compartilhado por todas as sessões"""
+    return AgendadorInferencia(_modelo)
+
+@st.cache_resource(show_spinner=False)
+def obter_instrumentacao():
+    """Métricas de rerun agregadas de todas as sessões"""
+    return Instrumentacao()
+
+def fragmento(nome: str, **opcoes):
+    """
+    st.fragment (reruns parciais) que também entra na instrumentação: quando
+    só o fragmento roda, o rerun é registrado com `nome` no lugar da página;
+    dentro de um rerun completo quem mede é main()
+    """
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def executar(*args, **kwargs):
+            if not rerun_de_fragmento():
+                return funcao(*args, **kwargs)
+            with obter_instrumentacao().medir_rerun() as rerun:
+                rerun.pagina = nome
+                with rerun.fase(nome):
+                    return funcao(*args, **kwargs)
+        return st.fragment(executar, **opcoes)
+    return decorar
+
+@st.cache_resource(show_spinner=False)
+def obter_cache_predicoes():
+    """Cache de predições compartilhado por todas as sessões"""
+    return CachePredicoes()
+
+def prever_com_cache(modelo, imagens):
+    """Consulta o cache e só envia ao modelo as imagens ainda não vistas"""
+    versao = inferencia.versao_modelo()
+    
+    def prever(faltando):
+        if isinstance(modelo, ClienteServico):
+            return modelo.classificar_lote(faltando)
+        futuros = obter_agendador(modelo, versao).submeter_varias(faltando)
+        return [futuro.result() for futuro in futuros]
+    
+    return obter_cache_predicoes().prever_lote(imagens, prever, versao)
 
 def fazer_predicao(modelo, imagem):
     """Realiza predição na imagem"""
     if modelo is None:
-        return None, 0, np.zeros(len(CLASSES)), True
+        return inferencia.resultado_vazio()
     
     try:
-        # Preprocessar imagem
-        img_tensor = transformacao(imagem).unsqueeze(0)
-        
-        # Fazer predição
-        with torch.no_grad():
-            saida = modelo(img_tensor)
-            prob = torch.nn.functional.softmax(saida[0], dim=0)
-            
-            classe_idx = torch.argmax(prob).item()
-            classe_predita = CLASSES[classe_idx]
-            confianca = prob[classe_idx].item()
-            
-            # Detectar outliers
-            entropia = -torch.sum(prob * torch.log(prob + 1e-12)).item()
-            max_prob = torch.max(prob).item()
-            
-            is_outlier = (
-                confianca < MODEL_CONFIG['min_confidence_threshold'] or
-                entropia > MODEL_CONFIG['entropy_threshold'] or
-                max_prob < MODEL_CONFIG['max_probability_threshold']
-            )
-            
-            return classe_predita, confianca, prob.numpy(), is_outlier
-            
+        return prever_com_cache(modelo, [imagem])[0]
     except Exception as e:
         st.error(f"❌ Erro na predição: {str(e)}")
-        return None, 0, np.zeros(len(CLASSES)), True
+        return inferencia.resultado_vazio()
+
+def fazer_predicao_lote(modelo, imagens):
+    """Realiza predição em várias imagens de uma vez"""
+    if modelo is None:
+        return [inferencia.resultado_vazio() for _ in imagens]
+    
+    try:
+        return prever_com_cache(modelo, imagens)
+    except Exception as e:
+        st.error(f"❌ Erro na predição em lote: {str(e)}")
+        return [inferencia.resultado_vazio() for _ in imagens]
+
+def analisar_uploads(modelo, arquivos):
+    """
+    (imagem, resultado) de cada upload, guardados na sessão por file_id:
+    reruns que não trocam os arquivos não decodificam nem consultam o modelo
+    """
+    versao = inferencia.versao_modelo()
+    anteriores = st.session_state.get('analises_upload', {})
+    analises = {}
+    faltando = []
+    for arquivo in arquivos:
+        chave = (arquivo.file_id, versao)
+        if chave in anteriores:
+            analises[chave] = anteriores[chave]
+        else:
+            faltando.append(arquivo)
+    
+    if faltando:
+        imagens = [abrir_imagem(arquivo) for arquivo in faltando]
+        texto = "🤖 Analisando com IA..." if len(arquivos) == 1 else f"🤖 Analisando {len(arquivos)} imagens com IA..."
+        with st.spinner(texto):
+            resultados = fazer_predicao_lote(modelo, imagens)
+        for arquivo, imagem, resultado in zip(faltando, imagens, resultados):
+            analises[(arquivo.file_id, versao)] = (imagem, resultado)
+    
+    # Só os uploads atuais ficam na sessão; falhas do modelo não são guardadas
+    st.session_state.analises_upload = {chave: analise for chave, analise in analises.items()
+                                        if analise[1][0] is not None}
+    return [analises[(arquivo.file_id, versao)] for arquivo in arquivos]
+
+@st.cache_resource(show_spinner=False)
+def abrir_exemplo(caminho: str):
+    """Imagens de exemplo decodificadas uma vez para todas as sessões"""
+    return abrir_imagem(caminho)
+
+def calcular_ecomoedas(classe: str, confianca: float) -> Tuple[int, float]:
+    """Calcula EcoMoedas ganhas e o multiplicador por confiança"""
+    multiplicador = 1.2 if confianca >= 0.9 else 0.8 if confianca < 0.7 else 1.0
+    return int(ECOMOEDA_SISTEMA[classe]['valor'] * multiplicador), multiplicador
 
 # ================================================
 # 🎨 COMPONENTES VISUAIS
 # ================================================
 
+@st.cache_resource(show_spinner=False)
+def obter_css_banner() -> str:
+    """
+    CSS do banner: variantes AVIF/WebP geradas uma vez e servidas em app/static/.
+    Sem server.enableStaticServing, embute o WebP médio (codificado uma única vez).
+    """
+    variantes = ativos.preparar_ativo("img/tela_inicial.png")
+    if st.get_option('server.enableStaticServing'):
+        return ativos.css_fundo_responsivo('.eco-header', variantes)
+    
+    webp = [v for v in variantes if v['formato'] == 'webp'] or variantes
+    media = webp[len(webp) // 2]
+    return f'.eco-header {{ background-image: url("{ativos.data_url(media)}"); }}'
+
 def criar_header():
     """Exibe apenas a imagem de fundo como banner"""
 
-    image_path = "img/tela_inicial.png"
-
-    with open(image_path, "rb") as img_file:
-        encoded = base64.b64encode(img_file.read()).decode()
-
     st.markdown(f"""
     <style>
+    {obter_css_banner()}
     .eco-header {{
-        background-image: url("data:image/png;base64,{encoded}");
         background-size: cover;
         background-position: center;
         height: 300px;
@@ -1048,8 +1171,12 @@ def hex_to_rgb(hex_color):
     hex_color = hex_color.lstrip('#')
     return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
 
-def criar_mapa_interativo(material, mostrar_calor=True, mostrar_nomes=True):
-    """Cria visualização interativa com pontos, calor e nomes"""
+@st.cache_resource(show_spinner=False)
+def criar_mapa_interativo(material, mostrar_calor=True, mostrar_nomes=True, vista_3d=False):
+    """
+    Cria visualização interativa com pontos, calor e nomes
+    (um Deck por combinação de opções, compartilhado entre as sessões)
+    """
     
     pontos = PONTOS_COLETA.get(material, [])
     if not pontos:
@@ -1102,7 +1229,9 @@ def criar_mapa_interativo(material, mostrar_calor=True, mostrar_nomes=True):
         latitude=df["lat"].mean(),
         longitude=df["lon"].mean(),
         zoom=6,
-        pitch=0,
+        # Rotação e inclinação na vista 3D
+        pitch=45 if vista_3d else 0,
+        bearing=-15 if vista_3d else 0,
     )
 
     return pdk.Deck(
@@ -1110,6 +1239,123 @@ def criar_mapa_interativo(material, mostrar_calor=True, mostrar_nomes=True):
         initial_view_state=view_state,
         tooltip={"text": "{nome} - {cidade}"}
     )
+@fragmento('mapa_pontos')
+def mostrar_mapa_pontos(material):
+    """Mapa e suas opções; marcar uma camada reruna só este fragmento"""
+    # Opções de visualização do mapa
+    col_opt1, col_opt2 = st.columns([3, 1])
+    
+    with col_opt2:
+        vista_3d = st.checkbox("🎮 Vista 3D", value=False)
+        mostrar_calor = st.checkbox("🔥 Mapa de Calor", value=True)
+        mostrar_nomes = st.checkbox("🏷️ Nomes das Cidades", value=True)
+    
+    # Criar e mostrar mapa
+    try:
+        # Chama a função criando o mapa com base nas opções selecionadas pelo usuário
+        deck = criar_mapa_interativo(
+            material=material,
+            mostrar_calor=mostrar_calor,
+            mostrar_nomes=mostrar_nomes,
+            vista_3d=vista_3d
+        )
+        
+        if deck:
+            # Exibe o mapa na interface Streamlit
+            st.pydeck_chart(deck, use_container_width=True)
+
+            # Instruções visuais para o usuário
+            st.info("""
+            💡 **Dicas de Navegação:**
+            - 🖱️ **Clique e arraste** para mover o mapa  
+            - 🔍 **Scroll** para zoom in/out  
+            - 📍 **Clique nos pontos** para ver detalhes  
+            - 🎮 **Segure Ctrl + arraste** para rotacionar (modo 3D)
+            """)
+        else:
+            st.error("❌ Erro ao carregar o mapa")
+    except Exception as e:
+        st.error(f"❌ Erro ao criar o mapa: {str(e)}")
+
+@fragmento('lista_pontos')
+def mostrar_lista_pontos(material):
+    """Lista filtrável dos pontos; os filtros rerunam só este fragmento"""
+    pontos = PONTOS_COLETA.get(material, [])
+    material_info = CLASS_METADATA.get(material, {})
+    material_emoji = material_info.get('emoji', '♻️')
+    
+    # Filtros
+    st.markdown("#### 🔍 Filtrar Pontos")
+    
+    col_filter1, col_filter2 = st.columns(2)
+    
+    with col_filter1:
+        cidades_disponiveis = sorted(set(p['cidade'] for p in pontos))
+        cidade_filtro = st.multiselect(
+            "Selecione as cidades:",
+            options=cidades_disponiveis,
+            default=cidades_disponiveis
+        )
+    
+    with col_filter2:
+        busca_nome = st.text_input("🔎 Buscar por nome:", "")
+    
+    # Filtrar pontos
+    pontos_filtrados = [
+        p for p in pontos 
+        if p['cidade'] in cidade_filtro and 
+        (busca_nome.lower() in p['nome'].lower() if busca_nome else True)
+    ]
+    
+    # Agrupar por cidade
+    pontos_por_cidade = {}
+    for ponto in pontos_filtrados:
+        cidade = ponto['cidade']
+        if cidade not in pontos_por_cidade:
+            pontos_por_cidade[cidade] = []
+        pontos_por_cidade[cidade].append(ponto)
+    
+    # Mostrar pontos agrupados
+    st.markdown(f"#### 📍 {len(pontos_filtrados)} Pontos Encontrados")
+    
+    for cidade, pontos_cidade in sorted(pontos_por_cidade.items()):
+        with st.expander(f"🏙️ **{cidade}** ({len(pontos_cidade)} pontos)", expanded=True):
+            for i, ponto in enumerate(pontos_cidade):
+                # Card para cada ponto
+                st.markdown(f"""
+                <div style="background: linear-gradient(135deg, #ffffff, #f8fff8); 
+                            padding: 1.5rem; margin: 1rem 0; border-radius: 15px; 
+                            border-left: 5px solid {material_info.get('color', '#3e8e41')}; 
+                            box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+                    <div style="display: flex; justify-content: space-between; align-items: start;">
+                        <div style="flex: 1;">
+                            <h4 style="margin: 0 0 0.5rem 0; color: #2d5a2d;">
+                                {material_emoji} {ponto['nome']}
+                            </h4>
+                            <p style="margin: 0.3rem 0; color: #555;">
+                                <strong>📍 Endereço:</strong> {ponto['endereco']}
+                            </p>
+                            <p style="margin: 0.3rem 0; color: #555;">
+                                <strong>🕐 Horário:</strong> {ponto['horario']}
+                            </p>
+                            <p style="margin: 0.3rem 0; color: #555;">
+                                <strong>📞 Telefone:</strong> {ponto.get('telefone', 'Não disponível')}
+                            </p>
+                        </div>
+                        <div style="text-align: center; padding: 0.5rem;">
+                            <a href="https://www.google.com/maps/search/?api=1&query={ponto['lat']},{ponto['lon']}" 
+                               target="_blank" 
+                               style="background: linear-gradient(45deg, #3e8e41, #28a745); 
+                                      color: white; padding: 0.5rem 1rem; border-radius: 8px; 
+                                      text-decoration: none; display: inline-block; 
+                                      transition: all 0.3s ease;">
+                                🗺️ Ver no Maps
+                            </a>
+                        </div>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
 def mostrar_secao_mapa_melhorada(material):
     """Mostra seção do mapa com interface melhorada"""
     
@@ -1185,44 +1431,7 @@ def mostrar_secao_mapa_melhorada(material):
     tab1, tab2, tab3 = st.tabs(["🗺️ Mapa Interativo", "📊 Estatísticas", "📋 Lista Detalhada"])
     
     with tab1:
-        # Opções de visualização do mapa
-        col_opt1, col_opt2 = st.columns([3, 1])
-        
-        with col_opt2:
-            vista_3d = st.checkbox("🎮 Vista 3D", value=False)
-            mostrar_calor = st.checkbox("🔥 Mapa de Calor", value=True)
-            mostrar_nomes = st.checkbox("🏷️ Nomes das Cidades", value=True)
-        
-        # Criar e mostrar mapa
-        try:
-            # Chama a função criando o mapa com base nas opções selecionadas pelo usuário
-            deck = criar_mapa_interativo(
-                material=material,
-                mostrar_calor=mostrar_calor,
-                mostrar_nomes=mostrar_nomes
-            )
-            
-            if deck:
-                # Aplica rotação e inclinação se a vista 3D estiver ativada
-                if vista_3d:
-                    deck.initial_view_state.pitch = 45
-                    deck.initial_view_state.bearing = -15
-
-                # Exibe o mapa na interface Streamlit
-                st.pydeck_chart(deck, use_container_width=True)
-
-                # Instruções visuais para o usuário
-                st.info("""
-                💡 **Dicas de Navegação:**
-                - 🖱️ **Clique e arraste** para mover o mapa  
-                - 🔍 **Scroll** para zoom in/out  
-                - 📍 **Clique nos pontos** para ver detalhes  
-                - 🎮 **Segure Ctrl + arraste** para rotacionar (modo 3D)
-                """)
-            else:
-                st.error("❌ Erro ao carregar o mapa")
-        except Exception as e:
-            st.error(f"❌ Erro ao criar o mapa: {str(e)}")
+        mostrar_mapa_pontos(material)
     
     with tab2:
         # Mostrar gráfico de estatísticas
@@ -1253,77 +1462,7 @@ def mostrar_secao_mapa_melhorada(material):
                 st.markdown(f"• {horario}: {count} local(is)")
     
     with tab3:
-        # Filtros
-        st.markdown("#### 🔍 Filtrar Pontos")
-        
-        col_filter1, col_filter2 = st.columns(2)
-        
-        with col_filter1:
-            cidades_disponiveis = sorted(set(p['cidade'] for p in pontos))
-            cidade_filtro = st.multiselect(
-                "Selecione as cidades:",
-                options=cidades_disponiveis,
-                default=cidades_disponiveis
-            )
-        
-        with col_filter2:
-            busca_nome = st.text_input("🔎 Buscar por nome:", "")
-        
-        # Filtrar pontos
-        pontos_filtrados = [
-            p for p in pontos 
-            if p['cidade'] in cidade_filtro and 
-            (busca_nome.lower() in p['nome'].lower() if busca_nome else True)
-        ]
-        
-        # Agrupar por cidade
-        pontos_por_cidade = {}
-        for ponto in pontos_filtrados:
-            cidade = ponto['cidade']
-            if cidade not in pontos_por_cidade:
-                pontos_por_cidade[cidade] = []
-            pontos_por_cidade[cidade].append(ponto)
-        
-        # Mostrar pontos agrupados
-        st.markdown(f"#### 📍 {len(pontos_filtrados)} Pontos Encontrados")
-        
-        for cidade, pontos_cidade in sorted(pontos_por_cidade.items()):
-            with st.expander(f"🏙️ **{cidade}** ({len(pontos_cidade)} pontos)", expanded=True):
-                for i, ponto in enumerate(pontos_cidade):
-                    # Card para cada ponto
-                    st.markdown(f"""
-                    <div style="background: linear-gradient(135deg, #ffffff, #f8fff8); 
-                                padding: 1.5rem; margin: 1rem 0; border-radius: 15px; 
-                                border-left: 5px solid {material_info.get('color', '#3e8e41')}; 
-                                box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                        <div style="display: flex; justify-content: space-between; align-items: start;">
-                            <div style="flex: 1;">
-                                <h4 style="margin: 0 0 0.5rem 0; color: #2d5a2d;">
-                                    {material_emoji} {ponto['nome']}
-                                </h4>
-                                <p style="margin: 0.3rem 0; color: #555;">
-                                    <strong>📍 Endereço:</strong> {ponto['endereco']}
-                                </p>
-                                <p style="margin: 0.3rem 0; color: #555;">
-                                    <strong>🕐 Horário:</strong> {ponto['horario']}
-                                </p>
-                                <p style="margin: 0.3rem 0; color: #555;">
-                                    <strong>📞 Telefone:</strong> {ponto.get('telefone', 'Não disponível')}
-                                </p>
-                            </div>
-                            <div style="text-align: center; padding: 0.5rem;">
-                                <a href="https://www.google.com/maps/search/?api=1&query={ponto['lat']},{ponto['lon']}" 
-                                   target="_blank" 
-                                   style="background: linear-gradient(45deg, #3e8e41, #28a745); 
-                                          color: white; padding: 0.5rem 1rem; border-radius: 8px; 
-                                          text-decoration: none; display: inline-block; 
-                                          transition: all 0.3s ease;">
-                                    🗺️ Ver no Maps
-                                </a>
-                            </div>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+        mostrar_lista_pontos(material)
     
     # Dicas e informações importantes
     st.markdown("---")
@@ -1389,6 +1528,160 @@ def mostrar_alertas_medalhas(novas_medalhas):
             medalha = MEDALHAS[medalha_id]
             st.success(f"🏆 **Nova Medalha!** {medalha['emoji']} {medalha['nome']}")
 
+def mostrar_resultados_lote(nomes, resultados):
+    """Mostra o resultado da análise de várias imagens"""
+    linhas = []
+    validas = []
+    
+    for nome, (classe, confianca, _, is_outlier) in zip(nomes, resultados):
+        if classe is None or is_outlier:
+            linhas.append({
+                'Arquivo': nome,
+                'Material': '🚫 Não reconhecido',
+                'Confiança': '-',
+                'EcoMoedas': 0
+            })
+            continue
+        
+        metadata = CLASS_METADATA[classe]
+        ecomoedas = calcular_ecomoedas(classe, confianca)[0] if metadata['recyclable'] else 0
+        linhas.append({
+            'Arquivo': nome,
+            'Material': f"{metadata['emoji']} {metadata['name']}",
+            'Confiança': f"{confianca*100:.1f}%",
+            'EcoMoedas': ecomoedas
+        })
+        if metadata['recyclable']:
+            validas.append((classe, confianca, ecomoedas))
+    
+    st.dataframe(pd.DataFrame(linhas), use_container_width=True, hide_index=True)
+    
+    total_ecomoedas = sum(ecomoedas for _, _, ecomoedas in validas)
+    st.markdown(f"""
+    <div class="ecomoeda-card">
+        <h2>🪙 +{total_ecomoedas} EcoMoedas!</h2>
+        <p>{len(validas)} de {len(resultados)} itens recicláveis reconhecidos</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if validas:
+        st.button("✅ Confirmar Todas e Ganhar Recompensas", key="confirmar_lote", use_container_width=True,
+                  on_click=confirmar_deteccoes, args=(validas,))
+
+def confirmar_deteccoes(deteccoes):
+    """
+    Callback dos botões de confirmação: salva as detecções e reruna só os
+    fragmentos de métricas (detector e perfil na sidebar)
+    """
+    subiu_nivel = False
+    novas_medalhas = []
+    for classe, confianca, ecomoedas in deteccoes:
+        nivel_up, medalhas = salvar_deteccao(classe, confianca, ecomoedas)
+        subiu_nivel = subiu_nivel or nivel_up
+        novas_medalhas.extend(medalhas)
+    
+    st.session_state.confirmacao = {'nivel_up': subiu_nivel, 'medalhas': novas_medalhas}
+    st.rerun(scope=['metricas_detector', 'perfil_usuario'])
+
+@fragmento('metricas_detector', key='metricas_detector')
+def mostrar_metricas_detector():
+    """Métricas do usuário no detector, com os alertas da última confirmação"""
+    confirmacao = st.session_state.pop('confirmacao', None)
+    if confirmacao:
+        if confirmacao['nivel_up']:
+            st.success(f"🎉 Parabéns! Você subiu para o nível {st.session_state.user_data['nivel_usuario']}!")
+        mostrar_alertas_medalhas(confirmacao['medalhas'])
+    
+    mostrar_metricas_usuario()
+
+@fragmento('modo_continuo')
+def mostrar_modo_continuo(modelo):
+    """Classificação contínua dos quadros de um vídeo"""
+    with st.expander("📹 Modo Contínuo (vídeo da linha de triagem)"):
+        if isinstance(modelo, ClienteServico):
+            st.info("O modo contínuo usa o modelo local; desative ECOIA_SERVICO_URL para usá-lo.")
+            return
+        
+        video = st.file_uploader(
+            "Escolha um vídeo",
+            type=['mp4', 'avi', 'mov', 'mkv', 'gif'],
+            key="video_continuo"
+        )
+        if video is None or not st.button("▶️ Iniciar análise", key="iniciar_continuo"):
+            return
+        
+        # OpenCV lê a partir de um caminho, então o vídeo vai para um arquivo temporário
+        extensao = os.path.splitext(video.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=extensao, delete=False) as arquivo:
+            arquivo.write(video.getvalue())
+        
+        quadro_atual = st.empty()
+        estatisticas = {}
+        contagem = {}
+        try:
+            for r in streaming.classificar_stream(arquivo.name, modelo, estatisticas=estatisticas):
+                classe, confianca, _, is_outlier = r.resultado
+                if is_outlier:
+                    rotulo = "🚫 Não reconhecido"
+                else:
+                    metadata = CLASS_METADATA[classe]
+                    rotulo = f"{metadata['emoji']} {metadata['name']}"
+                    contagem[rotulo] = contagem.get(rotulo, 0) + 1
+                quadro_atual.markdown(f"**{r.tempo:.1f}s** — {rotulo} ({confianca*100:.1f}%)")
+        except Exception as e:
+            st.error(f"❌ Erro ao processar o vídeo: {str(e)}")
+            return
+        finally:
+            os.remove(arquivo.name)
+        
+        st.success(
+            f"✅ {estatisticas.get('classificados', 0)} quadros classificados "
+            f"({estatisticas.get('duplicados', 0)} repetidos ignorados, "
+            f"{estatisticas.get('descartados', 0)} descartados)"
+        )
+        if contagem:
+            st.dataframe(
+                pd.DataFrame({'Material': list(contagem), 'Quadros': list(contagem.values())}),
+                use_container_width=True, hide_index=True
+            )
+
+@fragmento('perfil_usuario', key='perfil_usuario')
+def mostrar_perfil_usuario():
+    """Perfil na sidebar; reruna sozinho quando uma detecção é confirmada"""
+    st.markdown("### 👤 Seu Perfil")
+    user_data = st.session_state.user_data
+    
+    # Barra de progresso para próximo nível
+    xp_atual = user_data['xp_total']
+    xp_proximo_nivel = user_data['nivel_usuario'] * 100
+    progresso = min(1.0, (xp_atual % 100) / 100)
+    
+    st.progress(progresso)
+    st.markdown(f"**Nível {user_data['nivel_usuario']}** | XP: {xp_atual % 100}/100")
+    
+    # Estatísticas rápidas
+    st.markdown(f"""
+    **📊 Estatísticas:**
+    - 🪙 EcoMoedas: {user_data['ecomoedas_total']}
+    - 🎯 Detecções: {user_data['deteccoes_realizadas']}
+    - 🏆 Medalhas: {len(user_data['medalhas_conquistadas'])}
+    - 🌍 CO₂ Evitado: {user_data['impacto_total']['co2']:.1f}kg
+    - 🎁 Recompensas: {len(user_data['recompensas_resgatadas'])} 
+    """)
+    
+    st.markdown("---")
+    
+    # Medalhas recentes
+    st.markdown("### 🏅 Medalhas Recentes")
+    medalhas_usuario = user_data['medalhas_conquistadas']
+    
+    if medalhas_usuario:
+        for medalha_id in medalhas_usuario[-3:]:  # Últimas 3
+            medalha = MEDALHAS[medalha_id]
+            st.markdown(f"{medalha['emoji']} **{medalha['nome']}**")
+    else:
+        st.info("Nenhuma medalha ainda. Faça sua primeira detecção!")
+
 def mostrar_sidebar():
     """Sidebar com navegação e info do usuário"""
     with st.sidebar:
@@ -1411,59 +1704,15 @@ def mostrar_sidebar():
         
         st.markdown("---")
         
-        # Info do usuário
-        st.markdown("### 👤 Seu Perfil")
-        user_data = st.session_state.user_data
-        
-        # Barra de progresso para próximo nível
-        xp_atual = user_data['xp_total']
-        xp_proximo_nivel = user_data['nivel_usuario'] * 100
-        progresso = min(1.0, (xp_atual % 100) / 100)
-        
-        st.progress(progresso)
-        st.markdown(f"**Nível {user_data['nivel_usuario']}** | XP: {xp_atual % 100}/100")
-        
-        # Estatísticas rápidas
-        st.markdown(f"""
-        **📊 Estatísticas:**
-        - 🪙 EcoMoedas: {user_data['ecomoedas_total']}
-        - 🎯 Detecções: {user_data['deteccoes_realizadas']}
-        - 🏆 Medalhas: {len(user_data['medalhas_conquistadas'])}
-        - 🌍 CO₂ Evitado: {user_data['impacto_total']['co2']:.1f}kg
-        - 🎁 Recompensas: {len(user_data['recompensas_resgatadas'])} 
-        """)
-        
-        st.markdown("---")
-        
-        # Medalhas recentes
-        st.markdown("### 🏅 Medalhas Recentes")
-        medalhas_usuario = user_data['medalhas_conquistadas']
-        
-        if medalhas_usuario:
-            for medalha_id in medalhas_usuario[-3:]:  # Últimas 3
-                medalha = MEDALHAS[medalha_id]
-                st.markdown(f"{medalha['emoji']} **{medalha['nome']}**")
-        else:
-            st.info("Nenhuma medalha ainda. Faça sua primeira detecção!")
+        mostrar_perfil_usuario()
         
         st.markdown("---")
         
         # Configurações
         st.markdown("### ⚙️ Configurações")
         if st.button("🔄 Resetar Dados", help="Limpa todo o progresso"):
-            st.session_state.user_data = {
-                'ecomoedas_total': 0,
-                'deteccoes_realizadas': 0,
-                'historico_deteccoes': [],
-                'medalhas_conquistadas': [],
-                'impacto_total': {'co2': 0.0, 'energia': 0.0, 'agua': 0.0},
-                'contadores_classe': {classe: 0 for classe in CLASSES},
-                'streak_atual': 0,
-                'nivel_usuario': 1,
-                'xp_total': 0,
-                'data_ultimo_acesso': datetime.now().isoformat(),
-                'recompensas_resgatadas': []
-            }
+            st.session_state.user_data = obter_repositorio().resetar(obter_usuario_id())
+            obter_registro().remover_usuario(obter_usuario_id())
             st.success("✅ Dados resetados!")
             st.rerun()
 
@@ -1476,12 +1725,22 @@ def pagina_detector():
     st.markdown("## 🔍 Detector de Materiais")
     
     # Carregar modelo
-    modelo = carregar_modelo()
+    modelo = carregar_modelo(inferencia.versao_modelo())
     
     if modelo is None:
-        st.error("❌ Não foi possível carregar o modelo. Verifique se o arquivo 'modelo_oikos.pt' está presente.")
+        st.error(f"❌ Não foi possível carregar o modelo. Verifique se o arquivo "
+                 f"'{os.path.basename(MODEL_CONFIG['model_path'])}' está presente.")
         return
     
+    if not isinstance(modelo, ClienteServico):
+        congelar_objetos_carregados(modelo)
+    mostrar_metricas_detector()
+    mostrar_analise(modelo)
+    mostrar_modo_continuo(modelo)
+
+@fragmento('analise_detector')
+def mostrar_analise(modelo):
+    """Upload, exemplos e resultado; widgets daqui rerunam só este fragmento"""
     # Layout em colunas
     col1, col2 = st.columns([1, 1])
     
@@ -1490,21 +1749,33 @@ def pagina_detector():
         
         # Área de upload
         st.markdown('<div class="upload-section">', unsafe_allow_html=True)
-        uploaded_file = st.file_uploader(
-            "Escolha uma imagem",
+        uploaded_files = st.file_uploader(
+            "Escolha uma ou mais imagens",
             type=['jpg', 'jpeg', 'png', 'webp'],
-            help="Arraste uma imagem aqui ou clique para selecionar"
+            accept_multiple_files=True,
+            help="Arraste imagens aqui ou clique para selecionar"
         )
         st.markdown('</div>', unsafe_allow_html=True)
         
-        # Mostrar imagem se carregada
-        if uploaded_file is not None:
+        # Mostrar imagens se carregadas
+        imagens = []
+        resultados = []
+        if uploaded_files:
             try:
-                imagem = Image.open(uploaded_file).convert("RGB")
-                st.image(imagem, caption="Imagem carregada", use_container_width=True)
+                analises = analisar_uploads(modelo, uploaded_files)
             except Exception as e:
                 st.error(f"❌ Erro ao carregar imagem: {str(e)}")
                 return
+            imagens = [imagem for imagem, _ in analises]
+            resultados = [resultado for _, resultado in analises]
+            
+            if len(imagens) == 1:
+                st.image(imagens[0], caption="Imagem carregada", use_container_width=True)
+            else:
+                st.image(imagens, caption=[arquivo.name for arquivo in uploaded_files], width=140)
+        
+        uploaded_file = uploaded_files[0] if len(imagens) == 1 else None
+        imagem = imagens[0] if uploaded_file is not None else None
         
         # Exemplos rápidos
         st.markdown("### 🖼️ Exemplos Rápidos")
@@ -1522,7 +1793,7 @@ def pagina_detector():
                 st.session_state.imagem_exemplo = "exemplos/metal.png"
         if st.session_state.imagem_exemplo:
             try:
-                imagem = Image.open(st.session_state.imagem_exemplo).convert("RGB")
+                imagem = abrir_exemplo(st.session_state.imagem_exemplo)
                 st.image(imagem, caption="🖼️ Exemplo carregado automaticamente", use_container_width=True)
             except Exception as e:
                 st.error(f"Erro ao carregar imagem de exemplo: {e}")
@@ -1530,11 +1801,10 @@ def pagina_detector():
     with col2:
         st.markdown("### 🎯 Resultado da Análise")
         
-        if uploaded_file is not None:
-            # Fazer predição
-            with st.spinner("🤖 Analisando com IA..."):
-                resultado = fazer_predicao(modelo, imagem)
-                
+        if len(imagens) > 1:
+            mostrar_resultados_lote([arquivo.name for arquivo in uploaded_files], resultados)
+        elif uploaded_file is not None:
+            resultado = resultados[0]
             if resultado[0] is not None:
                 classe_predita, confianca, probabilidades, is_outlier = resultado
                 
@@ -1554,11 +1824,9 @@ def pagina_detector():
                 else:
                     # Resultado válido
                     metadata = CLASS_METADATA[classe_predita]
-                    ecomoeda_info = ECOMOEDA_SISTEMA[classe_predita]
                     
                     # Calcular EcoMoedas
-                    multiplicador = 1.2 if confianca >= 0.9 else 0.8 if confianca < 0.7 else 1.0
-                    ecomoedas_ganhas = int(ecomoeda_info['valor'] * multiplicador)
+                    ecomoedas_ganhas, multiplicador = calcular_ecomoedas(classe_predita, confianca)
                     
                     # Nível de confiança
                     if confianca >= 0.8:
@@ -1605,15 +1873,10 @@ def pagina_detector():
                         </div>
                         """, unsafe_allow_html=True)
                         
-                        # Botão de confirmação
-                        if st.button("✅ Confirmar e Ganhar Recompensas", key="confirmar", use_container_width=True):
-                            nivel_up, novas_medalhas = salvar_deteccao(classe_predita, confianca, ecomoedas_ganhas)
-                            
-                            if nivel_up:
-                                st.success(f"🎉 Parabéns! Você subiu para o nível {st.session_state.user_data['nivel_usuario']}!")
-                            
-                            mostrar_alertas_medalhas(novas_medalhas)
-                            st.rerun()
+                        # Botão de confirmação (reruna só as métricas)
+                        st.button("✅ Confirmar e Ganhar Recompensas", key="confirmar", use_container_width=True,
+                                  on_click=confirmar_deteccoes,
+                                  args=([(classe_predita, confianca, ecomoedas_ganhas)],))
                     else:
                         st.markdown("""
                         <div class="custom-alert alert-warning">
@@ -1716,27 +1979,45 @@ def pagina_dashboard():
         </div>
         """, unsafe_allow_html=True)
     
+    registro = obter_registro()
+    
+    # Série diária (agregados do registro: custo fixo, qualquer que seja o histórico)
+    st.markdown("### 📅 Últimos 30 Dias")
+    
+    serie = registro.serie_diaria(obter_usuario_id(), dias=30)
+    if serie.values.any():
+        serie = serie.rename(columns={classe: CLASS_METADATA[classe]['name'] for classe in CLASSES})
+        fig = px.bar(serie, labels={'dia': 'Dia', 'value': 'Detecções', 'variable': 'Material'})
+        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("Nenhuma detecção nos últimos 30 dias.")
+    
     # Histórico recente
     st.markdown("### 📈 Histórico Recente")
     
-    if user_data['historico_deteccoes']:
-        historico_recente = user_data['historico_deteccoes'][-10:]  # Últimos 10
-        
-        # Criar DataFrame
-        df_historico = []
-        for deteccao in historico_recente:
-            df_historico.append({
-                'Data': datetime.fromisoformat(deteccao['timestamp']).strftime('%d/%m %H:%M'),
-                'Material': CLASS_METADATA[deteccao['classe']]['name'],
-                'Emoji': CLASS_METADATA[deteccao['classe']]['emoji'],
-                'Confiança': f"{deteccao['confianca']*100:.1f}%",
-                'EcoMoedas': deteccao['ecomoedas']
-            })
-        
-        df_historico = pd.DataFrame(df_historico)
+    recentes = registro.recentes_usuario(obter_usuario_id())
+    if not recentes.empty:
+        # Montado coluna a coluna a partir das colunas do registro
+        df_historico = pd.DataFrame({
+            'Data': recentes['timestamp'].dt.strftime('%d/%m %H:%M'),
+            'Material': recentes['classe'].map({c: m['name'] for c, m in CLASS_METADATA.items()}),
+            'Emoji': recentes['classe'].map({c: m['emoji'] for c, m in CLASS_METADATA.items()}),
+            'Confiança': (recentes['confianca'] * 100).map('{:.1f}%'.format),
+            'EcoMoedas': recentes['ecomoedas']
+        })
         st.dataframe(df_historico, use_container_width=True, hide_index=True)
     else:
         st.info("Nenhum histórico disponível ainda.")
+    
+    # Comunidade
+    st.markdown("### 🌎 Comunidade EcoDetector")
+    
+    comunidade = registro.totais()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Detecções", f"{comunidade['deteccoes']:,}".replace(',', '.'))
+    col2.metric("Participantes", comunidade['usuarios'])
+    col3.metric("EcoMoedas Distribuídas", f"{comunidade['ecomoedas']:,}".replace(',', '.'))
 
 def pagina_ranking():
     """Página de ranking e medalhas"""
@@ -2048,6 +2329,16 @@ def pagina_sobre():
         </div>
         """, unsafe_allow_html=True)
     
+    # Cache de predições (compartilhado entre sessões)
+    cache = obter_cache_predicoes().estatisticas()
+    st.caption(
+        f"🗃️ Cache de predições: {cache['entradas']} imagens, "
+        f"{cache['acertos']} acertos / {cache['falhas']} falhas "
+        f"({cache['taxa_acerto']:.0%}), versão do modelo {cache['versao'] or '-'}"
+    )
+    st.caption(f"🧠 Arquitetura em uso: {MODEL_CONFIG['arquitetura']} "
+               f"(ECOIA_ARQUITETURA=mobilenet_v3_small para o modelo leve)")
+    
     # Créditos
     st.markdown("""
     <div class="glass-card">
@@ -2061,45 +2352,111 @@ def pagina_sobre():
 # ================================================
 # 🚀 APLICAÇÃO PRINCIPAL
 # ================================================
+def pagina_admin():
+    """Página oculta (?admin=<token>, ECOIA_ADMIN_TOKEN): custo dos reruns por página e fase"""
+    instrumentacao = obter_instrumentacao()
+    st.markdown("## 🛠️ Admin — Custo dos Reruns")
+    
+    resumo = instrumentacao.resumo()
+    if not resumo:
+        st.info("Nenhum rerun medido ainda.")
+    else:
+        df = pd.DataFrame(resumo)
+        totais = df[df['fase'] == 'total'].sort_values('p95_ms', ascending=False)
+        st.markdown("### 📄 Por página")
+        st.dataframe(totais.drop(columns=['fase']).round(1), use_container_width=True, hide_index=True)
+        
+        st.markdown("### 🧩 Por fase")
+        fases = df[df['fase'] != 'total'].drop(columns=['bytes_p50', 'bytes_p95'], errors='ignore')
+        st.dataframe(fases.sort_values('p95_ms', ascending=False).round(2), use_container_width=True, hide_index=True)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("📥 Métricas (Prometheus)", instrumentacao.prometheus(),
+                           file_name=os.path.basename(INSTRUMENTACAO_CONFIG['arquivo_prometheus']),
+                           mime="text/plain", use_container_width=True)
+    with col2:
+        if st.button("💾 Gravar arquivo .prom", use_container_width=True):
+            st.success(f"✅ Gravado em '{instrumentacao.exportar()}'")
+    with col3:
+        if st.button("🧹 Zerar métricas", use_container_width=True):
+            instrumentacao.limpar()
+            st.rerun()
+    
+    st.markdown("### 🔬 Perfis")
+    quantidade = st.number_input("Reruns desta sessão a perfilar", min_value=1, max_value=50, value=5)
+    if st.button("▶️ Perfilar próximos reruns"):
+        st.session_state.perfilar_reruns = int(quantidade)
+    st.caption(
+        f"{st.session_state.get('perfilar_reruns', 0)} rerun(s) pendentes; "
+        f"{instrumentacao.reruns_perfilados} perfil(is) gravados em "
+        f"'{INSTRUMENTACAO_CONFIG['pasta_perfis']}/' (.prof: snakeviz; .folded: speedscope/flamegraph)"
+    )
+
+# Função de cada página (nome usado nas métricas de rerun)
+FUNCOES_PAGINAS = {
+    'Detector': 'pagina_detector',
+    'Dashboard': 'pagina_dashboard',
+    'Ranking': 'pagina_ranking',
+    'Loja': 'pagina_recompensas',
+    'Mapa': 'mostrar_secao_mapa_melhorada',
+    'Sobre': 'pagina_sobre'
+}
+
 def main():
     """Função principal da aplicação"""
-    # Carregar CSS
-    load_css()
-    
-    # Inicializar sessão
-    inicializar_sessao()
-    
-    # Mostrar sidebar
-    mostrar_sidebar()
-    
-    # Header principal
-    criar_header()
-    
-    # Roteamento de páginas
-    pagina_atual = st.session_state.current_page
-    
-    if pagina_atual == 'Detector':
-        pagina_detector()
-    elif pagina_atual == 'Dashboard':
-        pagina_dashboard()
-    elif pagina_atual == 'Ranking':
-        pagina_ranking()
-    elif pagina_atual == 'Loja': 
-        pagina_recompensas() 
-    elif pagina_atual == 'Mapa':
-        material = st.selectbox("Selecione o material:", list(CLASS_METADATA.keys()))
-        mostrar_secao_mapa_melhorada(material)
-    elif pagina_atual == 'Sobre':
-        pagina_sobre()
-  
-    # Footer
-    st.markdown("---")
-    st.markdown("""
-    <div style="text-align: center; padding: 2rem; color: #666;">
-        <p>🌱 EcoDetector v2.0 - Sistema Inteligente de Reciclagem</p>
-        <p><small>Transformando o mundo, uma detecção por vez! 🌍</small></p>
-    </div>
-    """, unsafe_allow_html=True)
+    perfilar = st.session_state.get('perfilar_reruns', 0) > 0
+    if perfilar:
+        st.session_state.perfilar_reruns -= 1
+    
+    with obter_instrumentacao().medir_rerun(perfilar) as rerun:
+        # Carregar CSS
+        with rerun.fase('load_css'):
+            load_css()
+        
+        # Inicializar sessão
+        with rerun.fase('inicializar_sessao'):
+            inicializar_sessao()
+        
+        pagina_atual = st.session_state.current_page
+        admin = admin_autorizado(st.query_params.get('admin'))
+        rerun.pagina = 'pagina_admin' if admin else FUNCOES_PAGINAS.get(pagina_atual, pagina_atual)
+        
+        # Mostrar sidebar
+        with rerun.fase('mostrar_sidebar'):
+            mostrar_sidebar()
+        
+        # Header principal
+        with rerun.fase('criar_header'):
+            criar_header()
+        
+        # Roteamento de páginas
+        with rerun.fase(rerun.pagina):
+            if admin:
+                pagina_admin()
+            elif pagina_atual == 'Detector':
+                pagina_detector()
+            elif pagina_atual == 'Dashboard':
+                pagina_dashboard()
+            elif pagina_atual == 'Ranking':
+                pagina_ranking()
+            elif pagina_atual == 'Loja': 
+                pagina_recompensas() 
+            elif pagina_atual == 'Mapa':
+                material = st.selectbox("Selecione o material:", list(CLASS_METADATA.keys()))
+                mostrar_secao_mapa_melhorada(material)
+            elif pagina_atual == 'Sobre':
+                pagina_sobre()
+      
+        # Footer
+        with rerun.fase('rodape'):
+            st.markdown("---")
+            st.markdown("""
+            <div style="text-align: center; padding: 2rem; color: #666;">
+                <p>🌱 EcoDetector v2.0 - Sistema Inteligente de Reciclagem</p>
+                <p><small>Transformando o mundo, uma detecção por vez! 🌍</small></p>
+            </div>
+            """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
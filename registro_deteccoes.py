@@ -0,0 +1,454 @@
+import atexit
+import collections
+import json
+import os
+import re
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from inferencia import CLASSES
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# ================================================
+# 🧾 REGISTRO COLUNAR DAS DETECÇÕES
+# ================================================
+# Log só de acréscimos e fonte única das detecções (o SQLite de
+# armazenamento.py guarda só perfis e resgates).
+# - Cada detecção vira uma linha de tamanho fixo (timestamp, usuário
+#   codificado em dicionário, classe, confiança, EcoMoedas) anexada ao
+#   segmento ativo (ativo_<início>.bin).
+# - Com `tamanho_segmento` linhas o ativo é selado em colunas numpy
+#   comprimidas (segmento_<início>.npz); segmentos pequenos são depois
+#   compactados em segmentos maiores por uma thread.
+# - Agregados por classe, por dia e por usuário são atualizados a cada
+#   linha, então as consultas do dashboard não dependem do tamanho do
+#   histórico. Uma cópia deles (agregados.json) é gravada a cada selo;
+#   ao abrir, só as linhas do ativo são reaplicadas.
+# Um único processo escreve em cada pasta: a pasta fica travada (.lock,
+# flock/msvcrt) enquanto o registro está aberto, e abrir_registro devolve
+# a instância já aberta no processo. Réplicas usam pastas próprias.
+
+REGISTRO_CONFIG = {
+    'pasta': os.environ.get('ECOIA_REGISTRO', 'registro_deteccoes'),
+    'tamanho_segmento': 4096,                # Linhas do ativo antes de selar
+    'tamanho_compactado': 262144,            # Segmentos menores que isso são juntados
+    'segmentos_para_compactar': 8,
+    'janela_dias': 90,                       # Dias mantidos nos agregados por usuário
+    'recentes_por_usuario': 10               # Últimas detecções do usuário (histórico do dashboard)
+}
+
+LINHA = np.dtype([
+    ('timestamp', '<i8'),
+    ('usuario', '<i4'),
+    ('classe', 'u1'),
+    ('confianca', '<f4'),
+    ('ecomoedas', '<i2'),
+])
+
+# Linha especial que zera os agregados de um usuário ("Resetar Dados")
+CLASSE_RESET = 255
+
+class AgregadoUsuario:
+    """Contadores de um usuário: total por classe, por dia (janela recente) e últimas detecções"""
+
+    def __init__(self, recentes: int):
+        self.classes = np.zeros(len(CLASSES), dtype=np.int64)
+        self.ecomoedas = 0
+        self.dias: Dict[int, np.ndarray] = {}
+        self.recentes = collections.deque(maxlen=recentes)   # (timestamp, classe, confiança, EcoMoedas)
+
+    def como_dict(self) -> Dict:
+        return {
+            'classes': self.classes.tolist(),
+            'ecomoedas': self.ecomoedas,
+            'dias': {str(dia): contagem.tolist() for dia, contagem in self.dias.items()},
+            'recentes': [list(linha) for linha in self.recentes]
+        }
+
+    @classmethod
+    def de_dict(cls, dados: Dict, recentes: int) -> 'AgregadoUsuario':
+        agregado = cls(recentes)
+        agregado.classes = np.asarray(dados['classes'], dtype=np.int64)
+        agregado.ecomoedas = dados['ecomoedas']
+        agregado.dias = {int(dia): np.asarray(c, dtype=np.int64) for dia, c in dados['dias'].items()}
+        agregado.recentes.extend(tuple(linha) for linha in dados.get('recentes', []))
+        return agregado
+
+class RegistroDeteccoes:
+    """
+    Log colunar de detecções com agregados incrementais.
+
+    `registrar` é O(1) (anexa uma linha e atualiza os contadores); as
+    consultas leem só os agregados. Seguro para uso entre threads/sessões.
+    """
+
+    def __init__(self, pasta: Optional[str] = None, tamanho_segmento: Optional[int] = None,
+                 janela_dias: Optional[int] = None):
+        self.pasta = pasta or REGISTRO_CONFIG['pasta']
+        self.tamanho_segmento = tamanho_segmento or REGISTRO_CONFIG['tamanho_segmento']
+        self.janela_dias = janela_dias or REGISTRO_CONFIG['janela_dias']
+        self.recentes = REGISTRO_CONFIG['recentes_por_usuario']
+        os.makedirs(self.pasta, exist_ok=True)
+        self._trava = travar_pasta(self.pasta)
+
+        self._lock = threading.RLock()
+        self._lock_segmentos = threading.RLock()
+        self._compactar = threading.Event()
+        self._encerrado = False
+        self._selados = 0               # Segmentos selados desde a última compactação
+
+        self._zerar_agregados()
+        self._codigos: Dict[str, int] = {}
+        self._usuarios: List[str] = []
+        self._carregar_usuarios()
+        self._abrir()
+
+        self._thread = threading.Thread(target=self._executar_compactacao, name="compactacao-registro", daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)
+
+    # ---------- arquivos ----------
+
+    def _caminho(self, nome: str) -> str:
+        return os.path.join(self.pasta, nome)
+
+    def _inicios(self, prefixo: str) -> List[int]:
+        padrao = re.compile(rf'{prefixo}_(\d+)\.(?:npz|bin)$')
+        return sorted(int(m.group(1)) for m in map(padrao.match, os.listdir(self.pasta)) if m)
+
+    def _carregar_usuarios(self):
+        caminho = self._caminho('usuarios.txt')
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                self._usuarios = arquivo.read().splitlines()
+        self._codigos = {usuario: codigo for codigo, usuario in enumerate(self._usuarios)}
+        self._arquivo_usuarios = open(caminho, 'a', encoding='utf-8')
+
+    def _codigo(self, usuario_id: str) -> int:
+        codigo = self._codigos.get(usuario_id)
+        if codigo is None:
+            codigo = len(self._usuarios)
+            self._usuarios.append(usuario_id)
+            self._codigos[usuario_id] = codigo
+            self._arquivo_usuarios.write(usuario_id + '\n')
+            self._arquivo_usuarios.flush()
+        return codigo
+
+    def _abrir(self):
+        """Carrega a cópia dos agregados e reaplica as linhas gravadas depois dela"""
+        caminho = self._caminho('agregados.json')
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                self._restaurar_agregados(json.load(arquivo))
+
+        # Segmento selado sem a cópia dos agregados (processo morto no selo)
+        selados = self.segmentos()
+        for inicio, tamanho in selados:
+            if inicio + tamanho > self.linhas:
+                self._reaplicar(inicio, carregar_segmento(self._caminho(f'segmento_{inicio:012d}.npz')))
+
+        self._inicio_ativo = self.linhas
+        iniciados = {inicio for inicio, _ in selados}
+        for inicio in self._inicios('ativo'):
+            caminho = self._caminho(f'ativo_{inicio:012d}.bin')
+            if inicio in iniciados or inicio < self._inicio_ativo:
+                os.remove(caminho)
+                continue
+            # Linha cortada no fim (escrita interrompida) é descartada
+            completas = os.path.getsize(caminho) // LINHA.itemsize
+            os.truncate(caminho, completas * LINHA.itemsize)
+            self._reaplicar(inicio, np.fromfile(caminho, dtype=LINHA, count=completas))
+            self._inicio_ativo = inicio
+        self._ativo = open(self._caminho(f'ativo_{self._inicio_ativo:012d}.bin'), 'ab')
+        self._linhas_ativo = self.linhas - self._inicio_ativo
+
+    def _reaplicar(self, inicio: int, linhas: np.ndarray):
+        for indice, linha in enumerate(linhas, start=inicio):
+            if indice >= self.linhas:
+                self._aplicar(linha)
+
+    def _selar(self):
+        """Grava o ativo como segmento colunar e começa um ativo novo"""
+        self._ativo.close()
+        caminho_ativo = self._caminho(f'ativo_{self._inicio_ativo:012d}.bin')
+        linhas = np.fromfile(caminho_ativo, dtype=LINHA, count=self._linhas_ativo)
+        salvar_segmento(self._caminho(f'segmento_{self._inicio_ativo:012d}.npz'), linhas)
+        self._salvar_agregados()
+
+        self._inicio_ativo = self.linhas
+        self._linhas_ativo = 0
+        self._ativo = open(self._caminho(f'ativo_{self._inicio_ativo:012d}.bin'), 'ab')
+        os.remove(caminho_ativo)
+
+        self._selados += 1
+        if self._selados >= REGISTRO_CONFIG['segmentos_para_compactar']:
+            self._selados = 0
+            self._compactar.set()
+
+    # ---------- agregados ----------
+
+    def _zerar_agregados(self):
+        self.linhas = 0
+        self.total_classes = np.zeros(len(CLASSES), dtype=np.int64)
+        self.total_ecomoedas = 0
+        self.dias: Dict[int, np.ndarray] = {}
+        self.por_usuario: Dict[int, AgregadoUsuario] = {}
+
+    def _aplicar(self, linha):
+        """Atualiza os agregados com uma linha (O(1) amortizado)"""
+        self.linhas += 1
+        codigo = int(linha['usuario'])
+        classe = int(linha['classe'])
+        if classe == CLASSE_RESET:
+            self.por_usuario.pop(codigo, None)
+            return
+
+        timestamp = int(linha['timestamp'])
+        ecomoedas = int(linha['ecomoedas'])
+        dia = date.fromtimestamp(timestamp).toordinal()
+        self.total_classes[classe] += 1
+        self.total_ecomoedas += ecomoedas
+        self.dias.setdefault(dia, np.zeros(len(CLASSES), dtype=np.int64))[classe] += 1
+
+        usuario = self.por_usuario.get(codigo)
+        if usuario is None:
+            usuario = self.por_usuario[codigo] = AgregadoUsuario(self.recentes)
+        usuario.classes[classe] += 1
+        usuario.ecomoedas += ecomoedas
+        contagem = usuario.dias.get(dia)
+        if contagem is None:
+            contagem = usuario.dias[dia] = np.zeros(len(CLASSES), dtype=np.int64)
+            # Janela deslizante: o dia mais antigo sai quando um novo entra
+            for antigo in [d for d in usuario.dias if d <= dia - self.janela_dias]:
+                del usuario.dias[antigo]
+        contagem[classe] += 1
+        usuario.recentes.append((timestamp, classe, float(linha['confianca']), ecomoedas))
+
+    def _salvar_agregados(self):
+        dados = {
+            'linhas': self.linhas,
+            'total_classes': self.total_classes.tolist(),
+            'total_ecomoedas': self.total_ecomoedas,
+            'dias': {str(dia): contagem.tolist() for dia, contagem in self.dias.items()},
+            'por_usuario': {str(codigo): agregado.como_dict() for codigo, agregado in self.por_usuario.items()}
+        }
+        caminho = self._caminho('agregados.json')
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+        os.replace(caminho + '.tmp', caminho)
+
+    def _restaurar_agregados(self, dados: Dict):
+        self.linhas = dados['linhas']
+        self.total_classes = np.asarray(dados['total_classes'], dtype=np.int64)
+        self.total_ecomoedas = dados['total_ecomoedas']
+        self.dias = {int(dia): np.asarray(c, dtype=np.int64) for dia, c in dados['dias'].items()}
+        self.por_usuario = {int(codigo): AgregadoUsuario.de_dict(agregado, self.recentes)
+                            for codigo, agregado in dados['por_usuario'].items()}
+
+    # ---------- escrita ----------
+
+    def _anexar(self, usuario_id: str, timestamp: int, classe: int, confianca: float, ecomoedas: int):
+        with self._lock:
+            linha = np.array([(timestamp, self._codigo(usuario_id), classe, confianca, ecomoedas)], dtype=LINHA)
+            self._ativo.write(linha.tobytes())
+            self._ativo.flush()
+            self._linhas_ativo += 1
+            self._aplicar(linha[0])
+            if self._linhas_ativo >= self.tamanho_segmento:
+                self._selar()
+
+    def registrar(self, usuario_id: str, deteccao: Dict):
+        """Anexa uma detecção (dict de salvar_deteccao) ao log"""
+        timestamp = int(datetime.fromisoformat(deteccao['timestamp']).timestamp())
+        self._anexar(usuario_id, timestamp, CLASSES.index(deteccao['classe']),
+                     deteccao['confianca'], deteccao['ecomoedas'])
+
+    def remover_usuario(self, usuario_id: str):
+        """Zera os agregados do usuário; as linhas antigas seguem no log do site"""
+        self._anexar(usuario_id, int(datetime.now().timestamp()), CLASSE_RESET, 0.0, 0)
+
+    # ---------- consultas (só agregados) ----------
+
+    def _agregado(self, usuario_id: str) -> Optional[AgregadoUsuario]:
+        codigo = self._codigos.get(usuario_id)
+        return self.por_usuario.get(codigo) if codigo is not None else None
+
+    def recentes_usuario(self, usuario_id: str) -> pd.DataFrame:
+        """Últimas detecções do usuário (da mais antiga para a mais nova), coluna a coluna"""
+        with self._lock:
+            agregado = self._agregado(usuario_id)
+            linhas = list(agregado.recentes) if agregado else []
+        timestamp, classe, confianca, ecomoedas = (list(coluna) for coluna in zip(*linhas)) if linhas \
+            else ([], [], [], [])
+        return pd.DataFrame({
+            'timestamp': pd.to_datetime(np.asarray(timestamp, dtype=np.int64), unit='s', utc=True)
+                           .tz_convert(datetime.now().astimezone().tzinfo),
+            'classe': np.asarray(CLASSES, dtype=object)[np.asarray(classe, dtype=np.int64)],
+            'confianca': np.asarray(confianca, dtype=np.float64),
+            'ecomoedas': np.asarray(ecomoedas, dtype=np.int64)
+        })
+
+    def serie_diaria(self, usuario_id: Optional[str] = None, dias: int = 30) -> pd.DataFrame:
+        """
+        Detecções por dia e classe nos últimos `dias` (do usuário ou do site),
+        com zeros nos dias sem detecção
+        """
+        hoje = date.today().toordinal()
+        ordinais = range(hoje - dias + 1, hoje + 1)
+        with self._lock:
+            if usuario_id is None:
+                fonte = self.dias
+            else:
+                agregado = self._agregado(usuario_id)
+                fonte = agregado.dias if agregado else {}
+            matriz = np.stack([fonte.get(dia, np.zeros(len(CLASSES), dtype=np.int64)) for dia in ordinais])
+        return pd.DataFrame(matriz, columns=CLASSES,
+                            index=pd.Index([date.fromordinal(dia) for dia in ordinais], name='dia'))
+
+    def totais(self, usuario_id: Optional[str] = None) -> Dict:
+        """Detecções por classe e EcoMoedas (do usuário ou do site)"""
+        with self._lock:
+            if usuario_id is None:
+                classes, ecomoedas = self.total_classes.copy(), self.total_ecomoedas
+                usuarios = len(self.por_usuario)
+            else:
+                agregado = self._agregado(usuario_id)
+                classes = agregado.classes.copy() if agregado else np.zeros(len(CLASSES), dtype=np.int64)
+                ecomoedas = agregado.ecomoedas if agregado else 0
+                usuarios = 1
+        return {'classes': dict(zip(CLASSES, classes.tolist())), 'deteccoes': int(classes.sum()),
+                'ecomoedas': ecomoedas, 'usuarios': usuarios}
+
+    # ---------- segmentos e compactação ----------
+
+    def segmentos(self) -> List[tuple]:
+        """(início, linhas) de cada segmento selado"""
+        resultado, fim = [], 0
+        with self._lock_segmentos:
+            for inicio in self._inicios('segmento'):
+                caminho = self._caminho(f'segmento_{inicio:012d}.npz')
+                if inicio < fim:
+                    # Sobra de uma compactação interrompida, já contida no anterior
+                    os.remove(caminho)
+                    continue
+                with np.load(caminho) as segmento:
+                    resultado.append((inicio, len(segmento['classe'])))
+                fim = inicio + resultado[-1][1]
+        return resultado
+
+    def ler_colunas(self) -> Dict[str, np.ndarray]:
+        """Todas as linhas (selados + ativo, com as de CLASSE_RESET), coluna a coluna"""
+        with self._lock_segmentos:
+            # Fotografa segmentos + ativo juntos; segmentos selados depois
+            # disso já estão na cópia do ativo
+            with self._lock:
+                inicios = self._inicios('segmento')
+                ativo = np.fromfile(self._caminho(f'ativo_{self._inicio_ativo:012d}.bin'),
+                                    dtype=LINHA, count=self._linhas_ativo)
+            partes = [carregar_segmento(self._caminho(f'segmento_{inicio:012d}.npz')) for inicio in inicios]
+        linhas = np.concatenate(partes + [ativo])
+        return {nome: linhas[nome] for nome in LINHA.names}
+
+    def compactar(self) -> int:
+        """
+        Junta segmentos pequenos consecutivos em um só (até tamanho_compactado
+        linhas); retorna quantos segmentos foram removidos
+        """
+        limite = REGISTRO_CONFIG['tamanho_compactado']
+        removidos = 0
+        with self._lock_segmentos:
+            grupo, linhas_grupo = [], 0
+            for inicio, tamanho in self.segmentos() + [(None, limite)]:
+                if inicio is not None and tamanho < limite and linhas_grupo + tamanho <= limite:
+                    grupo.append(inicio)
+                    linhas_grupo += tamanho
+                    continue
+                if len(grupo) > 1:
+                    caminhos = [self._caminho(f'segmento_{g:012d}.npz') for g in grupo]
+                    salvar_segmento(caminhos[0], np.concatenate([carregar_segmento(c) for c in caminhos]))
+                    for caminho in caminhos[1:]:
+                        os.remove(caminho)
+                    removidos += len(grupo) - 1
+                grupo, linhas_grupo = ([inicio], tamanho) if inicio is not None and tamanho < limite else ([], 0)
+        return removidos
+
+    def _executar_compactacao(self):
+        while not self._encerrado:
+            self._compactar.wait()
+            self._compactar.clear()
+            if self._encerrado:
+                break
+            try:
+                self.compactar()
+            except Exception as e:
+                print(f"⚠️ Falha ao compactar o registro de detecções: {e}")
+
+    def encerrar(self):
+        """Fecha o ativo e para a thread de compactação"""
+        if self._encerrado:
+            return
+        self._encerrado = True
+        self._compactar.set()
+        self._thread.join()
+        with self._lock:
+            self._ativo.close()
+            self._arquivo_usuarios.close()
+        with _LOCK_ABERTOS:
+            if _ABERTOS.get(os.path.abspath(self.pasta)) is self:
+                del _ABERTOS[os.path.abspath(self.pasta)]
+        self._trava.close()     # Fechar o arquivo solta a trava
+
+def salvar_segmento(caminho: str, linhas: np.ndarray):
+    """Grava as linhas como colunas comprimidas, de forma atômica"""
+    with open(caminho + '.tmp', 'wb') as arquivo:
+        np.savez_compressed(arquivo, **{nome: linhas[nome] for nome in LINHA.names})
+    os.replace(caminho + '.tmp', caminho)
+
+def carregar_segmento(caminho: str) -> np.ndarray:
+    with np.load(caminho) as segmento:
+        linhas = np.empty(len(segmento['classe']), dtype=LINHA)
+        for nome in LINHA.names:
+            linhas[nome] = segmento[nome]
+    return linhas
+
+def travar_pasta(pasta: str):
+    """
+    Trava exclusiva (não bloqueante) em <pasta>/.lock; um segundo escritor,
+    em outro processo ou no mesmo, falha em vez de intercalar linhas
+    """
+    arquivo = open(os.path.join(pasta, '.lock'), 'a+')
+    try:
+        if os.name == 'nt':
+            arquivo.seek(0)
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        arquivo.close()
+        raise RuntimeError(f"O registro de detecções em '{pasta}' já está aberto por outro escritor; "
+                           "cada processo precisa da própria pasta (ECOIA_REGISTRO)") from None
+    return arquivo
+
+# Registros abertos neste processo, por pasta
+_ABERTOS: Dict[str, RegistroDeteccoes] = {}
+_LOCK_ABERTOS = threading.Lock()
+
+def abrir_registro(pasta: Optional[str] = None) -> RegistroDeteccoes:
+    """
+    Registro da pasta, reaproveitando o já aberto neste processo (por exemplo
+    depois de st.cache_resource.clear(), que descarta o objeto mas não a trava)
+    """
+    pasta = pasta or REGISTRO_CONFIG['pasta']
+    with _LOCK_ABERTOS:
+        registro = _ABERTOS.get(os.path.abspath(pasta))
+        if registro is None:
+            registro = _ABERTOS[os.path.abspath(pasta)] = RegistroDeteccoes(pasta)
+        return registro
@@ -0,0 +1,353 @@
+"""
+Serviço HTTP/JSON de classificação, independente do Streamlit.
+
+Usa o mesmo pipeline de inferencia.py (modelo, transformações e limiares
+de outlier do MODEL_CONFIG) e roda as predições em um pool limitado de
+threads. Quando o pool está cheio o serviço responde 503 em vez de
+acumular pedidos.
+
+Endpoints:
+    GET  /saude              -> status e classes
+    POST /classificar        -> uma imagem (bytes crus ou JSON {"imagem": base64})
+    POST /classificar/lote   -> JSON {"imagens": [base64, ...]}
+
+Uso:
+    python servico.py --porta 8600 --workers 2
+"""
+import argparse
+import asyncio
+import base64
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import inferencia
+from cache_predicoes import CachePredicoes
+from inferencia import CLASSES
+from preprocessamento import abrir_imagem
+
+# Configurações do serviço
+SERVICO_CONFIG = {
+    'host': '127.0.0.1',
+    'porta': 8600,
+    'workers': 2,
+    'max_pendentes': 32,
+    'max_imagens_lote': 64,
+    'max_corpo_bytes': 25 * 1024 * 1024,
+    # Prazo para receber cabeçalhos e corpo (cliente lento -> 400)
+    'timeout_leitura': 30,
+    # Prazo da inferência depois do pedido lido (modelo lento -> 504);
+    # abaixo do timeout do ClienteServico para a resposta chegar a ele
+    'timeout_inferencia': 20
+}
+
+STATUS_HTTP = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout'
+}
+
+class ErroHTTP(Exception):
+    """Erro que vira uma resposta HTTP com o status indicado"""
+
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+# ================================================
+# 🔄 SERIALIZAÇÃO
+# ================================================
+
+def resultado_para_json(resultado) -> Dict:
+    """Converte o resultado de fazer_predicao em um dicionário JSON"""
+    classe, confianca, probabilidades, is_outlier = resultado
+    return {
+        'classe': classe,
+        'confianca': float(confianca),
+        'probabilidades': {c: float(p) for c, p in zip(CLASSES, probabilidades)},
+        'outlier': bool(is_outlier)
+    }
+
+def resultado_de_json(dados: Dict):
+    """Converte a resposta JSON de volta para o formato de fazer_predicao"""
+    probabilidades = np.array([dados['probabilidades'][c] for c in CLASSES], dtype=np.float32)
+    return dados['classe'], dados['confianca'], probabilidades, dados['outlier']
+
+def decodificar_imagem(dados: bytes) -> Image.Image:
+    """Abre bytes de imagem como RGB (JPEGs grandes já reduzidos)"""
+    try:
+        return abrir_imagem(dados)
+    except Exception as e:
+        raise ErroHTTP(400, f"Imagem inválida: {e}")
+
+def codificar_imagem(imagem: Image.Image, formato: str = "JPEG") -> bytes:
+    """Serializa uma imagem PIL para envio ao serviço"""
+    buffer = BytesIO()
+    imagem.convert("RGB").save(buffer, format=formato, quality=95)
+    return buffer.getvalue()
+
+# ================================================
+# 🌐 SERVIDOR
+# ================================================
+
+class ServicoClassificacao:
+    """
+    Servidor asyncio com pool limitado de workers de inferência.
+
+    `tratar` não depende de sockets, então a lógica das rotas pode ser
+    exercitada diretamente; `iniciar` expõe o serviço via HTTP.
+    """
+
+    def __init__(self, modelo, workers: Optional[int] = None, max_pendentes: Optional[int] = None):
+        self.modelo = modelo
+        self.workers = workers or SERVICO_CONFIG['workers']
+        self.max_pendentes = max_pendentes or SERVICO_CONFIG['max_pendentes']
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="servico-inferencia")
+        self._vagas = None
+        # O modelo é carregado uma vez: a versão fica fixa durante o processo
+        self.versao = inferencia.versao_modelo()
+        self.cache = CachePredicoes()
+
+    async def iniciar(self, host: Optional[str] = None, porta: Optional[int] = None):
+        """Abre o socket e atende até ser cancelado"""
+        host = host or SERVICO_CONFIG['host']
+        porta = porta or SERVICO_CONFIG['porta']
+        servidor = await asyncio.start_server(self._atender, host, porta)
+        print(f"🌐 Serviço de classificação em http://{host}:{porta} ({self.workers} workers)")
+        async with servidor:
+            await servidor.serve_forever()
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True)
+
+    async def tratar(self, metodo: str, caminho: str, cabecalhos: Dict[str, str], corpo: bytes) -> Tuple[int, Dict]:
+        """Roteia um pedido e retorna (status, resposta JSON)"""
+        caminho = caminho.split('?', 1)[0].rstrip('/') or '/'
+
+        if caminho == '/saude':
+            if metodo != 'GET':
+                raise ErroHTTP(405, "Use GET")
+            return 200, {'status': 'ok', 'classes': CLASSES, 'workers': self.workers,
+                         'cache': self.cache.estatisticas()}
+
+        if caminho == '/classificar':
+            if metodo != 'POST':
+                raise ErroHTTP(405, "Use POST")
+            dados = self._extrair_imagem(cabecalhos, corpo)
+            resultados = await self._inferir([dados])
+            return 200, resultado_para_json(resultados[0])
+
+        if caminho == '/classificar/lote':
+            if metodo != 'POST':
+                raise ErroHTTP(405, "Use POST")
+            imagens = self._ler_json(corpo).get('imagens')
+            if not isinstance(imagens, list) or not imagens:
+                raise ErroHTTP(400, "Envie {\"imagens\": [base64, ...]}")
+            if len(imagens) > SERVICO_CONFIG['max_imagens_lote']:
+                raise ErroHTTP(413, f"Máximo de {SERVICO_CONFIG['max_imagens_lote']} imagens por pedido")
+            resultados = await self._inferir([self._base64(img) for img in imagens])
+            return 200, {'resultados': [resultado_para_json(r) for r in resultados]}
+
+        raise ErroHTTP(404, f"Rota não encontrada: {caminho}")
+
+    async def _inferir(self, lista_bytes: List[bytes]):
+        # Semáforo criado no loop em execução
+        if self._vagas is None:
+            self._vagas = asyncio.Semaphore(self.max_pendentes)
+        if self._vagas.locked():
+            raise ErroHTTP(503, "Serviço ocupado, tente novamente")
+
+        # A vaga só volta quando a thread termina: no prazo esgotado a predição
+        # continua em segundo plano e ainda ocupa o worker
+        await self._vagas.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            futuro = loop.run_in_executor(self._executor, self._predizer, lista_bytes)
+        except BaseException:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(self._liberar_vaga)
+
+        try:
+            # shield: o prazo cancela só a espera, não o futuro que segura a vaga
+            return await asyncio.wait_for(asyncio.shield(futuro), SERVICO_CONFIG['timeout_inferencia'])
+        except asyncio.TimeoutError:
+            raise ErroHTTP(504, "Tempo de inferência esgotado")
+
+    def _liberar_vaga(self, futuro: asyncio.Future):
+        self._vagas.release()
+        # Erro de uma predição já respondida com 504: ninguém mais vai ler o resultado
+        if not futuro.cancelled():
+            futuro.exception()
+
+    def _predizer(self, lista_bytes: List[bytes]):
+        imagens = [decodificar_imagem(dados) for dados in lista_bytes]
+        return self.cache.prever_lote(
+            imagens, lambda faltando: inferencia.fazer_predicao_lote(self.modelo, faltando), self.versao
+        )
+
+    def _extrair_imagem(self, cabecalhos: Dict[str, str], corpo: bytes) -> bytes:
+        if not corpo:
+            raise ErroHTTP(400, "Corpo vazio")
+        if cabecalhos.get('content-type', '').startswith('application/json'):
+            return self._base64(self._ler_json(corpo).get('imagem'))
+        return corpo
+
+    @staticmethod
+    def _ler_json(corpo: bytes) -> Dict:
+        try:
+            dados = json.loads(corpo)
+        except ValueError:
+            raise ErroHTTP(400, "JSON inválido")
+        if not isinstance(dados, dict):
+            raise ErroHTTP(400, "Esperado um objeto JSON")
+        return dados
+
+    @staticmethod
+    def _base64(valor) -> bytes:
+        if not isinstance(valor, str):
+            raise ErroHTTP(400, "Imagem deve ser uma string base64")
+        try:
+            return base64.b64decode(valor, validate=True)
+        except ValueError:
+            raise ErroHTTP(400, "Base64 inválido")
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        try:
+            pedido = await self._ler_pedido(leitor)
+            status, resposta = await self.tratar(*pedido)
+        except ErroHTTP as e:
+            status, resposta = e.status, {'erro': e.mensagem}
+        except Exception as e:
+            status, resposta = 500, {'erro': str(e)}
+
+        corpo = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+        cabecalho = (
+            f"HTTP/1.1 {status} {STATUS_HTTP.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(corpo)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode('latin-1')
+
+        try:
+            escritor.write(cabecalho + corpo)
+            await escritor.drain()
+        finally:
+            escritor.close()
+
+    async def _ler_pedido(self, leitor: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        """Lê (método, caminho, cabeçalhos, corpo) dentro do prazo de leitura"""
+        try:
+            return await asyncio.wait_for(self._ler_requisicao(leitor), SERVICO_CONFIG['timeout_leitura'])
+        except asyncio.TimeoutError:
+            raise ErroHTTP(400, "Tempo de leitura esgotado")
+        except asyncio.IncompleteReadError:
+            raise ErroHTTP(400, "Conexão encerrada antes do fim do corpo")
+
+    async def _ler_requisicao(self, leitor: asyncio.StreamReader):
+        linha = await leitor.readline()
+        partes = linha.decode('latin-1').split()
+        if len(partes) != 3:
+            raise ErroHTTP(400, "Linha de requisição inválida")
+        metodo, caminho, _ = partes
+
+        cabecalhos = {}
+        while True:
+            linha = await leitor.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+        try:
+            tamanho = int(cabecalhos.get('content-length', 0))
+        except ValueError:
+            raise ErroHTTP(400, "Content-Length inválido")
+        if tamanho > SERVICO_CONFIG['max_corpo_bytes']:
+            raise ErroHTTP(413, "Corpo muito grande")
+
+        corpo = await leitor.readexactly(tamanho) if tamanho else b''
+        return metodo.upper(), caminho, cabecalhos, corpo
+
+# ================================================
+# 📡 CLIENTE
+# ================================================
+
+class ClienteServico:
+    """Cliente HTTP do serviço com a mesma interface de resultados de fazer_predicao"""
+
+    def __init__(self, url: str, timeout: float = 30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def saude(self) -> Dict:
+        return self._requisitar('GET', '/saude')
+
+    def classificar(self, imagem: Image.Image):
+        dados = self._requisitar('POST', '/classificar', codificar_imagem(imagem), 'image/jpeg')
+        return resultado_de_json(dados)
+
+    def classificar_lote(self, imagens: List[Image.Image]):
+        corpo = json.dumps({
+            'imagens': [base64.b64encode(codificar_imagem(img)).decode('ascii') for img in imagens]
+        }).encode('utf-8')
+        dados = self._requisitar('POST', '/classificar/lote', corpo, 'application/json')
+        return [resultado_de_json(r) for r in dados['resultados']]
+
+    def _requisitar(self, metodo: str, caminho: str, corpo: Optional[bytes] = None,
+                    tipo: Optional[str] = None) -> Dict:
+        pedido = urllib.request.Request(self.url + caminho, data=corpo, method=metodo)
+        if tipo:
+            pedido.add_header('Content-Type', tipo)
+        try:
+            with urllib.request.urlopen(pedido, timeout=self.timeout) as resposta:
+                return json.loads(resposta.read())
+        except urllib.error.HTTPError as e:
+            try:
+                mensagem = json.loads(e.read()).get('erro', e.reason)
+            except ValueError:
+                mensagem = e.reason
+            raise RuntimeError(f"Serviço respondeu {e.code}: {mensagem}") from None
+
+# ================================================
+# 🚀 EXECUÇÃO
+# ================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP de classificação de resíduos")
+    parser.add_argument('--host', default=SERVICO_CONFIG['host'])
+    parser.add_argument('--porta', type=int, default=SERVICO_CONFIG['porta'])
+    parser.add_argument('--workers', type=int, default=SERVICO_CONFIG['workers'])
+    parser.add_argument('--max-pendentes', type=int, default=SERVICO_CONFIG['max_pendentes'])
+    parser.add_argument('--pesos-aleatorios', action='store_true',
+                        help="Sobe o serviço sem modelo treinado (apenas para testes locais)")
+    args = parser.parse_args()
+
+    if args.pesos_aleatorios:
+        from inferencia_torch import criar_modelo
+        modelo = criar_modelo().eval()
+    else:
+        modelo = inferencia.carregar_modelo_inferencia()
+
+    servico = ServicoClassificacao(modelo, workers=args.workers, max_pendentes=args.max_pendentes)
+    try:
+        asyncio.run(servico.iniciar(args.host, args.porta))
+    except KeyboardInterrupt:
+        print("\n👋 Serviço encerrado")
+    finally:
+        servico.encerrar()
+
+if __name__ == "__main__":
+    main()
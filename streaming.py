@@ -0,0 +1,314 @@
+"""
+Classificação contínua de quadros de câmera ou vídeo.
+
+Pipeline de geradores:
+    ler_quadros -> filtrar_duplicados -> ClassificadorStream (thread + fila
+    limitada) -> SuavizadorJanela
+
+- Quadros quase idênticos ao último aceito são ignorados por uma diferença
+  perceptual barata (miniatura 16x16 em tons de cinza).
+- A inferência roda em uma thread; se ela não acompanhar, a fila (pequena)
+  descarta o quadro mais antigo em vez de crescer sem limite.
+- Os resultados são suavizados por uma janela deslizante de probabilidades
+  e passam pela mesma regra de outlier de `fazer_predicao`.
+
+Vídeos e câmeras usam OpenCV (opcional); GIFs animados funcionam só com PIL.
+
+Uso:
+    python streaming.py video.mp4 --janela 5 --limiar 3
+    python streaming.py 0            # câmera 0
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+import inferencia
+from inferencia import MODEL_CONFIG, Resultado
+
+# Configurações do modo contínuo
+STREAMING_CONFIG = {
+    'janela_suavizacao': 5,
+    'limiar_diferenca': 3.0,   # diferença média (0-255) na miniatura 16x16
+    'tamanho_fila': 2,
+    'pular_quadros': 1         # lê 1 a cada N quadros da fonte
+}
+
+Quadro = Tuple[int, float, Image.Image]  # (índice, tempo em segundos, imagem)
+
+@dataclass
+class ResultadoQuadro:
+    indice: int
+    tempo: float
+    resultado: Resultado        # suavizado pela janela
+    resultado_quadro: Resultado  # apenas este quadro
+    latencia: float             # da leitura ao resultado, em segundos
+
+# ================================================
+# 🎞️ FONTES DE QUADROS
+# ================================================
+
+def _quadros_opencv(fonte: Union[str, int], pular: int) -> Iterator[Quadro]:
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("Instale opencv-python-headless para ler vídeos e câmeras")
+
+    captura = cv2.VideoCapture(fonte)
+    if not captura.isOpened():
+        raise RuntimeError(f"Não foi possível abrir a fonte de vídeo: {fonte}")
+
+    fps = captura.get(cv2.CAP_PROP_FPS) or 0
+    inicio = time.monotonic()
+    indice = 0
+    try:
+        while True:
+            # grab() sem decodificar os quadros que serão pulados
+            if not captura.grab():
+                break
+            if indice % pular == 0:
+                ok, bgr = captura.retrieve()
+                if not ok:
+                    break
+                tempo = indice / fps if fps else time.monotonic() - inicio
+                yield indice, tempo, Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+            indice += 1
+    finally:
+        captura.release()
+
+def _quadros_gif(caminho: str, pular: int) -> Iterator[Quadro]:
+    tempo = 0.0
+    with Image.open(caminho) as animacao:
+        for indice, quadro in enumerate(ImageSequence.Iterator(animacao)):
+            if indice % pular == 0:
+                yield indice, tempo, quadro.convert('RGB')
+            tempo += quadro.info.get('duration', 100) / 1000
+
+def ler_quadros(fonte: Union[str, int], pular: Optional[int] = None) -> Iterator[Quadro]:
+    """Gera quadros RGB de um arquivo de vídeo, GIF animado ou índice de câmera"""
+    pular = max(1, pular or STREAMING_CONFIG['pular_quadros'])
+    if isinstance(fonte, str) and fonte.isdigit():
+        fonte = int(fonte)
+    if isinstance(fonte, str) and not os.path.exists(fonte):
+        raise FileNotFoundError(fonte)
+
+    if isinstance(fonte, str) and fonte.lower().endswith('.gif'):
+        return _quadros_gif(fonte, pular)
+    return _quadros_opencv(fonte, pular)
+
+def assinatura(imagem: Image.Image) -> np.ndarray:
+    """Miniatura 16x16 em tons de cinza usada na comparação entre quadros"""
+    return np.asarray(imagem.convert('L').resize((16, 16), Image.BILINEAR), dtype=np.float32)
+
+def filtrar_duplicados(quadros: Iterable[Quadro], limiar: Optional[float] = None,
+                       estatisticas: Optional[dict] = None) -> Iterator[Quadro]:
+    """Ignora quadros cuja diferença média para o último aceito fica abaixo de `limiar`"""
+    limiar = STREAMING_CONFIG['limiar_diferenca'] if limiar is None else limiar
+    anterior = None
+
+    for quadro in quadros:
+        atual = assinatura(quadro[2])
+        if anterior is not None and np.abs(atual - anterior).mean() < limiar:
+            if estatisticas is not None:
+                estatisticas['duplicados'] = estatisticas.get('duplicados', 0) + 1
+            continue
+        anterior = atual
+        yield quadro
+
+# ================================================
+# 🧮 SUAVIZAÇÃO
+# ================================================
+
+class SuavizadorJanela:
+    """Média das probabilidades dos últimos `tamanho` quadros"""
+
+    def __init__(self, tamanho: Optional[int] = None):
+        self.janela = deque(maxlen=tamanho or STREAMING_CONFIG['janela_suavizacao'])
+
+    def adicionar(self, probabilidades: np.ndarray) -> Resultado:
+        self.janela.append(np.asarray(probabilidades, dtype=np.float32))
+        media = np.mean(self.janela, axis=0)
+        return inferencia.interpretar_probabilidades(media[np.newaxis])[0]
+
+    def limpar(self):
+        self.janela.clear()
+
+# ================================================
+# 🧵 INFERÊNCIA EM SEGUNDO PLANO
+# ================================================
+
+_FIM = object()
+
+class ClassificadorStream:
+    """
+    Thread de inferência alimentada por uma fila limitada.
+
+    Por padrão `enviar` não bloqueia: com a fila cheia o quadro mais antigo é
+    descartado. Os quadros que já estão na fila são classificados juntos
+    em um único lote.
+    """
+
+    def __init__(self, modelo, tamanho_fila: Optional[int] = None, janela: Optional[int] = None):
+        self.backend = inferencia.como_backend(modelo)
+        self.suavizador = SuavizadorJanela(janela)
+        self._entrada = queue.Queue(maxsize=tamanho_fila or STREAMING_CONFIG['tamanho_fila'])
+        self._saida = queue.Queue()
+        self.descartados = 0
+        self.classificados = 0
+        self._thread = threading.Thread(target=self._executar, name="streaming-inferencia", daemon=True)
+        self._thread.start()
+
+    def enviar(self, quadro: Quadro, bloquear: bool = False):
+        """Enfileira um quadro; com `bloquear=True` espera vaga em vez de descartar"""
+        item = (quadro, time.monotonic())
+        if bloquear:
+            self._entrada.put(item)
+            return
+        while True:
+            try:
+                self._entrada.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._entrada.get_nowait()
+                    self.descartados += 1
+                except queue.Empty:
+                    pass
+
+    def finalizar(self):
+        """Sinaliza o fim da fonte; a thread termina após a fila esvaziar"""
+        self._entrada.put(_FIM)
+
+    def resultados_prontos(self) -> Iterator[ResultadoQuadro]:
+        """Resultados disponíveis agora, sem bloquear"""
+        while True:
+            try:
+                item = self._saida.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _FIM:
+                yield item
+
+    def resultados(self) -> Iterator[ResultadoQuadro]:
+        """Todos os resultados até o fim da fonte (bloqueante)"""
+        while True:
+            item = self._saida.get()
+            if item is _FIM:
+                return
+            yield item
+
+    def _executar(self):
+        while True:
+            itens = [self._entrada.get()]
+            while itens[-1] is not _FIM:
+                try:
+                    itens.append(self._entrada.get_nowait())
+                except queue.Empty:
+                    break
+
+            fim = itens[-1] is _FIM
+            lote = [item for item in itens if item is not _FIM]
+
+            if lote:
+                try:
+                    probabilidades = self.backend.prever_probabilidades([quadro[2] for quadro, _ in lote])
+                    brutos = inferencia.interpretar_probabilidades(probabilidades)
+                except Exception as e:
+                    print(f"⚠️ Erro ao classificar quadros: {e}")
+                    probabilidades, brutos = [], []
+
+                agora = time.monotonic()
+                for (quadro, enviado), prob, bruto in zip(lote, probabilidades, brutos):
+                    self.classificados += 1
+                    self._saida.put(ResultadoQuadro(
+                        indice=quadro[0],
+                        tempo=quadro[1],
+                        resultado=self.suavizador.adicionar(prob),
+                        resultado_quadro=bruto,
+                        latencia=agora - enviado
+                    ))
+
+            if fim:
+                self._saida.put(_FIM)
+                return
+
+def classificar_stream(fonte, modelo, limiar: Optional[float] = None, janela: Optional[int] = None,
+                       pular: Optional[int] = None, tempo_real: bool = False,
+                       estatisticas: Optional[dict] = None) -> Iterator[ResultadoQuadro]:
+    """
+    Classifica os quadros de `fonte` conforme chegam.
+
+    Com `tempo_real=True` a leitura de arquivos respeita o relógio do vídeo
+    (como uma câmera), então quadros podem ser descartados se a inferência
+    for lenta; caso contrário o arquivo é lido o mais rápido possível.
+    """
+    estatisticas = estatisticas if estatisticas is not None else {}
+    estatisticas.update({'lidos': 0, 'duplicados': 0})
+
+    classificador = ClassificadorStream(modelo, janela=janela)
+    inicio = time.monotonic()
+
+    def contar(quadros):
+        for quadro in quadros:
+            estatisticas['lidos'] += 1
+            yield quadro
+
+    try:
+        for quadro in filtrar_duplicados(contar(ler_quadros(fonte, pular)), limiar, estatisticas):
+            if tempo_real:
+                atraso = quadro[1] - (time.monotonic() - inicio)
+                if atraso > 0:
+                    time.sleep(atraso)
+            # Sem relógio (arquivo lido o mais rápido possível) nenhum quadro é descartado
+            classificador.enviar(quadro, bloquear=not tempo_real)
+            yield from classificador.resultados_prontos()
+    finally:
+        classificador.finalizar()
+
+    yield from classificador.resultados()
+    estatisticas.update({
+        'descartados': classificador.descartados,
+        'classificados': classificador.classificados,
+        'segundos': time.monotonic() - inicio
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description="Classificação contínua de vídeo/câmera")
+    parser.add_argument('fonte', help="Arquivo de vídeo, GIF animado ou índice da câmera")
+    parser.add_argument('--janela', type=int, default=STREAMING_CONFIG['janela_suavizacao'])
+    parser.add_argument('--limiar', type=float, default=STREAMING_CONFIG['limiar_diferenca'])
+    parser.add_argument('--pular', type=int, default=STREAMING_CONFIG['pular_quadros'])
+    parser.add_argument('--tempo-real', action='store_true', help="Lê arquivos no ritmo do vídeo")
+    parser.add_argument('--pesos-aleatorios', action='store_true', help="Sem modelo treinado (testes de carga)")
+    args = parser.parse_args()
+
+    if args.pesos_aleatorios:
+        from inferencia_torch import criar_modelo
+        modelo = criar_modelo().eval()
+    else:
+        if not inferencia.modelo_disponivel():
+            parser.error(f"Modelo não encontrado: {MODEL_CONFIG['model_path']} (use --pesos-aleatorios)")
+        modelo = inferencia.carregar_modelo_inferencia()
+
+    estatisticas = {}
+    for r in classificar_stream(args.fonte, modelo, args.limiar, args.janela, args.pular,
+                                args.tempo_real, estatisticas):
+        classe, confianca, _, is_outlier = r.resultado
+        rotulo = "não reconhecido" if is_outlier else classe
+        print(f"quadro {r.indice:>6} ({r.tempo:7.2f}s): {rotulo:<16} {confianca:6.1%} "
+              f"[quadro: {r.resultado_quadro[0]}] {r.latencia * 1000:6.0f} ms")
+
+    segundos = estatisticas['segundos'] or 1e-9
+    print(f"\n📊 {estatisticas['lidos']} quadros lidos, {estatisticas['duplicados']} duplicados ignorados, "
+          f"{estatisticas['descartados']} descartados, {estatisticas['classificados']} classificados "
+          f"({estatisticas['classificados'] / segundos:.1f} quadros/s)")
+
+if __name__ == "__main__":
+    main()
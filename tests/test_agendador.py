@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from agendador import _PARAR, AgendadorInferencia
+from inferencia import CLASSES, BackendInferencia
+
+class BackendFixo(BackendInferencia):
+    nome = 'fixo'
+
+    def prever_probabilidades(self, imagens):
+        prob = np.zeros((len(imagens), len(CLASSES)), dtype=np.float32)
+        prob[:, 1] = 1.0
+        return prob
+
+def test_submeter_depois_de_encerrar_falha():
+    agendador = AgendadorInferencia(BackendFixo(), tamanho_lote_max=4, espera_max_ms=1)
+    agendador.encerrar()
+    with pytest.raises(RuntimeError):
+        agendador.submeter(object())
+
+def test_todo_futuro_aceito_e_resolvido_durante_o_encerramento():
+    agendador = AgendadorInferencia(BackendFixo(), tamanho_lote_max=4, espera_max_ms=1)
+    aceitos = []
+    comecar = threading.Barrier(5)
+
+    def submeter():
+        comecar.wait()
+        for _ in range(200):
+            try:
+                aceitos.append(agendador.submeter(object()))
+            except RuntimeError:
+                return
+
+    threads = [threading.Thread(target=submeter) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    comecar.wait()
+    agendador.encerrar()
+    for thread in threads:
+        thread.join()
+
+    assert all(futuro.result(timeout=5)[0] == CLASSES[1] for futuro in aceitos)
+
+def test_restos_da_fila_recebem_erro():
+    agendador = AgendadorInferencia(BackendFixo(), tamanho_lote_max=4, espera_max_ms=1)
+    agendador.encerrar()
+    # Item que (por qualquer caminho) ficou atrás de _PARAR
+    futuro = Future()
+    agendador._fila.put((object(), futuro))
+    agendador._fila.put(_PARAR)
+    agendador._descartar_restantes()
+    with pytest.raises(RuntimeError, match='encerrado'):
+        futuro.result(timeout=1)
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from armazenamento import ArmazenamentoPerfis, RepositorioPerfis, perfil_novo
+
+class ArmazenamentoLento(ArmazenamentoPerfis):
+    """Armazenamento em memória cujo `carregar` espera `liberar` para usuários em `lentos`"""
+
+    nome = 'lento'
+
+    def __init__(self):
+        self.perfis = {}
+        self.lentos = set()
+        self.lendo = threading.Event()
+        self.liberar = threading.Event()
+
+    def carregar(self, usuario_id):
+        if usuario_id in self.lentos:
+            self.lendo.set()
+            assert self.liberar.wait(5)
+        perfil = self.perfis.get(usuario_id)
+        return dict(perfil, recompensas_resgatadas=[]) if perfil else None
+
+    def gravar_lote(self, operacoes, perfis):
+        self.perfis.update(perfis)
+
+@pytest.fixture
+def armazenamento():
+    return ArmazenamentoLento()
+
+@pytest.fixture
+def repositorio(armazenamento):
+    repositorio = RepositorioPerfis(armazenamento, intervalo_gravacao_s=60)
+    yield repositorio
+    armazenamento.liberar.set()
+    repositorio.encerrar()
+
+def em_thread(funcao, *args):
+    resultado = {}
+    thread = threading.Thread(target=lambda: resultado.setdefault('valor', funcao(*args)))
+    thread.start()
+    return thread, resultado
+
+def test_falha_de_cache_nao_bloqueia_outros_usuarios(armazenamento, repositorio):
+    with repositorio.editar('rapido') as perfil:
+        perfil['ecomoedas_total'] = 5
+
+    armazenamento.lentos.add('lento')
+    thread, _ = em_thread(repositorio.perfil, 'lento')
+    assert armazenamento.lendo.wait(5)
+
+    # Enquanto 'lento' lê o armazenamento, o lock do repositório está livre
+    assert repositorio._lock.acquire(timeout=1)
+    repositorio._lock.release()
+    with repositorio.editar('rapido') as perfil:
+        perfil['ecomoedas_total'] += 1
+    assert repositorio.perfil('rapido')['ecomoedas_total'] == 6
+
+    armazenamento.liberar.set()
+    thread.join(5)
+
+def test_edicao_durante_a_carga_nao_e_sobrescrita(armazenamento, repositorio):
+    armazenamento.perfis['u'] = dict(perfil_novo(), ecomoedas_total=10)
+    armazenamento.lentos.add('u')
+    thread, resultado = em_thread(repositorio.perfil, 'u')
+    assert armazenamento.lendo.wait(5)
+
+    # Outra sessão reseta o perfil enquanto a primeira ainda lê o valor antigo
+    repositorio.resetar('u')
+    armazenamento.liberar.set()
+    thread.join(5)
+
+    assert resultado['valor'] is repositorio.perfil('u')
+    assert repositorio.perfil('u')['ecomoedas_total'] == 0
+
+def test_cargas_simultaneas_compartilham_o_mesmo_dicionario(armazenamento, repositorio):
+    armazenamento.perfis['u'] = dict(perfil_novo(), ecomoedas_total=3)
+    armazenamento.lentos.add('u')
+    threads = [em_thread(repositorio.perfil, 'u') for _ in range(4)]
+    assert armazenamento.lendo.wait(5)
+    armazenamento.liberar.set()
+    for thread, _ in threads:
+        thread.join(5)
+
+    perfis = {id(resultado['valor']) for _, resultado in threads}
+    assert perfis == {id(repositorio.perfil('u'))}
+    assert repositorio.perfil('u')['ecomoedas_total'] == 3
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('onnxruntime')
+
+from inferencia_onnx import BackendOnnx
+from inferencia_torch import BackendTorch, criar_modelo
+
+def imagens(quantidade, semente=0):
+    rng = np.random.default_rng(semente)
+    tamanhos = [(320, 240), (224, 224), (500, 375), (180, 260)]
+    return [Image.fromarray(rng.integers(0, 256, (altura, largura, 3), dtype=np.uint8))
+            for largura, altura in (tamanhos[i % len(tamanhos)] for i in range(quantidade))]
+
+def test_torch_e_onnx_dao_as_mesmas_probabilidades(tmp_path):
+    from treinar_modelo import export_onnx
+
+    torch.manual_seed(0)
+    modelo = criar_modelo().eval()
+    caminho = export_onnx(modelo, str(tmp_path / 'modelo.onnx'))
+
+    lote = imagens(6)
+    prob_torch = BackendTorch(modelo).prever_probabilidades(lote)
+    prob_onnx = BackendOnnx(caminho).prever_probabilidades(lote)
+
+    assert prob_torch.shape == prob_onnx.shape == (6, prob_torch.shape[1])
+    np.testing.assert_allclose(prob_onnx, prob_torch, atol=1e-4)
+    assert (prob_torch.argmax(1) == prob_onnx.argmax(1)).all()
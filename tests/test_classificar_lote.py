@@ -0,0 +1,30 @@
+import csv
+
+import classificar_lote as cl
+
+def linha(caminho, classe='glass'):
+    return {'caminho': caminho, 'classe': classe, 'confianca': 0.9, 'entropia': 0.1, 'outlier': False, 'erro': None}
+
+def test_retomada_descarta_o_que_passou_do_checkpoint(tmp_path):
+    saida = str(tmp_path / 'resultados.csv')
+
+    # Caminhos com acentos: o offset precisa ser em bytes, não em caracteres
+    escritor = cl.criar_escritor(saida)
+    escritor.escrever([linha('fotos/garrafa_ção.jpg'), linha('fotos/lata_ñ.jpg')])
+    posicao = escritor.confirmar()
+    escritor.escrever([linha('fotos/não_confirmada.jpg')])
+    escritor.fechar()
+
+    escritor = cl.criar_escritor(saida, posicao)
+    escritor.escrever([linha('fotos/papelão.jpg', 'cardboard')])
+    escritor.confirmar()
+    escritor.fechar()
+
+    with open(saida, newline='', encoding='utf-8') as arquivo:
+        caminhos = [registro['caminho'] for registro in csv.DictReader(arquivo)]
+    assert caminhos == ['fotos/garrafa_ção.jpg', 'fotos/lata_ñ.jpg', 'fotos/papelão.jpg']
+
+def test_parquet_detectado_pela_extensao():
+    assert cl.saida_parquet('resultados.parquet')
+    assert cl.saida_parquet('resultados.PARQUET/')
+    assert not cl.saida_parquet('resultados.csv')
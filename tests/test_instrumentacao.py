@@ -0,0 +1,64 @@
+import pytest
+
+import instrumentacao
+from instrumentacao import Instrumentacao, admin_autorizado
+
+class Mensagem:
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+
+    def ByteSize(self):
+        return self.tamanho
+
+class Contexto:
+    def __init__(self):
+        self.enviadas = []
+        self._enqueue = self.enviadas.append
+
+@pytest.fixture(autouse=True)
+def sem_exportacao(monkeypatch, tmp_path):
+    monkeypatch.setitem(instrumentacao.INSTRUMENTACAO_CONFIG, 'arquivo_prometheus', str(tmp_path / 'm.prom'))
+
+def test_admin_desligado_sem_token(monkeypatch):
+    monkeypatch.setitem(instrumentacao.INSTRUMENTACAO_CONFIG, 'token_admin', None)
+    assert not admin_autorizado('1')
+    assert not admin_autorizado('')
+
+def test_admin_exige_o_token(monkeypatch):
+    monkeypatch.setitem(instrumentacao.INSTRUMENTACAO_CONFIG, 'token_admin', 's3gredo')
+    assert admin_autorizado('s3gredo')
+    assert not admin_autorizado('1')
+    assert not admin_autorizado(None)
+
+def test_conta_bytes_e_restaura_enqueue(monkeypatch):
+    ctx = Contexto()
+    original = ctx._enqueue
+    monkeypatch.setattr(instrumentacao, '_contexto_streamlit', lambda: ctx)
+    medidor = Instrumentacao()
+
+    with medidor.medir_rerun() as rerun:
+        ctx._enqueue(Mensagem(100))
+        ctx._enqueue(Mensagem(23))
+
+    assert (rerun.bytes, rerun.mensagens) == (123, 2)
+    assert len(ctx.enviadas) == 2
+    assert ctx._enqueue == original
+    assert 'ecodetector_rerun_bytes_count{pagina="desconhecida"} 1' in medidor.prometheus()
+
+def test_streamlit_sem_enqueue_desliga_so_os_bytes(monkeypatch, capsys):
+    ctx = Contexto()
+    del ctx._enqueue
+    monkeypatch.setattr(instrumentacao, '_contexto_streamlit', lambda: ctx)
+    medidor = Instrumentacao()
+
+    for _ in range(2):
+        with medidor.medir_rerun() as rerun:
+            with rerun.fase('pagina'):
+                pass
+
+    assert rerun.bytes is None
+    assert not medidor.contar_bytes
+    assert capsys.readouterr().out.count('Contagem de bytes') == 1
+    linhas = {linha['fase']: linha for linha in medidor.resumo()}
+    assert linhas['total']['reruns'] == 2 and 'bytes_p50' not in linhas['total']
+    assert 'ecodetector_rerun_bytes_count' not in medidor.prometheus()
@@ -0,0 +1,42 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocessamento import Preprocessador, abrir_imagem
+
+transforms = pytest.importorskip('torchvision.transforms')
+
+# Pipeline anterior (torchvision), o mesmo do test_transform de treinar_modelo.py
+PIPELINE_TORCHVISION = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+def jpeg_sintetico(largura, altura, semente):
+    """Gradientes suaves com ruído (como uma foto), salvos como JPEG"""
+    rng = np.random.default_rng(semente)
+    y, x = np.mgrid[0:altura, 0:largura] / max(largura, altura)
+    base = np.stack([np.sin(6 * x + semente) * 0.5 + 0.5, np.cos(4 * y) * 0.5 + 0.5, x * y], axis=-1) * 220
+    pixels = np.clip(base + rng.normal(0, 8, (altura, largura, 3)), 0, 255).astype(np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+# Grandes (decodificação reduzida + reducing_gap), médias e já no tamanho de entrada
+TAMANHOS = [(4000, 3000), (1600, 1200), (1200, 1600), (640, 480), (300, 200), (224, 224)]
+
+@pytest.mark.parametrize('largura, altura', TAMANHOS)
+def test_equivale_ao_pipeline_torchvision(largura, altura):
+    dados = jpeg_sintetico(largura, altura, semente=largura)
+
+    esperado = PIPELINE_TORCHVISION(Image.open(BytesIO(dados)).convert('RGB')).numpy()
+    obtido = Preprocessador().preparar([abrir_imagem(dados)])[0]
+
+    assert obtido.shape == esperado.shape == (3, 224, 224)
+    diferenca = np.abs(obtido - esperado)
+    # Unidades normalizadas: 0.05 ~ 3 níveis de 255 em um pixel isolado
+    assert diferenca.max() < 0.05
+    assert diferenca.mean() < 0.01
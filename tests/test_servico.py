@@ -0,0 +1,116 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import servico
+from inferencia import CLASSES, BackendInferencia
+
+class BackendFixo(BackendInferencia):
+    """Backend de teste: sempre a primeira classe, opcionalmente lento"""
+
+    nome = 'fixo'
+
+    def __init__(self, atraso=0.0):
+        self.atraso = atraso
+
+    def prever_probabilidades(self, imagens):
+        time.sleep(self.atraso)
+        prob = np.full((len(imagens), len(CLASSES)), 0.01, dtype=np.float32)
+        prob[:, 0] = 1 - 0.01 * (len(CLASSES) - 1)
+        return prob
+
+class EscritorFalso:
+    def __init__(self):
+        self.dados = b''
+        self.fechado = False
+
+    def write(self, dados):
+        self.dados += dados
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.fechado = True
+
+def pedido_http(corpo, content_length=None):
+    tamanho = len(corpo) if content_length is None else content_length
+    return (b"POST /classificar HTTP/1.1\r\nContent-Type: image/jpeg\r\n"
+            + f"Content-Length: {tamanho}\r\n\r\n".encode('latin-1') + corpo)
+
+def atender(backend, dados, fim=True):
+    """Roda _atender sobre um StreamReader com `dados`; retorna (status, JSON)"""
+    async def rodar():
+        leitor = asyncio.StreamReader()
+        leitor.feed_data(dados)
+        if fim:
+            leitor.feed_eof()
+        escritor = EscritorFalso()
+        srv = servico.ServicoClassificacao(backend, workers=1)
+        try:
+            await srv._atender(leitor, escritor)
+        finally:
+            srv.encerrar()
+        assert escritor.fechado
+        return escritor.dados
+
+    resposta = asyncio.run(rodar())
+    cabecalho, _, corpo = resposta.partition(b'\r\n\r\n')
+    return int(cabecalho.split()[1]), json.loads(corpo)
+
+@pytest.fixture
+def jpeg():
+    return servico.codificar_imagem(Image.new('RGB', (32, 32), (10, 120, 40)))
+
+def test_classifica(jpeg):
+    status, resposta = atender(BackendFixo(), pedido_http(jpeg))
+    assert status == 200
+    assert resposta['classe'] == CLASSES[0]
+
+def test_corpo_incompleto_responde_400(jpeg):
+    status, resposta = atender(BackendFixo(), pedido_http(jpeg, content_length=len(jpeg) + 100))
+    assert status == 400
+    assert 'corpo' in resposta['erro']
+
+def test_leitura_lenta_responde_400(jpeg, monkeypatch):
+    monkeypatch.setitem(servico.SERVICO_CONFIG, 'timeout_leitura', 0.05)
+    # Sem EOF: o cliente "ainda está enviando" o corpo
+    status, resposta = atender(BackendFixo(), pedido_http(jpeg)[:-10], fim=False)
+    assert status == 400
+    assert 'leitura' in resposta['erro']
+
+def test_inferencia_lenta_nao_conta_como_leitura(jpeg, monkeypatch):
+    monkeypatch.setitem(servico.SERVICO_CONFIG, 'timeout_leitura', 0.05)
+    status, _ = atender(BackendFixo(atraso=0.2), pedido_http(jpeg))
+    assert status == 200
+
+def test_inferencia_esgotada_responde_504(jpeg, monkeypatch):
+    monkeypatch.setitem(servico.SERVICO_CONFIG, 'timeout_inferencia', 0.05)
+    status, resposta = atender(BackendFixo(atraso=0.3), pedido_http(jpeg))
+    assert status == 504
+    assert 'inferência' in resposta['erro']
+
+def test_vaga_ocupada_ate_a_thread_terminar(jpeg, monkeypatch):
+    monkeypatch.setitem(servico.SERVICO_CONFIG, 'timeout_inferencia', 0.05)
+
+    async def rodar():
+        srv = servico.ServicoClassificacao(BackendFixo(atraso=0.3), workers=1, max_pendentes=1)
+        pedido = ('POST', '/classificar', {'content-type': 'image/jpeg'}, jpeg)
+        status = []
+        try:
+            for espera in (0, 0, 0.5):
+                await asyncio.sleep(espera)
+                try:
+                    status.append((await srv.tratar(*pedido))[0])
+                except servico.ErroHTTP as e:
+                    status.append(e.status)
+        finally:
+            srv.encerrar()
+        return status
+
+    # 504 libera a resposta, mas a thread ainda ocupa a única vaga
+    assert asyncio.run(rodar()) == [504, 503, 200]
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import treinar_modelo as tm
+
+CLASSES = ['cardboard', 'glass', 'metal']
+
+def save_image(path, color):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', (16, 16), color).save(path)
+
+@pytest.fixture
+def dataset_dir(tmp_path, monkeypatch):
+    """
+    data_dir pequeno (3 classes x 10 imagens) e split_path dentro de tmp_path
+    """
+    root = tmp_path / 'dataset'
+    for name in CLASSES:
+        for i in range(10):
+            save_image(str(root / name / f'{i}.jpg'), (i * 20, 0, 0))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tm, 'data_dir', str(root))
+    return root
+
+def load_saved_split():
+    with open(tm.split_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def test_split_reused_when_files_unchanged(dataset_dir, capsys):
+    tm.prepare_data(batch_size=4, num_workers=0)
+    first = load_saved_split()
+    capsys.readouterr()
+
+    tm.prepare_data(batch_size=4, num_workers=0)
+    assert 'refazendo o split' not in capsys.readouterr().out
+    assert load_saved_split() == first
+
+def test_split_rebuilt_when_file_added(dataset_dir):
+    tm.prepare_data(batch_size=4, num_workers=0)
+    before = load_saved_split()
+
+    save_image(str(dataset_dir / 'glass' / 'nova.jpg'), (0, 255, 0))
+    train_loader, val_loader, test_loader, _ = tm.prepare_data(batch_size=4, num_workers=0)
+    after = load_saved_split()
+
+    assert os.path.join('glass', 'nova.jpg') in after['paths']
+    assert len(after['paths']) == len(before['paths']) + 1
+    assert after['fingerprint'] != before['fingerprint']
+    total = len(train_loader.dataset) + len(val_loader.dataset) + len(test_loader.dataset)
+    assert total == len(after['paths'])
+
+def test_split_rebuilt_when_file_replaced_with_verify(dataset_dir):
+    tm.prepare_data(batch_size=4, num_workers=0, verify=True)
+    before = load_saved_split()
+
+    # Mesmo nome, conteúdo (e tamanho) diferente: a pasta não muda, só o arquivo
+    Image.new('RGB', (64, 64), (0, 0, 255)).save(str(dataset_dir / 'metal' / '0.jpg'))
+    tm.prepare_data(batch_size=4, num_workers=0, verify=True)
+
+    assert load_saved_split()['fingerprint_full'] != before['fingerprint_full']
+
+def test_quick_check_stats_folders_not_files(dataset_dir, monkeypatch):
+    tm.prepare_data(batch_size=4, num_workers=0)
+
+    stat, calls = os.stat, []
+    monkeypatch.setattr(os, 'stat', lambda path, *args, **kwargs: calls.append(path) or stat(path, *args, **kwargs))
+    assert tm.load_split() is not None
+    # data_dir e as três pastas de classe; nenhuma imagem
+    assert len([path for path in calls if str(path).startswith(str(dataset_dir))]) == 1 + len(CLASSES)
+
+def test_resume_refused_when_files_changed(dataset_dir):
+    train_loader, val_loader, test_loader, _ = tm.prepare_data(batch_size=4, num_workers=0)
+    split_indices = tuple(list(loader.dataset.indices) for loader in (train_loader, val_loader, test_loader))
+
+    save_image(str(dataset_dir / 'cardboard' / 'nova.jpg'), (0, 255, 0))
+    with pytest.raises(ValueError, match='--resume'):
+        tm.prepare_data(batch_size=4, num_workers=0, split_indices=split_indices)
+
+def test_mmap_cache_rebuilt_when_file_added(dataset_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(tm, 'mmap_cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.setattr(tm, 'mmap_cache_size', 16)
+    tm.prepare_data(batch_size=4, num_workers=0, use_mmap_cache=True)
+
+    save_image(str(dataset_dir / 'metal' / 'nova.jpg'), (0, 255, 0))
+    train_loader, val_loader, test_loader, _ = tm.prepare_data(batch_size=4, num_workers=0, use_mmap_cache=True)
+
+    full_dataset = train_loader.dataset.dataset
+    assert len(full_dataset) == 3 * 10 + 1
+    assert os.path.join('metal', 'nova.jpg') in full_dataset.paths
+    assert load_saved_split()['paths'] == list(full_dataset.paths)
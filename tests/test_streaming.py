@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import streaming
+from inferencia import CLASSES, BackendInferencia
+
+VERMELHO, VERDE = 0, 1
+
+class BackendCor(BackendInferencia):
+    """Backend de teste: classe VERMELHO ou VERDE pelo canal dominante do quadro"""
+
+    nome = 'cor'
+
+    def __init__(self):
+        self.lotes = []
+
+    def prever_probabilidades(self, imagens):
+        self.lotes.append(len(imagens))
+        prob = np.full((len(imagens), len(CLASSES)), 0.2 / (len(CLASSES) - 1), dtype=np.float32)
+        for i, imagem in enumerate(imagens):
+            media = np.asarray(imagem, dtype=np.float32).mean(axis=(0, 1))
+            prob[i, VERMELHO if media[0] > media[1] else VERDE] = 0.8
+        return prob
+
+def quadro_solido(cor, marca=None):
+    pixels = np.zeros((48, 64, 3), dtype=np.uint8)
+    pixels[:] = cor
+    if marca is not None:
+        # Poucos pixels diferentes: o quadro não é idêntico, mas é quase duplicado
+        pixels[marca:marca + 2, marca:marca + 2] = 255
+    return pixels
+
+# vermelho, 2 quase duplicados, vermelho mais escuro, verde, verde mais escuro
+CLIPE = [quadro_solido((200, 0, 0)), quadro_solido((200, 0, 0), 4), quadro_solido((200, 0, 0), 20),
+         quadro_solido((120, 0, 0)), quadro_solido((0, 200, 0)), quadro_solido((0, 120, 0))]
+
+def gravar_gif(pasta):
+    caminho = str(pasta / 'clipe.gif')
+    imagens = [Image.fromarray(pixels) for pixels in CLIPE]
+    imagens[0].save(caminho, save_all=True, append_images=imagens[1:], duration=40, loop=0)
+    return caminho
+
+def gravar_video(pasta):
+    cv2 = pytest.importorskip('cv2')
+    caminho = str(pasta / 'clipe.avi')
+    escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*'MJPG'), 25, (64, 48))
+    if not escritor.isOpened():
+        pytest.skip("OpenCV sem codec MJPG")
+    for pixels in CLIPE:
+        escritor.write(cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR))
+    escritor.release()
+    return caminho
+
+@pytest.mark.parametrize('gravar', [gravar_gif, gravar_video], ids=['gif', 'video'])
+def test_clipe_local(tmp_path, gravar):
+    fonte = gravar(tmp_path)
+    estatisticas = {}
+    resultados = list(streaming.classificar_stream(fonte, BackendCor(), janela=3, estatisticas=estatisticas))
+
+    assert estatisticas['lidos'] == len(CLIPE)
+    assert estatisticas['duplicados'] == 2
+    assert [r.indice for r in resultados] == [0, 3, 4, 5]
+    assert [r.resultado_quadro[0] for r in resultados] == [CLASSES[c] for c in (VERMELHO, VERMELHO, VERDE, VERDE)]
+    # Janela de 3: o primeiro verde ainda perde para os dois vermelhos anteriores
+    assert [r.resultado[0] for r in resultados] == [CLASSES[c] for c in (VERMELHO, VERMELHO, VERMELHO, VERDE)]
+
+def test_fila_cheia_descarta_o_quadro_mais_antigo():
+    liberar, ocupado = threading.Event(), threading.Event()
+
+    class BackendLento(BackendCor):
+        def prever_probabilidades(self, imagens):
+            ocupado.set()
+            assert liberar.wait(5)
+            return super().prever_probabilidades(imagens)
+
+    backend = BackendLento()
+    classificador = streaming.ClassificadorStream(backend, tamanho_fila=2, janela=1)
+    imagem = Image.fromarray(quadro_solido((200, 0, 0)))
+
+    classificador.enviar((0, 0.0, imagem))
+    assert ocupado.wait(5)
+    # A thread está presa no quadro 0; a fila de 2 fica só com os mais recentes
+    for indice in range(1, 6):
+        classificador.enviar((indice, indice / 25, imagem))
+    liberar.set()
+    classificador.finalizar()
+
+    assert [r.indice for r in classificador.resultados()] == [0, 4, 5]
+    assert classificador.descartados == 3
+    # Os quadros que esperavam na fila vão juntos em um lote
+    assert backend.lotes == [1, 2]
+
+def test_suavizador_janela():
+    suavizador = streaming.SuavizadorJanela(3)
+    vermelho = np.eye(len(CLASSES), dtype=np.float32)[VERMELHO]
+    verde = np.eye(len(CLASSES), dtype=np.float32)[VERDE]
+
+    rotulos = [suavizador.adicionar(prob)[0] for prob in (vermelho, vermelho, verde, verde, verde)]
+    assert rotulos == [CLASSES[c] for c in (VERMELHO, VERMELHO, VERMELHO, VERDE, VERDE)]
@@ -1,20 +1,97 @@
 import torch
 import torch.nn as nn
 import torch.optim as optim
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
 from torchvision import datasets, transforms, models
-from torch.utils.data import DataLoader, random_split
-from sklearn.metrics import accuracy_score, f1_score, classification_report, confusion_matrix
+from torch.utils.data import DataLoader, DistributedSampler, Subset
+from torchvision.datasets.folder import default_loader
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Gráficos só em arquivo (treino sem display)
 import matplotlib.pyplot as plt
 import seaborn as sns
+import argparse
+import copy
+import functools
+import hashlib
+import builtins
+import io
+import json
 import os
+import random
+import socket
+import time
+
+from dataset_mmap import (MmapImageDataset, build_mmap_cache, dataset_fingerprint, folder_fingerprint,
+                          image_folders, make_mmap_transform)
 
 # 📂 Configurações do projeto
 data_dir = r'C:\Users\usuario\Desktop\projetos\Oikos\dataset\dataset-resized\dataset-resized'
 model_path = "modelo_oikos.pt"
+torchscript_path = "modelo_oikos_ts.pt"
+quantized_path = "modelo_oikos_int8.pt"
+onnx_path = "modelo_oikos.onnx"
 batch_size = 16
 learning_rate = 0.001
 num_epochs = 10
+fine_tune_learning_rate = 0.0001
+fine_tune_epochs = 3
+export_int8 = True                 # Gerar também a variante INT8 para CPU
+num_calibration_samples = 256      # Amostras do treino usadas na calibração
+
+# ⚙️ Pipeline de dados (DataLoader)
+num_workers = min(8, os.cpu_count() or 1)  # Processos de decodificação + augmentation
+persistent_workers = True                  # Manter os workers vivos entre épocas
+prefetch_factor = 4                        # Lotes pré-carregados por worker
+pin_memory = torch.cuda.is_available()     # Cópia assíncrona para a GPU
+input_bound_threshold = 0.25               # Fração da época esperando dados para considerar gargalo de entrada
+
+# 🎛️ Precisão mista e formato de memória (opt-in: --amp / --channels-last)
+use_amp = False                            # autocast bfloat16 na CPU, float16 (+ GradScaler) na GPU
+use_channels_last = False                  # NHWC para as convoluções da EfficientNet
+
+# 🌐 Treino distribuído (--world-size N ou torchrun, backend gloo)
+dist_backend = "gloo"
+split_seed = 42                            # Mesmo split de treino/teste em todos os processos
+
+# 🔀 Split treino/validação/teste estratificado, salvo em disco e reutilizado (--rebuild-split para refazer)
+# A validação (early stopping, escolha do melhor modelo, busca de hiperparâmetros) sai do treino;
+# o teste só é usado na avaliação final
+split_path = "split_oikos.json"
+test_fraction = 0.2
+val_fraction = 0.1                         # Fração do treino separada para validação
+# O split salvo é conferido pela data de modificação das suas pastas (um stat por
+# pasta, sem varrer o diretório). Uma imagem sobrescrita com o mesmo nome só é percebida
+# com verify_split (--verify-split): tamanho e data de cada arquivo, um stat por arquivo
+verify_split = False
+
+# 💾 Checkpoints e early stopping (--resume continua do último checkpoint)
+checkpoint_path = "checkpoint_oikos.pt"
+checkpoint_every = 1                       # Épocas entre checkpoints
+early_stopping_patience = 3                # Épocas sem melhora no F1 de validação antes de parar a fase
+early_stopping_min_delta = 0.001           # Melhora mínima de F1 considerada
+
+# 🎓 Destilação (--distill): aluno MobileNetV3-Small treinado com os soft labels
+# do modelo já treinado em model_path, para quiosques com CPU fraca
+student_model_path = "modelo_oikos_aluno.pt"
+student_torchscript_path = "modelo_oikos_aluno_ts.pt"
+student_onnx_path = "modelo_oikos_aluno.onnx"
+student_checkpoint_path = "checkpoint_oikos_aluno.pt"
+distill_epochs = 15
+distill_temperature = 4.0                  # Suaviza as distribuições de professor e aluno
+distill_alpha = 0.7                        # Peso do termo de destilação (o resto é cross-entropy com o rótulo)
+
+# 🗄️ Cache do dataset decodificado (uint8, memória mapeada)
+mmap_cache_dir = "dataset_cache"
+mmap_cache_size = 224                      # Lado das imagens guardadas no cache
+
+# 🧊 Features do backbone congelado (fase de transfer learning)
+feature_cache_dir = "features_cache"
+feature_augment_passes = 0                 # 0 = uma extração sem augmentation; N = N sementes de augmentation
 
 # 🧹 Transformações para treino (com data augmentation)
 train_transform = transforms.Compose([
@@ -34,37 +111,490 @@ test_transform = transforms.Compose([
                         std=[0.229, 0.224, 0.225])
 ])
 
-def prepare_data():
+# ================================================
+# 🌐 TREINO DISTRIBUÍDO
+# ================================================
+
+def setup_distributed(rank, world_size, port=None):
+    """
+    Inicializa o process group (gloo) e divide os núcleos entre os processos
+    """
+    os.environ.setdefault('MASTER_ADDR', '127.0.0.1')
+    if port is not None:
+        os.environ['MASTER_PORT'] = str(port)
+    dist.init_process_group(dist_backend, rank=rank, world_size=world_size)
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    
+    # Só o rank 0 escreve no terminal
+    if rank != 0:
+        builtin_print = builtins.print
+        builtins.print = lambda *args, force=False, **kwargs: builtin_print(*args, **kwargs) if force else None
+
+def cleanup_distributed():
+    if is_distributed():
+        dist.destroy_process_group()
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized()
+
+def is_main_process():
+    return not is_distributed() or dist.get_rank() == 0
+
+def free_port():
+    """
+    Porta livre em localhost para o rendezvous
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wrap_distributed(model):
+    """
+    Envolve em DDP (all-reduce dos gradientes) quando há process group
+    """
+    model = unwrap(model)
+    return DDP(model) if is_distributed() else model
+
+def unwrap(model):
+    return model.module if isinstance(model, DDP) else model
+
+def reduce_stats(*values):
+    """
+    Soma estatísticas (loss, acertos, amostras...) de todos os processos
+    """
+    if not is_distributed():
+        return values
+    tensor = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tuple(tensor.tolist())
+
+def set_loader_epoch(loader, epoch):
+    """
+    Reembaralha o shard de cada processo a cada época
+    """
+    if isinstance(loader.sampler, DistributedSampler):
+        loader.sampler.set_epoch(epoch)
+
+def evaluate_on_main(model, test_loader, classes, device, **kwargs):
+    """
+    Avalia só no rank 0 (os demais esperam na barreira)
+    """
+    result = (0.0, 0.0, None)
+    if is_main_process():
+        result = evaluate_model(unwrap(model), test_loader, classes, device, **kwargs)
+    if is_distributed():
+        dist.barrier()
+    return result
+
+def make_loader(dataset, shuffle, batch_size=batch_size, num_workers=num_workers, sampler=None):
+    """
+    Cria um DataLoader com workers paralelos, prefetch e memória fixada
+    """
+    options = {}
+    if num_workers > 0:
+        options = {'persistent_workers': persistent_workers, 'prefetch_factor': prefetch_factor}
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle and sampler is None, sampler=sampler,
+                      num_workers=num_workers, pin_memory=pin_memory, **options)
+
+def timed_batches(loader, stats):
+    """
+    Itera o loader acumulando em `stats` o tempo esperando dados e o tempo total
+    """
+    start = time.perf_counter()
+    iterator = iter(loader)
+    while True:
+        wait_start = time.perf_counter()
+        try:
+            batch = next(iterator)
+        except StopIteration:
+            break
+        stats['data'] = stats.get('data', 0.0) + time.perf_counter() - wait_start
+        yield batch
+    stats['total'] = stats.get('total', 0.0) + time.perf_counter() - start
+
+def log_pipeline_balance(stats):
+    """
+    Indica se a época foi limitada pela entrada (DataLoader) ou pela computação
+    """
+    total = stats.get('total', 0.0) or 1e-9
+    data_fraction = stats.get('data', 0.0) / total
+    if data_fraction > input_bound_threshold:
+        print(f"   - ⏳ Limitado pela ENTRADA: {data_fraction:.0%} do tempo esperando dados "
+              f"({total:.1f}s na época) -> aumente num_workers/prefetch_factor")
+    else:
+        print(f"   - ⚡ Limitado pela COMPUTAÇÃO: {data_fraction:.0%} do tempo esperando dados "
+              f"({total:.1f}s na época)")
+    return data_fraction
+
+class FileListDataset(datasets.VisionDataset):
+    """
+    Dataset no formato do ImageFolder (classes, targets, samples) a partir de
+    uma lista de arquivos já conhecida, sem percorrer o diretório
+    """
+    
+    def __init__(self, root, paths, targets, classes, transform=None):
+        super().__init__(root, transform=transform)
+        self.paths = list(paths)
+        self.targets = list(targets)
+        self.classes = list(classes)
+        self.class_to_idx = {name: i for i, name in enumerate(self.classes)}
+        self.samples = [(os.path.join(root, path), target) for path, target in zip(self.paths, self.targets)]
+    
+    def __len__(self):
+        return len(self.samples)
+    
+    def __getitem__(self, index):
+        path, target = self.samples[index]
+        image = default_loader(path)
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, target
+
+def load_datasets(use_mmap_cache=False, rebuild_cache=False, split=None, verify=verify_split):
+    """
+    Retorna o dataset completo com transformações de treino e de teste,
+    lendo do cache mmap (sem decodificar JPEG) ou das pastas de imagens.
+    Com um split salvo (já conferido contra data_dir por load_split), a lista
+    de arquivos vem dele (sem o ImageFolder)
+    """
+    if use_mmap_cache:
+        build_mmap_cache(data_dir, mmap_cache_dir, mmap_cache_size, rebuild=rebuild_cache, verify=verify)
+        return (MmapImageDataset(mmap_cache_dir, make_mmap_transform(True, mmap_cache_size)),
+                MmapImageDataset(mmap_cache_dir, make_mmap_transform(False, mmap_cache_size)))
+    
+    if split is not None:
+        paths, targets, classes = split['paths'], split['targets'], split['classes']
+    else:
+        # Uma única varredura do diretório, compartilhada pelos dois datasets
+        folder = datasets.ImageFolder(root=data_dir)
+        paths = [os.path.relpath(path, data_dir) for path, _ in folder.samples]
+        targets, classes = folder.targets, folder.classes
+    
+    return (FileListDataset(data_dir, paths, targets, classes, transform=train_transform),
+            FileListDataset(data_dir, paths, targets, classes, transform=test_transform))
+
+def stratified_split(targets, fraction=test_fraction, seed=split_seed):
+    """
+    Índices de treino e teste com a mesma proporção de cada classe nos dois conjuntos
+    """
+    targets = np.asarray(targets)
+    rng = np.random.default_rng(seed)
+    train_indices, test_indices = [], []
+    for label in np.unique(targets):
+        indices = rng.permutation(np.flatnonzero(targets == label))
+        num_test = int(round(len(indices) * fraction))
+        test_indices.extend(indices[:num_test].tolist())
+        train_indices.extend(indices[num_test:].tolist())
+    return sorted(train_indices), sorted(test_indices)
+
+def carve_validation(train_indices, targets, fraction=val_fraction, seed=split_seed):
+    """
+    Separa uma validação estratificada dos índices de treino (o teste fica intocado)
+    """
+    fit, val = stratified_split(np.asarray(targets)[train_indices], fraction, seed + 1)
+    return [train_indices[i] for i in fit], [train_indices[i] for i in val]
+
+def load_split(path=split_path, verify=verify_split):
+    """
+    Lê o split salvo se ele for deste data_dir e os arquivos não mudaram (ou None);
+    verify=True confere também cada arquivo (ver verify_split)
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        split = json.load(f)
+    if split.get('data_dir') != os.path.abspath(data_dir):
+        print(f"⚠️ '{path}' pertence a outro dataset ({split.get('data_dir')}), refazendo o split")
+        return None
+    if 'val' not in split:
+        print(f"⚠️ '{path}' não tem conjunto de validação, refazendo o split")
+        return None
+    if split.get('fingerprint') != folder_fingerprint(data_dir, split.get('folders', [])) or \
+            (verify and split.get('fingerprint_full') != dataset_fingerprint(data_dir)):
+        print(f"⚠️ Os arquivos de '{data_dir}' mudaram desde '{path}', refazendo o split")
+        return None
+    return split
+
+def save_split(dataset, path=split_path, fraction=test_fraction, seed=split_seed, verify=verify_split):
+    """
+    Gera o split estratificado para `dataset` e grava o arquivo de índices
+    (junto com a lista de arquivos, para as próximas execuções não varrerem o diretório)
+    """
+    train_indices, test_indices = stratified_split(dataset.targets, fraction, seed)
+    train_indices, val_indices = carve_validation(train_indices, dataset.targets, val_fraction, seed)
+    folders = image_folders(dataset.paths)
+    split = {
+        'data_dir': os.path.abspath(data_dir),
+        'folders': folders,
+        'fingerprint': folder_fingerprint(data_dir, folders),
+        'fingerprint_full': dataset_fingerprint(data_dir) if verify else None,
+        'seed': seed,
+        'test_fraction': fraction,
+        'val_fraction': val_fraction,
+        'classes': list(dataset.classes),
+        'paths': list(dataset.paths),
+        'targets': [int(t) for t in dataset.targets],
+        'train': train_indices,
+        'val': val_indices,
+        'test': test_indices
+    }
+    # Só o rank 0 grava; os demais calculam o mesmo split (determinístico)
+    if is_main_process():
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(split, f)
+        os.replace(path + '.tmp', path)
+        print(f"🔀 Split estratificado salvo em '{path}'")
+    return split
+
+def autocast(device, enabled):
+    """
+    autocast em bfloat16 na CPU e float16 na GPU
+    """
+    dtype = torch.float16 if device.type == 'cuda' else torch.bfloat16
+    return torch.autocast(device_type=device.type, dtype=dtype, enabled=enabled)
+
+def make_grad_scaler(device, enabled):
+    """
+    GradScaler só é necessário com float16 (GPU); bfloat16 tem a faixa do float32
+    """
+    return torch.amp.GradScaler(device.type, enabled=enabled and device.type == 'cuda')
+
+def to_device(inputs, labels, device, channels_last=False):
+    """
+    Copia o lote para o device, em NHWC se channels_last
+    """
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    return (inputs.to(device, non_blocking=True, memory_format=memory_format),
+            labels.to(device, non_blocking=True))
+
+def train_step(model, inputs, labels, criterion, optimizer, scaler, device, amp=False):
+    """
+    Um passo de otimização; com scaler desabilitado equivale ao passo FP32 comum
+    """
+    optimizer.zero_grad()
+    with autocast(device, amp):
+        outputs = model(inputs)
+        loss = criterion(outputs, labels)
+    scaler.scale(loss).backward()
+    scaler.step(optimizer)
+    scaler.update()
+    return outputs, loss
+
+# ================================================
+# 💾 CHECKPOINTS E EARLY STOPPING
+# ================================================
+
+def capture_rng_state():
     """
-    Prepara e divide os dados em treino e teste (80/20)
+    Estado de todos os geradores aleatórios usados no treino
+    """
+    state = {'torch': torch.get_rng_state(), 'numpy': np.random.get_state(), 'python': random.getstate()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state):
+    torch.set_rng_state(state['torch'])
+    np.random.set_state(state['numpy'])
+    random.setstate(state['python'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+def load_checkpoint(path=checkpoint_path):
+    """
+    Lê um checkpoint salvo por TrainingTracker (ou None se não existir)
+    """
+    if not os.path.exists(path):
+        return None
+    # weights_only=False: o checkpoint guarda estados de RNG (numpy/python)
+    return torch.load(path, map_location='cpu', weights_only=False)
+
+class TrainingTracker:
+    """
+    Avalia o modelo na validação ao fim de cada época, guarda o melhor pelo
+    F1, interrompe a fase quando o F1 para de melhorar e grava checkpoints
+    periódicos (modelo, otimizador, época, RNG e índices treino/validação/teste)
+    para retomar o treino. O conjunto de teste nunca passa por aqui.
+    """
+    
+    PHASES = ['frozen', 'fine_tune', 'distill']
+    
+    def __init__(self, val_loader, classes, device, split_indices, checkpoint=None,
+                 path=checkpoint_path, patience=early_stopping_patience, min_delta=early_stopping_min_delta):
+        self.val_loader = val_loader
+        self.classes = classes
+        self.device = device
+        self.split_indices = split_indices
+        self.path = path
+        self.patience = patience
+        self.min_delta = min_delta
+        self.checkpoint = checkpoint
+        
+        self.best_f1 = -1.0
+        self.best_state = None
+        self.bad_epochs = 0
+        self.history = {phase: [] for phase in self.PHASES}
+        if checkpoint:
+            self.best_f1 = checkpoint['best_f1']
+            self.best_state = checkpoint['best_state']
+            self.history = checkpoint['history']
+    
+    def start_phase(self, phase, model, optimizer, scaler):
+        """
+        Restaura o estado do checkpoint se ele for desta fase e retorna a
+        primeira época a executar (None se a fase já foi concluída)
+        """
+        self.bad_epochs = 0
+        if not self.checkpoint:
+            return 0
+        
+        saved = self.PHASES.index(self.checkpoint['phase'])
+        current = self.PHASES.index(phase)
+        unwrap(model).load_state_dict(self.checkpoint['model'])
+        if saved > current or (saved == current and self.checkpoint['phase_done']):
+            return None
+        if saved < current:
+            return 0
+        
+        optimizer.load_state_dict(self.checkpoint['optimizer'])
+        scaler.load_state_dict(self.checkpoint['scaler'])
+        restore_rng_state(self.checkpoint['rng'])
+        self.bad_epochs = self.checkpoint['bad_epochs']
+        print(f"↩️ Retomando fase '{phase}' na época {self.checkpoint['epoch'] + 1}")
+        return self.checkpoint['epoch']
+    
+    def end_epoch(self, phase, epoch, model, optimizer, scaler, train_loss):
+        """
+        Avalia, atualiza o melhor modelo e salva o checkpoint; retorna True para parar a fase
+        """
+        accuracy, f1, _ = evaluate_on_main(model, self.val_loader, self.classes, self.device,
+                                           plot=False, report=False)
+        model.train()
+        self.history[phase].append({'epoch': epoch, 'train_loss': train_loss, 'val_accuracy': accuracy,
+                                    'val_f1': f1})
+        
+        if is_main_process():
+            if f1 > self.best_f1 + self.min_delta:
+                self.best_f1 = f1
+                self.best_state = {k: v.detach().cpu().clone() for k, v in unwrap(model).state_dict().items()}
+                self.bad_epochs = 0
+                print(f"   - ⭐ Melhor F1 de validação até agora: {f1:.4f}")
+            else:
+                self.bad_epochs += 1
+                print(f"   - F1 de validação {f1:.4f} sem melhora ({self.bad_epochs}/{self.patience})")
+        
+        # A decisão do rank 0 vale para todos os processos
+        stop = reduce_stats(float(is_main_process() and self.bad_epochs >= self.patience))[0] > 0
+        if stop:
+            print(f"⏹️ Early stopping na fase '{phase}' (época {epoch + 1})")
+        
+        if stop or (epoch + 1) % checkpoint_every == 0:
+            self.save(phase, epoch + 1, model, optimizer, scaler, phase_done=stop)
+        return stop
+    
+    def phase_best(self, phase):
+        """
+        (acurácia, F1) de validação da melhor época da fase, ou None se ela não
+        teve épocas; vem do histórico, então vale também em uma retomada
+        """
+        history = self.history.get(phase)
+        if not history:
+            return None
+        best = max(history, key=lambda h: h['val_f1'])
+        return best.get('val_accuracy', float('nan')), best['val_f1']
+    
+    def end_phase(self, phase, model, optimizer, scaler):
+        """
+        Marca a fase como concluída e volta aos pesos do melhor modelo
+        """
+        self.restore_best(model)
+        self.save(phase, None, model, optimizer, scaler, phase_done=True)
+    
+    def restore_best(self, model):
+        state = [self.best_state]
+        if is_distributed():
+            dist.broadcast_object_list(state, src=0)
+        if state[0] is not None:
+            unwrap(model).load_state_dict(state[0])
+            print(f"🏆 Usando o melhor modelo (F1 de validação {self.best_f1:.4f})")
+    
+    def save(self, phase, epoch, model, optimizer, scaler, phase_done=False):
+        if not is_main_process():
+            return
+        checkpoint = {
+            'phase': phase,
+            'epoch': epoch,
+            'phase_done': phase_done,
+            'model': unwrap(model).state_dict(),
+            'optimizer': optimizer.state_dict(),
+            'scaler': scaler.state_dict(),
+            'rng': capture_rng_state(),
+            'split_indices': self.split_indices,
+            'best_f1': self.best_f1,
+            'best_state': self.best_state,
+            'bad_epochs': self.bad_epochs,
+            'history': self.history
+        }
+        # Escrita atômica: uma interrupção no meio não corrompe o último checkpoint
+        torch.save(checkpoint, self.path + '.tmp')
+        os.replace(self.path + '.tmp', self.path)
+
+def prepare_data(batch_size=batch_size, num_workers=num_workers, use_mmap_cache=False, rebuild_cache=False,
+                 split_indices=None, rebuild_split=False, verify=verify_split):
+    """
+    Prepara e divide os dados em treino, validação e teste (teste 20%, validação
+    10% do treino, estratificado e salvo em split_path)
     """
     print("📥 Carregando dataset...")
     
+    # Split salvo: mesmas imagens de teste em todas as execuções (load_split
+    # descarta o split se algum arquivo de data_dir mudou)
+    split = None if rebuild_split else load_split(verify=verify)
+    
     # Carregar dataset completo
-    full_dataset = datasets.ImageFolder(root=data_dir, transform=train_transform)
+    full_dataset, eval_dataset = load_datasets(use_mmap_cache, rebuild_cache, split, verify)
+    # O cache mmap traz a própria lista de arquivos, que pode ser de outra versão do dataset
+    if split is not None and split['paths'] != list(full_dataset.paths):
+        print(f"⚠️ Os arquivos do cache diferem de '{split_path}', refazendo o split")
+        split = None
+    if split is None:
+        # Os índices de um checkpoint apontam para a lista de arquivos antiga
+        if split_indices is not None:
+            raise ValueError("Os arquivos do dataset mudaram desde o checkpoint: recomece sem --resume")
+        split = save_split(full_dataset, verify=verify)
     
-    # Calcular tamanhos para split 80/20
+    # Índices do checkpoint (retomada) têm prioridade
+    if split_indices is not None and len(split_indices) != 3:
+        raise ValueError("Checkpoint sem conjunto de validação (formato antigo): recomece sem --resume")
+    train_indices, val_indices, test_indices = (split_indices if split_indices is not None
+                                                else (split['train'], split['val'], split['test']))
     total_size = len(full_dataset)
-    train_size = int(0.8 * total_size)
-    test_size = total_size - train_size
+    train_size, val_size, test_size = len(train_indices), len(val_indices), len(test_indices)
     
-    # Dividir dataset
-    train_dataset, test_dataset = random_split(full_dataset, [train_size, test_size])
-    
-    # Aplicar transformações específicas para teste
-    test_dataset.dataset = datasets.ImageFolder(root=data_dir, transform=test_transform)
+    # Validação e teste sem augmentation
+    train_dataset = Subset(full_dataset, train_indices)
+    val_dataset = Subset(eval_dataset, val_indices)
+    test_dataset = Subset(eval_dataset, test_indices)
     
     # Criar DataLoaders
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-    test_loader = DataLoader(test_dataset, batch_size=batch_size, shuffle=False)
+    # Cada processo treina no seu shard do conjunto de treino
+    sampler = DistributedSampler(train_dataset, shuffle=True, seed=split_seed) if is_distributed() else None
+    train_loader = make_loader(train_dataset, shuffle=True, batch_size=batch_size, num_workers=num_workers,
+                               sampler=sampler)
+    val_loader = make_loader(val_dataset, shuffle=False, batch_size=batch_size, num_workers=num_workers)
+    test_loader = make_loader(test_dataset, shuffle=False, batch_size=batch_size, num_workers=num_workers)
     
     print(f"✅ Dataset carregado:")
     print(f"   - Total de amostras: {total_size}")
     print(f"   - Treino: {train_size} amostras")
+    print(f"   - Validação: {val_size} amostras")
     print(f"   - Teste: {test_size} amostras")
     print(f"   - Classes: {full_dataset.classes}")
+    print(f"   - Lote: {batch_size} | Workers: {num_workers} | Pin memory: {pin_memory}")
+    if is_distributed():
+        print(f"   - Processos: {dist.get_world_size()} (lote global: {batch_size * dist.get_world_size()})")
     
-    return train_loader, test_loader, full_dataset.classes
+    return train_loader, val_loader, test_loader, full_dataset.classes
 
 def create_model(num_classes):
     """
@@ -85,31 +615,35 @@ def create_model(num_classes):
     print(f"✅ Modelo configurado para {num_classes} classes")
     return model
 
-def train_model(model, train_loader, criterion, optimizer, device):
+def train_model(model, train_loader, criterion, optimizer, device, amp=use_amp, channels_last=use_channels_last,
+                tracker=None, epochs=None):
     """
     Treina o modelo e retorna histórico de loss
     """
-    model.train()
+    epochs = epochs or num_epochs
     train_losses = []
+    scaler = make_grad_scaler(device, amp)
+    start_epoch = tracker.start_phase('frozen', model, optimizer, scaler) if tracker else 0
+    if start_epoch is None:
+        print("⏭️ Fase congelada já concluída no checkpoint")
+        return [h['train_loss'] for h in tracker.history['frozen']]
     
     print("🚀 Iniciando treinamento...")
     
-    for epoch in range(num_epochs):
+    for epoch in range(start_epoch, epochs):
+        model.train()
         running_loss = 0.0
         correct_predictions = 0
         total_samples = 0
+        pipeline_stats = {}
+        set_loader_epoch(train_loader, epoch)
+        epoch_start = time.perf_counter()
         
-        for batch_idx, (inputs, labels) in enumerate(train_loader):
-            inputs, labels = inputs.to(device), labels.to(device)
+        for batch_idx, (inputs, labels) in enumerate(timed_batches(train_loader, pipeline_stats)):
+            inputs, labels = to_device(inputs, labels, device, channels_last)
             
-            # Forward pass
-            optimizer.zero_grad()
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
-            
-            # Backward pass
-            loss.backward()
-            optimizer.step()
+            # Forward + backward pass
+            outputs, loss = train_step(model, inputs, labels, criterion, optimizer, scaler, device, amp)
             
             # Estatísticas
             running_loss += loss.item()
@@ -121,153 +655,716 @@ def train_model(model, train_loader, criterion, optimizer, device):
             if batch_idx % 10 == 0:
                 print(f"   Batch [{batch_idx}/{len(train_loader)}] - Loss: {loss.item():.4f}")
         
-        # Métricas da época
-        epoch_loss = running_loss / len(train_loader)
+        # Métricas da época (somadas entre os processos quando distribuído)
+        running_loss, num_batches, correct_predictions, total_samples = reduce_stats(
+            running_loss, len(train_loader), correct_predictions, total_samples)
+        epoch_loss = running_loss / num_batches
         epoch_acc = 100 * correct_predictions / total_samples
         train_losses.append(epoch_loss)
         
-        print(f"Época [{epoch+1}/{num_epochs}]:")
+        print(f"Época [{epoch+1}/{epochs}]:")
+        print(f"   - Loss: {epoch_loss:.4f}")
+        print(f"   - Acurácia Treino: {epoch_acc:.2f}%")
+        print(f"   - Vazão: {total_samples / (time.perf_counter() - epoch_start):.1f} imagens/s")
+        log_pipeline_balance(pipeline_stats)
+        
+        if tracker and tracker.end_epoch('frozen', epoch, model, optimizer, scaler, epoch_loss):
+            break
+        print()
+    
+    if tracker:
+        tracker.end_phase('frozen', model, optimizer, scaler)
+        return [h['train_loss'] for h in tracker.history['frozen']]
+    return train_losses
+
+def feature_cache_key(train_dataset, seed):
+    """
+    Identifica as features de um split e semente de augmentation. A origem
+    entra pelo conteúdo: o arquivo do cache mmap (regravado a cada geração) ou
+    o fingerprint de data_dir (caminhos, tamanhos e datas de cada imagem;
+    só roda com --cached-features, cuja extração custa bem mais)
+    """
+    full_dataset = train_dataset.dataset
+    if isinstance(full_dataset, MmapImageDataset):
+        images = os.path.join(full_dataset.cache_dir, 'images.u8')
+        info = os.stat(images)
+        source = f"{os.path.abspath(images)}|{info.st_size}|{info.st_mtime_ns}"
+    else:
+        source = f"{os.path.abspath(full_dataset.root)}|{dataset_fingerprint(full_dataset.root)}"
+    h = hashlib.sha1()
+    h.update(f"efficientnet_b0-imagenet|{source}|{len(full_dataset)}|{seed}".encode())
+    h.update(np.asarray(train_dataset.indices, dtype=np.int64).tobytes())
+    return h.hexdigest()[:16]
+
+def extract_features(model, dataset, eval_dataset, device, seed=None):
+    """
+    Forward só do backbone (features + avgpool), com cache em disco.
+    seed=None usa as mesmas amostras de `eval_dataset` (sem augmentation).
+    """
+    os.makedirs(feature_cache_dir, exist_ok=True)
+    path = os.path.join(feature_cache_dir, f"{'noaug' if seed is None else f'seed{seed}'}_"
+                                           f"{feature_cache_key(dataset, seed)}.pt")
+    if os.path.exists(path):
+        cached = torch.load(path)
+        return cached['features'], cached['labels']
+    
+    if seed is None:
+        # Mesmas amostras, mas do dataset sem augmentation
+        dataset = Subset(eval_dataset, dataset.indices)
+    else:
+        torch.manual_seed(seed)
+    
+    loader = make_loader(dataset, shuffle=False)
+    backbone = nn.Sequential(model.features, model.avgpool, nn.Flatten()).eval()
+    all_features, all_labels = [], []
+    
+    start = time.perf_counter()
+    with torch.no_grad():
+        for inputs, labels in loader:
+            all_features.append(backbone(inputs.to(device, non_blocking=True)).cpu())
+            all_labels.append(labels)
+    
+    features, labels = torch.cat(all_features), torch.cat(all_labels)
+    torch.save({'features': features, 'labels': labels}, path)
+    print(f"   🧊 Features extraídas ({'sem augmentation' if seed is None else f'semente {seed}'}): "
+          f"{tuple(features.shape)} em {time.perf_counter() - start:.1f}s -> '{path}'")
+    return features, labels
+
+def train_head_cached(model, train_loader, eval_dataset, criterion, optimizer, device,
+                      augment_passes=feature_augment_passes, epochs=None, tracker=None):
+    """
+    Fase congelada rápida: extrai as features do backbone uma vez (por semente
+    de augmentation) e treina só o classificador sobre os tensores em cache.
+    Com `tracker`, cada época passa pela validação, checkpoint e early stopping
+    como em train_model (fase 'frozen')
+    """
+    epochs = epochs or num_epochs
+    scaler = make_grad_scaler(device, False)
+    start_epoch = tracker.start_phase('frozen', model, optimizer, scaler) if tracker else 0
+    if start_epoch is None:
+        print("⏭️ Fase congelada já concluída no checkpoint")
+        return [h['train_loss'] for h in tracker.history['frozen']]
+    
+    print("🚀 Iniciando treinamento do classificador sobre features em cache...")
+    
+    seeds = list(range(augment_passes)) or [None]
+    cached = [extract_features(model, train_loader.dataset, eval_dataset, device, seed) for seed in seeds]
+    
+    train_losses = []
+    
+    for epoch in range(start_epoch, epochs):
+        model.classifier.train()
+        # Cada época usa uma das extrações com augmentation (ou a única sem)
+        features, labels = cached[epoch % len(cached)]
+        order = torch.randperm(len(labels))
+        running_loss = 0.0
+        correct_predictions = 0
+        num_batches = 0
+        start = time.perf_counter()
+        
+        for i in range(0, len(order), train_loader.batch_size):
+            batch = order[i:i + train_loader.batch_size]
+            inputs, targets = features[batch].to(device), labels[batch].to(device)
+            
+            optimizer.zero_grad()
+            outputs = model.classifier(inputs)
+            loss = criterion(outputs, targets)
+            loss.backward()
+            optimizer.step()
+            
+            running_loss += loss.item()
+            correct_predictions += (outputs.argmax(1) == targets).sum().item()
+            num_batches += 1
+        
+        epoch_loss = running_loss / num_batches
+        train_losses.append(epoch_loss)
+        
+        print(f"Época [{epoch+1}/{epochs}]:")
         print(f"   - Loss: {epoch_loss:.4f}")
-        print(f"   - Acurácia Treino: {epoch_acc:.2f}%\n")
+        print(f"   - Acurácia Treino: {100 * correct_predictions / len(labels):.2f}%")
+        print(f"   - Tempo: {time.perf_counter() - start:.2f}s")
+        
+        if tracker and tracker.end_epoch('frozen', epoch, model, optimizer, scaler, epoch_loss):
+            break
+        print()
     
+    if tracker:
+        tracker.end_phase('frozen', model, optimizer, scaler)
+        return [h['train_loss'] for h in tracker.history['frozen']]
     return train_losses
 
-def evaluate_model(model, test_loader, classes, device):
+class StreamingMetrics:
+    """
+    Matriz de confusão acumulada lote a lote (bincount no próprio device) e
+    as métricas derivadas dela: memória constante e uma única passada nos dados
+    """
+    
+    def __init__(self, num_classes, device=None):
+        self.num_classes = num_classes
+        self.counts = torch.zeros(num_classes * num_classes, dtype=torch.int64, device=device)
+    
+    def update(self, labels, predicted):
+        # Linha = classe real, coluna = predição
+        self.counts += torch.bincount(labels * self.num_classes + predicted, minlength=self.num_classes ** 2)
+    
+    @property
+    def matrix(self):
+        return self.counts.view(self.num_classes, self.num_classes).cpu().numpy()
+    
+    def summary(self):
+        """
+        Acurácia, precisão/recall/F1 por classe, suporte e F1 ponderado
+        (classes sem amostras ou sem predições valem 0, sem erro)
+        """
+        cm = self.matrix.astype(np.float64)
+        correct = np.diag(cm)
+        support = cm.sum(axis=1)
+        predicted = cm.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.nan_to_num(correct / predicted)
+            recall = np.nan_to_num(correct / support)
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        total = support.sum()
+        return {
+            'accuracy': correct.sum() / total if total else 0.0,
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+            'support': support.astype(np.int64),
+            'weighted_f1': (f1 * support).sum() / total if total else 0.0
+        }
+    
+    def report(self, classes):
+        """
+        Relatório por classe no formato do classification_report
+        """
+        m = self.summary()
+        width = max(len(name) for name in [*classes, 'weighted avg']) + 2
+        lines = [f"{'':>{width}} {'precision':>10} {'recall':>10} {'f1-score':>10} {'support':>10}", ""]
+        for i, name in enumerate(classes):
+            lines.append(f"{name:>{width}} {m['precision'][i]:>10.2f} {m['recall'][i]:>10.2f} "
+                         f"{m['f1'][i]:>10.2f} {m['support'][i]:>10d}")
+        total = m['support'].sum()
+        weights = m['support'] / total if total else np.zeros(len(classes))
+        lines += [
+            "",
+            f"{'accuracy':>{width}} {'':>10} {'':>10} {m['accuracy']:>10.2f} {total:>10d}",
+            f"{'macro avg':>{width}} {m['precision'].mean():>10.2f} {m['recall'].mean():>10.2f} "
+            f"{m['f1'].mean():>10.2f} {total:>10d}",
+            f"{'weighted avg':>{width}} {(m['precision'] * weights).sum():>10.2f} "
+            f"{(m['recall'] * weights).sum():>10.2f} {m['weighted_f1']:>10.2f} {total:>10d}"
+        ]
+        return "\n".join(lines)
+
+def plot_confusion_matrix(matrix, classes, path='confusion_matrix.png'):
+    """
+    Salva a matriz de confusão em arquivo (sem abrir janela)
+    """
+    fig = plt.figure(figsize=(10, 8))
+    sns.heatmap(matrix, annot=True, fmt='d', cmap='Blues', 
+                xticklabels=classes, yticklabels=classes)
+    plt.title('Matriz de Confusão')
+    plt.xlabel('Predição')
+    plt.ylabel('Real')
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    print(f"🖼️ Matriz de confusão salva em '{path}'")
+
+def evaluate_model(model, test_loader, classes, device, plot=True, report=True):
     """
     Avalia o modelo no conjunto de teste e calcula métricas
     """
     model.eval()
-    all_predictions = []
-    all_labels = []
+    metrics = StreamingMetrics(len(classes), device)
     
-    print("🔍 Avaliando modelo no conjunto de teste...")
+    print("🔍 Avaliando modelo...")
     
     with torch.no_grad():
         for inputs, labels in test_loader:
             inputs, labels = inputs.to(device), labels.to(device)
             outputs = model(inputs)
-            _, predicted = torch.max(outputs, 1)
-            
-            all_predictions.extend(predicted.cpu().numpy())
-            all_labels.extend(labels.cpu().numpy())
+            metrics.update(labels, outputs.argmax(1))
     
     # Calcular métricas
-    accuracy = accuracy_score(all_labels, all_predictions)
-    f1 = f1_score(all_labels, all_predictions, average='weighted')
+    summary = metrics.summary()
+    accuracy, f1 = float(summary['accuracy']), float(summary['weighted_f1'])
     
     print("📊 Resultados da Avaliação:")
     print(f"   - Acurácia: {accuracy:.4f} ({accuracy*100:.2f}%)")
     print(f"   - F1-Score: {f1:.4f}")
     
     # Relatório detalhado
-    print("\n📋 Relatório de Classificação:")
-    print(classification_report(all_labels, all_predictions, target_names=classes))
+    if report:
+        print("\n📋 Relatório de Classificação:")
+        print(metrics.report(classes))
     
     # Matriz de confusão
-    cm = confusion_matrix(all_labels, all_predictions)
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
-                xticklabels=classes, yticklabels=classes)
-    plt.title('Matriz de Confusão')
-    plt.xlabel('Predição')
-    plt.ylabel('Real')
-    plt.tight_layout()
-    plt.savefig('confusion_matrix.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    if plot:
+        plot_confusion_matrix(metrics.matrix, classes)
     
-    return accuracy, f1, all_predictions, all_labels
+    return accuracy, f1, metrics
+
+def unfreeze_backbone(model, blocks=3):
+    """
+    Libera para treino os últimos `blocks` blocos do backbone
+    """
+    for param in unwrap(model).features[-blocks:].parameters():
+        param.requires_grad = True
 
-def fine_tune_model(model, train_loader, test_loader, classes, device):
+def fine_tune_model(model, train_loader, device, amp=use_amp, channels_last=use_channels_last,
+                    tracker=None, lr=fine_tune_learning_rate, epochs=fine_tune_epochs):
     """
-    Fine-tuning: descongelar algumas camadas e treinar com learning rate menor
+    Fine-tuning: descongelar algumas camadas e treinar com learning rate menor;
+    retorna o histórico de loss
     """
     print("🔧 Iniciando fine-tuning...")
     
     # Descongelar últimas camadas do backbone
-    for param in model.features[-3:].parameters():
-        param.requires_grad = True
+    unfreeze_backbone(model)
+    
+    # O DDP só sincroniza os parâmetros treináveis de quando foi criado
+    model = wrap_distributed(model)
     
     # Novo otimizador com learning rate menor
-    optimizer_ft = optim.Adam(model.parameters(), lr=0.0001)
+    optimizer_ft = optim.Adam(model.parameters(), lr=lr)
     criterion = nn.CrossEntropyLoss()
+    scaler = make_grad_scaler(device, amp)
+    start_epoch = tracker.start_phase('fine_tune', model, optimizer_ft, scaler) if tracker else 0
     
     # Treinar por mais algumas épocas
-    for epoch in range(3):
+    train_losses = []
+    for epoch in range(start_epoch if start_epoch is not None else epochs, epochs):
         model.train()
         running_loss = 0.0
+        pipeline_stats = {}
+        set_loader_epoch(train_loader, epoch)
         
-        for inputs, labels in train_loader:
-            inputs, labels = inputs.to(device), labels.to(device)
+        for inputs, labels in timed_batches(train_loader, pipeline_stats):
+            inputs, labels = to_device(inputs, labels, device, channels_last)
             
-            optimizer_ft.zero_grad()
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer_ft.step()
+            _, loss = train_step(model, inputs, labels, criterion, optimizer_ft, scaler, device, amp)
             
             running_loss += loss.item()
         
-        print(f"Fine-tuning Época [{epoch+1}/3] - Loss: {running_loss/len(train_loader):.4f}")
+        running_loss, num_batches = reduce_stats(running_loss, len(train_loader))
+        epoch_loss = running_loss / num_batches
+        train_losses.append(epoch_loss)
+        print(f"Fine-tuning Época [{epoch+1}/{epochs}] - Loss: {epoch_loss:.4f}")
+        log_pipeline_balance(pipeline_stats)
+        
+        if tracker and tracker.end_epoch('fine_tune', epoch, model, optimizer_ft, scaler, epoch_loss):
+            break
+    
+    if tracker:
+        tracker.end_phase('fine_tune', model, optimizer_ft, scaler)
+        return [h['train_loss'] for h in tracker.history['fine_tune']]
+    return train_losses
+
+# ================================================
+# 🎓 DESTILAÇÃO
+# ================================================
+
+def create_student(num_classes):
+    """
+    Cria o aluno MobileNetV3-Small pré-treinado (todas as camadas treináveis)
+    """
+    print("🧠 Configurando aluno MobileNetV3-Small...")
+    model = models.mobilenet_v3_small(pretrained=True)
+    model.classifier[3] = nn.Linear(model.classifier[3].in_features, num_classes)
+    print(f"✅ Aluno configurado para {num_classes} classes")
+    return model
+
+def load_teacher(num_classes, device, path=model_path):
+    """
+    Carrega o EfficientNet-B0 treinado (congelado, em modo de avaliação)
+    """
+    model = models.efficientnet_b0(weights=None)
+    model.classifier[1] = nn.Linear(model.classifier[1].in_features, num_classes)
+    model.load_state_dict(torch.load(path, map_location='cpu'))
+    for param in model.parameters():
+        param.requires_grad = False
+    print(f"👩‍🏫 Professor carregado de '{path}'")
+    return model.to(device).eval()
+
+def distillation_loss(student_logits, labels, teacher_logits, temperature=distill_temperature,
+                      alpha=distill_alpha):
+    """
+    KL entre as distribuições suavizadas (escalada por T²) + cross-entropy com o rótulo
+    """
+    soft = nn.functional.kl_div(
+        nn.functional.log_softmax(student_logits / temperature, dim=1),
+        nn.functional.log_softmax(teacher_logits.float() / temperature, dim=1),
+        reduction='batchmean', log_target=True
+    ) * temperature ** 2
+    hard = nn.functional.cross_entropy(student_logits, labels)
+    return alpha * soft + (1 - alpha) * hard
+
+def distill_model(student, teacher, train_loader, optimizer, device, epochs=distill_epochs,
+                  temperature=distill_temperature, alpha=distill_alpha, amp=use_amp,
+                  channels_last=use_channels_last, tracker=None):
+    """
+    Treina o aluno com os soft labels do professor (calculados no mesmo lote
+    com augmentation) e retorna o histórico de loss
+    """
+    scaler = make_grad_scaler(device, amp)
+    start_epoch = tracker.start_phase('distill', student, optimizer, scaler) if tracker else 0
+    if start_epoch is None:
+        print("⏭️ Destilação já concluída no checkpoint")
+        return [h['train_loss'] for h in tracker.history['distill']]
+    
+    print("🎓 Iniciando destilação...")
+    train_losses = []
+    
+    for epoch in range(start_epoch, epochs):
+        student.train()
+        running_loss = 0.0
+        pipeline_stats = {}
+        set_loader_epoch(train_loader, epoch)
+        
+        for inputs, labels in timed_batches(train_loader, pipeline_stats):
+            inputs, labels = to_device(inputs, labels, device, channels_last)
+            
+            with torch.no_grad(), autocast(device, amp):
+                teacher_logits = teacher(inputs)
+            criterion = functools.partial(distillation_loss, teacher_logits=teacher_logits,
+                                          temperature=temperature, alpha=alpha)
+            _, loss = train_step(student, inputs, labels, criterion, optimizer, scaler, device, amp)
+            
+            running_loss += loss.item()
+        
+        running_loss, num_batches = reduce_stats(running_loss, len(train_loader))
+        epoch_loss = running_loss / num_batches
+        train_losses.append(epoch_loss)
+        print(f"Destilação Época [{epoch+1}/{epochs}] - Loss: {epoch_loss:.4f}")
+        log_pipeline_balance(pipeline_stats)
+        
+        if tracker and tracker.end_epoch('distill', epoch, student, optimizer, scaler, epoch_loss):
+            break
+    
+    if tracker:
+        tracker.end_phase('distill', student, optimizer, scaler)
+        return [h['train_loss'] for h in tracker.history['distill']]
+    return train_losses
+
+def export_torchscript(model, path=torchscript_path):
+    """
+    Exporta o modelo como TorchScript congelado para inferência em CPU.
+    O optimize_for_inference é aplicado na carga (inferencia_torch.carregar_torchscript),
+    pois o grafo otimizado não pode ser serializado.
+    """
+    print("📦 Exportando modelo TorchScript...")
+    
+    # Exportar uma cópia em CPU para não alterar o modelo em treino
+    model_cpu = copy.deepcopy(model).cpu().eval()
+    example = torch.randn(1, 3, 224, 224)
+    
+    with torch.no_grad():
+        traced = torch.jit.trace(model_cpu, example)
+        frozen = torch.jit.freeze(traced)
+        
+        # Conferir que o artefato reproduz o modelo original
+        diff = (frozen(example) - model_cpu(example)).abs().max().item()
+    
+    frozen.save(path)
+    print(f"✅ TorchScript salvo como '{path}' (diferença máx.: {diff:.2e})")
+    return path
+
+def export_onnx(model, path=onnx_path):
+    """
+    Exporta o modelo em ONNX (lote dinâmico) para o backend ONNX Runtime
+    """
+    print("📦 Exportando modelo ONNX...")
+    
+    model_cpu = copy.deepcopy(model).cpu().eval()
+    example = torch.randn(2, 3, 224, 224)
+    
+    torch.onnx.export(
+        model_cpu, example, path,
+        input_names=['imagens'], output_names=['logits'],
+        dynamic_axes={'imagens': {0: 'lote'}, 'logits': {0: 'lote'}},
+        opset_version=17, dynamo=False
+    )
+    
+    # Conferir paridade com o PyTorch se o ONNX Runtime estiver instalado
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        print(f"✅ ONNX salvo como '{path}' (onnxruntime ausente, paridade não verificada)")
+        return path
+    
+    session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    with torch.no_grad():
+        expected = model_cpu(example).numpy()
+    diff = np.abs(session.run(None, {'imagens': example.numpy()})[0] - expected).max()
+    print(f"✅ ONNX salvo como '{path}' (diferença máx. para PyTorch: {diff:.2e})")
+    return path
+
+def make_calibration_loader(train_loader, test_loader, num_samples=num_calibration_samples):
+    """
+    Cria um DataLoader de calibração com um subconjunto do treino, sem augmentation
+    """
+    # O dataset do teste cobre todas as amostras com as transformações sem augmentation
+    indices = train_loader.dataset.indices[:num_samples]
+    calibration_dataset = Subset(test_loader.dataset.dataset, indices)
+    return make_loader(calibration_dataset, shuffle=False, batch_size=train_loader.batch_size)
+
+def quantize_model(model, calibration_loader):
+    """
+    Quantização estática pós-treino (INT8, FX graph mode) para inferência em CPU
+    """
+    print("🗜️ Quantizando modelo para INT8...")
+    
+    engine = 'x86' if 'x86' in torch.backends.quantized.supported_engines else 'qnnpack'
+    torch.backends.quantized.engine = engine
+    
+    model_cpu = copy.deepcopy(model).cpu().eval()
+    example = (torch.randn(1, 3, 224, 224),)
+    prepared = prepare_fx(model_cpu, get_default_qconfig_mapping(engine), example)
+    
+    # Calibrar observadores com dados reais
+    with torch.no_grad():
+        for inputs, _ in calibration_loader:
+            prepared(inputs)
+    
+    quantized = convert_fx(prepared)
+    print(f"✅ Modelo quantizado (engine: {engine}, {len(calibration_loader.dataset)} amostras de calibração)")
+    return quantized
+
+def export_quantized(quantized, path=quantized_path):
+    """
+    Salva o modelo INT8 como TorchScript (o state dict quantizado depende do grafo FX)
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, torch.randn(1, 3, 224, 224))
+    traced.save(path)
+    print(f"✅ Modelo INT8 salvo como '{path}'")
+    return path
+
+def measure_latency(model, batch, repetitions=20):
+    """
+    Mede a latência média (ms) de um forward pass em CPU
+    """
+    with torch.no_grad():
+        for _ in range(3):
+            model(batch)
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            model(batch)
+    return (time.perf_counter() - start) / repetitions * 1000
+
+def model_size_mb(model):
+    """
+    Tamanho serializado dos pesos em MB
+    """
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+def compare_models(base_name, base, other_name, other, test_loader, classes, title):
+    """
+    Relatório lado a lado em CPU: acurácia, F1, latência e tamanho do modelo
+    """
+    print(f"📊 Comparando {base_name} x {other_name} (CPU)...")
+    cpu = torch.device("cpu")
+    
+    acc_base, f1_base, _ = evaluate_model(base, test_loader, classes, cpu, plot=False)
+    acc_other, f1_other, _ = evaluate_model(other, test_loader, classes, cpu, plot=False)
+    
+    single = torch.randn(1, 3, 224, 224)
+    batch = torch.randn(batch_size, 3, 224, 224)
+    rows = [
+        ('Acurácia', acc_base, acc_other, '.4f'),
+        ('F1-Score', f1_base, f1_other, '.4f'),
+        ('Latência 1 img (ms)', measure_latency(base, single), measure_latency(other, single), '.1f'),
+        (f'Latência {batch_size} imgs (ms)', measure_latency(base, batch), measure_latency(other, batch), '.1f'),
+        ('Tamanho (MB)', model_size_mb(base), model_size_mb(other), '.2f'),
+    ]
     
-    # Avaliar após fine-tuning
-    print("\n🎯 Avaliação após fine-tuning:")
-    accuracy_ft, f1_ft, _, _ = evaluate_model(model, test_loader, classes, device)
+    print(f"\n📈 {title}:")
+    print(f"   {'':<22} {base_name:>10} {other_name:>10} {'Delta':>10}")
+    for name, value_base, value_other, fmt in rows:
+        print(f"   {name:<22} {value_base:>10{fmt}} {value_other:>10{fmt}} {value_other - value_base:>+10{fmt}}")
     
-    return accuracy_ft, f1_ft
+    return {name: (value_base, value_other) for name, value_base, value_other, _ in rows}
 
-def main():
+def compare_quantization(model, quantized, test_loader, classes):
     """
-    Função principal que executa todo o pipeline
+    Relatório FP32 x INT8: acurácia, F1, latência e tamanho do modelo
+    """
+    model_cpu = copy.deepcopy(model).cpu().eval()
+    return compare_models('FP32', model_cpu, 'INT8', quantized, test_loader, classes, "RELATÓRIO DE QUANTIZAÇÃO")
+
+def parse_args(argv=None):
+    """
+    Opções de linha de comando (os padrões são as constantes acima)
+    """
+    parser = argparse.ArgumentParser(description="Treinamento do classificador de resíduos")
+    parser.add_argument('--batch-size', type=int, default=batch_size)
+    parser.add_argument('--learning-rate', type=float, default=learning_rate)
+    parser.add_argument('--epochs', type=int, default=None, help=f"Épocas da fase congelada (padrão: {num_epochs})")
+    parser.add_argument('--fine-tune-lr', type=float, default=fine_tune_learning_rate)
+    parser.add_argument('--fine-tune-epochs', type=int, default=fine_tune_epochs)
+    parser.add_argument('--num-workers', type=int, default=num_workers)
+    parser.add_argument('--mmap-cache', action='store_true',
+                        help=f"Ler as imagens do cache decodificado em '{mmap_cache_dir}' (gerado na 1ª vez)")
+    parser.add_argument('--rebuild-cache', action='store_true', help="Regerar o cache (imagens sobrescritas no lugar)")
+    parser.add_argument('--amp', action='store_true', default=use_amp,
+                        help="Precisão mista (bfloat16 na CPU, float16 na GPU)")
+    parser.add_argument('--channels-last', action='store_true', default=use_channels_last,
+                        help="Tensores e pesos em formato NHWC")
+    parser.add_argument('--cached-features', action='store_true',
+                        help="Fase congelada sobre features do backbone extraídas uma vez")
+    parser.add_argument('--feature-augment-passes', type=int, default=feature_augment_passes,
+                        help="Extrações com augmentation (0 = uma extração sem augmentation)")
+    parser.add_argument('--rebuild-split', action='store_true',
+                        help=f"Refazer o split treino/teste salvo em '{split_path}'")
+    parser.add_argument('--verify-split', action='store_true', default=verify_split,
+                        help="Conferir tamanho e data de cada imagem antes de reutilizar o split e o cache mmap")
+    parser.add_argument('--resume', action='store_true', help=f"Continuar do checkpoint '{checkpoint_path}'")
+    parser.add_argument('--patience', type=int, default=early_stopping_patience,
+                        help="Épocas sem melhora no F1 de validação antes do early stopping")
+    parser.add_argument('--distill', action='store_true',
+                        help=f"Treinar o aluno MobileNetV3-Small a partir do professor em '{model_path}'")
+    parser.add_argument('--distill-epochs', type=int, default=distill_epochs)
+    parser.add_argument('--temperature', type=float, default=distill_temperature)
+    parser.add_argument('--alpha', type=float, default=distill_alpha)
+    parser.add_argument('--world-size', type=int, default=1,
+                        help="Processos de treino data-parallel nesta máquina (gloo)")
+    args = parser.parse_args(argv)
+    
+    # As features ficam em cache por processo e o classificador não passa pelo DDP
+    world_size = int(os.environ.get('WORLD_SIZE', args.world_size))
+    if args.cached_features and world_size > 1:
+        parser.error("--cached-features não suporta treino distribuído (--world-size/torchrun): "
+                     "rode com um único processo")
+    if args.cached_features and args.distill:
+        parser.error("--cached-features vale só para a fase congelada do treino, não para --distill")
+    return args
+
+def main(argv=None):
+    """
+    Função principal: um processo, ou N processos data-parallel
+    (--world-size N nesta máquina, ou variáveis RANK/WORLD_SIZE do torchrun)
+    """
+    args = parse_args(argv)
+    
+    if 'RANK' in os.environ and 'WORLD_SIZE' in os.environ:
+        run_training(int(os.environ['RANK']), args, int(os.environ['WORLD_SIZE']))
+    elif args.world_size > 1:
+        mp.spawn(run_training, args=(args, args.world_size, free_port()), nprocs=args.world_size)
+    else:
+        run_training(0, args)
+
+def run_training(rank, args, world_size=1, port=None):
+    """
+    Executa todo o pipeline neste processo
+    """
+    if world_size > 1:
+        setup_distributed(rank, world_size, port)
+    try:
+        if args.distill:
+            distill_pipeline(args, rank, world_size)
+        else:
+            train_pipeline(args, rank, world_size)
+    finally:
+        cleanup_distributed()
+
+def train_pipeline(args, rank=0, world_size=1):
+    """
+    Treino, avaliação e (só no rank 0) exportação dos artefatos
     """
     print("🚀 Iniciando projeto de classificação de imagens")
     print("=" * 50)
     
     # Configurar device
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if torch.cuda.is_available():
+        device = torch.device(f"cuda:{rank % torch.cuda.device_count()}")
+    else:
+        device = torch.device("cpu")
     print(f"💻 Usando device: {device}")
     
-    # Preparar dados
-    train_loader, test_loader, classes = prepare_data()
+    # Checkpoint para retomar (traz o split original)
+    checkpoint = load_checkpoint() if args.resume else None
+    if args.resume and checkpoint is None:
+        print(f"⚠️ '{checkpoint_path}' não encontrado, começando do zero")
+    
+    # Preparar dados (os workers de DataLoader são divididos entre os processos)
+    train_loader, val_loader, test_loader, classes = prepare_data(
+        args.batch_size, args.num_workers // world_size, args.mmap_cache, args.rebuild_cache,
+        checkpoint['split_indices'] if checkpoint else None, args.rebuild_split, args.verify_split)
     num_classes = len(classes)
     
+    # Early stopping e melhor modelo pela validação; o teste fica para a avaliação final
+    split_indices = tuple(list(loader.dataset.indices) for loader in (train_loader, val_loader, test_loader))
+    tracker = TrainingTracker(val_loader, classes, device, split_indices, checkpoint, patience=args.patience)
+    
     # Criar modelo
     model = create_model(num_classes)
     model = model.to(device)
+    if args.channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    model = wrap_distributed(model)
     
     # Configurar treinamento
     criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=learning_rate)
+    optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
     
     # Treinamento inicial
-    train_losses = train_model(model, train_loader, criterion, optimizer, device)
+    if args.cached_features:
+        train_losses = train_head_cached(model, train_loader, val_loader.dataset.dataset, criterion,
+                                         optimizer, device, args.feature_augment_passes, args.epochs, tracker)
+    else:
+        train_losses = train_model(model, train_loader, criterion, optimizer, device,
+                                   args.amp, args.channels_last, tracker, args.epochs)
     
-    # Avaliação inicial
+    # Fine-tuning
     print("\n" + "="*50)
-    accuracy_initial, f1_initial, _, _ = evaluate_model(model, test_loader, classes, device)
+    fine_tune_model(model, train_loader, device, args.amp, args.channels_last, tracker,
+                    args.fine_tune_lr, args.fine_tune_epochs)
     
-    # Fine-tuning
+    # Avaliação final: uma única vez no teste, com os melhores pesos já restaurados
     print("\n" + "="*50)
-    accuracy_final, f1_final = fine_tune_model(model, train_loader, test_loader, classes, device)
+    print("🧪 Avaliação final no conjunto de teste:")
+    accuracy_test, f1_test, _ = evaluate_on_main(model, test_loader, classes, device)
     
-    # Comparação de resultados
+    # Só o rank 0 compara, salva e exporta
+    if not is_main_process():
+        return
+    
+    # Comparação das fases (melhor época de cada uma, na validação)
     print("\n" + "="*50)
-    print("📈 COMPARAÇÃO DE RESULTADOS:")
-    print(f"   Antes do fine-tuning:")
-    print(f"     - Acurácia: {accuracy_initial:.4f}")
-    print(f"     - F1-Score: {f1_initial:.4f}")
-    print(f"   Após fine-tuning:")
-    print(f"     - Acurácia: {accuracy_final:.4f}")
-    print(f"     - F1-Score: {f1_final:.4f}")
-    print(f"   Melhoria:")
-    print(f"     - Acurácia: {accuracy_final - accuracy_initial:+.4f}")
-    print(f"     - F1-Score: {f1_final - f1_initial:+.4f}")
-    
-    # Salvar modelo
+    print("📈 COMPARAÇÃO DE RESULTADOS (validação):")
+    phases = {'Antes do fine-tuning': tracker.phase_best('frozen'),
+              'Após fine-tuning': tracker.phase_best('fine_tune')}
+    for title, best in phases.items():
+        if best is not None:
+            print(f"   {title}:")
+            print(f"     - Acurácia: {best[0]:.4f}")
+            print(f"     - F1-Score: {best[1]:.4f}")
+    if None not in phases.values():
+        (accuracy_initial, f1_initial), (accuracy_final, f1_final) = phases.values()
+        print(f"   Melhoria:")
+        print(f"     - Acurácia: {accuracy_final - accuracy_initial:+.4f}")
+        print(f"     - F1-Score: {f1_final - f1_initial:+.4f}")
+    print(f"   Teste (modelo final): acurácia {accuracy_test:.4f}, F1 {f1_test:.4f}")
+    
+    # Salvar modelo (pesos contíguos, independentes do formato usado no treino)
+    model = unwrap(model).to(memory_format=torch.contiguous_format)
     torch.save(model.state_dict(), model_path)
     print(f"\n✅ Modelo salvo como '{model_path}'")
+    export_torchscript(model)
+    export_onnx(model)
+    
+    # Variante INT8 para servidores só com CPU
+    if export_int8:
+        print("\n" + "="*50)
+        quantized = quantize_model(model, make_calibration_loader(train_loader, test_loader))
+        compare_quantization(model, quantized, test_loader, classes)
+        export_quantized(quantized)
     
     # Plotar curva de treinamento
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(range(1, len(train_losses) + 1), train_losses, 'b-', label='Loss de Treinamento')
     plt.xlabel('Época')
     plt.ylabel('Loss')
@@ -275,9 +1372,59 @@ def main():
     plt.legend()
     plt.grid(True)
     plt.savefig('training_curve.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.close(fig)
     
     print("\n🎉 Modelo finalizado com sucesso!")
 
+def distill_pipeline(args, rank=0, world_size=1):
+    """
+    Destilação do professor (model_path) no aluno, exportação e relatório professor x aluno
+    """
+    print("🎓 Iniciando destilação do modelo leve")
+    print("=" * 50)
+    
+    if torch.cuda.is_available():
+        device = torch.device(f"cuda:{rank % torch.cuda.device_count()}")
+    else:
+        device = torch.device("cpu")
+    print(f"💻 Usando device: {device}")
+    
+    checkpoint = load_checkpoint(student_checkpoint_path) if args.resume else None
+    
+    # Mesmo split do professor: o teste continua inédito para os dois
+    train_loader, val_loader, test_loader, classes = prepare_data(
+        args.batch_size, args.num_workers // world_size, args.mmap_cache, args.rebuild_cache,
+        checkpoint['split_indices'] if checkpoint else None, args.rebuild_split, args.verify_split)
+    num_classes = len(classes)
+    split_indices = tuple(list(loader.dataset.indices) for loader in (train_loader, val_loader, test_loader))
+    tracker = TrainingTracker(val_loader, classes, device, split_indices, checkpoint,
+                              path=student_checkpoint_path, patience=args.patience)
+    
+    teacher = load_teacher(num_classes, device)
+    student = create_student(num_classes).to(device)
+    if args.channels_last:
+        teacher = teacher.to(memory_format=torch.channels_last)
+        student = student.to(memory_format=torch.channels_last)
+    student = wrap_distributed(student)
+    
+    optimizer = optim.Adam(student.parameters(), lr=args.learning_rate)
+    train_losses = distill_model(student, teacher, train_loader, optimizer, device, args.distill_epochs,
+                                 args.temperature, args.alpha, args.amp, args.channels_last, tracker)
+    
+    if not is_main_process():
+        return
+    
+    student = unwrap(student).to(memory_format=torch.contiguous_format)
+    torch.save(student.state_dict(), student_model_path)
+    print(f"\n✅ Aluno salvo como '{student_model_path}' ({len(train_losses)} épocas)")
+    export_torchscript(student, student_torchscript_path)
+    export_onnx(student, student_onnx_path)
+    
+    print("\n" + "="*50)
+    teacher = teacher.cpu().to(memory_format=torch.contiguous_format)
+    compare_models('Professor', teacher, 'Aluno', student.cpu().eval(), test_loader, classes,
+                   "RELATÓRIO PROFESSOR x ALUNO")
+    print("\n💡 Para servir o aluno: ECOIA_ARQUITETURA=mobilenet_v3_small")
+
 if __name__ == "__main__":
     main()